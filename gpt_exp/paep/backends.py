@@ -0,0 +1,304 @@
+"""LLM backends behind LLMClient: Groq, OpenAI-compatible HTTP, fake and record/replay.
+
+Every backend takes the same ``request_params`` (messages, model, temperature,
+max_tokens, top_p) and returns normalized dicts, so LLMClient never touches
+provider-specific response objects:
+
+- ``complete(params)`` -> ``{'content', 'reasoning', 'finish_reason', 'usage'}``
+- ``stream(params)`` -> iterator of dicts with the same keys, one per chunk
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Any, Iterator, Optional
+
+from .cache import make_cache_key
+from .prompting import estimate_tokens
+from .transport import TransportConfig, shared_http_client, warm_up
+
+
+class BackendError(Exception):
+    """Provider error carrying the HTTP status and Retry-After hint used by the retry policy."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _usage_dict(usage: Any) -> Optional[Dict[str, Any]]:
+    """Normalize an SDK object or JSON dict ``usage`` field."""
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else lambda key, default=None: getattr(usage, key, default)
+    details = get('prompt_tokens_details')
+    if isinstance(details, dict):
+        cached = details.get('cached_tokens')
+    else:
+        cached = getattr(details, 'cached_tokens', None) if details is not None else None
+    return {
+        "prompt_tokens": get('prompt_tokens'),
+        "completion_tokens": get('completion_tokens'),
+        "total_tokens": get('total_tokens'),
+        "cached_prompt_tokens": cached or 0,
+    }
+
+
+def _chunk(content: Optional[str] = None, reasoning: Optional[str] = None, finish_reason: Optional[str] = None,
+           usage: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {"content": content, "reasoning": reasoning, "finish_reason": finish_reason, "usage": usage}
+
+
+class LLMBackend:
+    """``timeout`` (seconds, None for the backend default) bounds one HTTP request; see paep.deadline."""
+    name = "base"
+
+    def complete(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def warm_up(self) -> Optional[Dict[str, Any]]:
+        """Open the connection ahead of the first request; None when there is nothing to warm."""
+        return None
+
+    def stream(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        # Default: a single chunk with the whole response
+        result = self.complete(request_params, timeout=timeout)
+        yield _chunk(result["content"], result.get("reasoning"), result.get("finish_reason"), result.get("usage"))
+
+
+class GroqBackend(LLMBackend):
+    name = "groq"
+
+    def __init__(self, api_key: str, transport: Optional[TransportConfig] = None):
+        # Imported here: the SDK (pydantic, httpx) dominates CLI startup and is only needed to send requests
+        from groq import Groq
+        self.transport = transport or TransportConfig()
+        # Every GroqBackend with the same settings shares one connection pool
+        self.http_client = shared_http_client(self.transport)
+        # Retries are handled by LLMClient's retry policy, so the SDK's own retry loop is disabled
+        self.client = Groq(api_key=api_key, max_retries=0, http_client=self.http_client,
+                           timeout=self.transport.httpx_timeout())
+
+    def warm_up(self) -> Optional[Dict[str, Any]]:
+        return dict(warm_up(self.http_client, str(self.client.base_url)), http2=self.transport.use_http2())
+
+    def _timeout(self, timeout: Optional[float]):
+        if timeout is None:
+            return self.transport.httpx_timeout()
+        import httpx
+        # Connecting never gets more than the configured connect timeout
+        return httpx.Timeout(timeout, connect=min(timeout, self.transport.connect_timeout))
+
+    def complete(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        response = self.client.chat.completions.create(timeout=self._timeout(timeout), **request_params)
+        choice = response.choices[0]
+        return _chunk(choice.message.content, getattr(choice.message, 'reasoning', None),
+                      getattr(choice, 'finish_reason', None), _usage_dict(getattr(response, 'usage', None)))
+
+    def stream(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        for chunk in self.client.chat.completions.create(stream=True, timeout=self._timeout(timeout), **request_params):
+            # Groq reports usage on the final chunk under x_groq
+            x_groq = getattr(chunk, 'x_groq', None)
+            usage = _usage_dict(getattr(x_groq, 'usage', None) or getattr(chunk, 'usage', None))
+            if not chunk.choices:
+                if usage:
+                    yield _chunk(usage=usage)
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+            yield _chunk(getattr(delta, 'content', None), getattr(delta, 'reasoning', None),
+                         getattr(choice, 'finish_reason', None), usage)
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Any ``/chat/completions`` endpoint (llama.cpp, vLLM, Ollama, LM Studio...) over plain HTTP."""
+    name = "openai"
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 600.0):
+        self.url = base_url.rstrip('/') + "/chat/completions"
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def _open(self, payload: Dict[str, Any], timeout: Optional[float] = None):
+        import urllib.error
+        import urllib.request
+
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'), headers=headers, method="POST")
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout if timeout is None else min(timeout, self.timeout))
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get('retry-after') if e.headers else None
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise BackendError(f"HTTP {e.code}: {e.read().decode('utf-8', 'replace')[:500]}", e.code, retry_after)
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"No se pudo conectar con {self.url}: {e.reason}")
+
+    def complete(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        with self._open(dict(request_params), timeout) as response:
+            data = json.loads(response.read().decode('utf-8'))
+        choice = data["choices"][0]
+        message = choice.get("message", {})
+        return _chunk(message.get("content"), message.get("reasoning") or message.get("reasoning_content"),
+                      choice.get("finish_reason"), _usage_dict(data.get("usage")))
+
+    def stream(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        payload = dict(request_params, stream=True, stream_options={"include_usage": True})
+        with self._open(payload, timeout) as response:
+            for raw_line in response:
+                line = raw_line.decode('utf-8').strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage = _usage_dict(event.get("usage"))
+                if not event.get("choices"):
+                    if usage:
+                        yield _chunk(usage=usage)
+                    continue
+                choice = event["choices"][0]
+                delta = choice.get("delta", {})
+                yield _chunk(delta.get("content"), delta.get("reasoning") or delta.get("reasoning_content"),
+                             choice.get("finish_reason"), usage)
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic offline backend with configurable latency and output size.
+
+    The output is derived from a hash of the request, so identical prompts give
+    identical responses. ``latency`` is the time to first token and
+    ``tokens_per_second`` (if set) paces the rest of the generation.
+    """
+    name = "fake"
+
+    _WORDS = ("epistemología", "incertidumbre", "sistema", "umbral", "conocimiento", "tesis", "paradoja",
+              "emergencia", "sesgo", "marco", "contradicción", "horizonte", "crítica", "modelo", "límite")
+
+    def __init__(self, latency: float = 0.05, output_tokens: int = 200, tokens_per_second: Optional[float] = None,
+                 jitter: float = 0.0):
+        self.latency = latency
+        self.output_tokens = output_tokens
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+
+    def _response_text(self, request_params: Dict[str, Any]) -> str:
+        seed = hashlib.sha256(make_cache_key(request_params).encode('utf-8')).hexdigest()
+        rng = random.Random(seed)
+        words = [rng.choice(self._WORDS) for _ in range(max(1, self.output_tokens))]
+        return f"[fake:{seed[:8]}] " + " ".join(words)
+
+    def _usage(self, request_params: Dict[str, Any], text: str) -> Dict[str, Any]:
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in request_params["messages"])
+        completion_tokens = min(self.output_tokens, request_params.get("max_tokens") or self.output_tokens)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens, "cached_prompt_tokens": 0}
+
+    def _sleep_first_token(self, timeout: Optional[float] = None) -> None:
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if timeout is not None and delay > timeout:
+            # Behaves like a read timeout of a real HTTP client
+            time.sleep(timeout)
+            raise TimeoutError(f"Sin respuesta del backend falso tras {timeout:.1f}s")
+        if delay > 0:
+            time.sleep(delay)
+
+    def complete(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        text = self._response_text(request_params)
+        self._sleep_first_token(timeout)
+        if self.tokens_per_second:
+            time.sleep(self.output_tokens / self.tokens_per_second)
+        return _chunk(text, None, "stop", self._usage(request_params, text))
+
+    def stream(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        text = self._response_text(request_params)
+        self._sleep_first_token(timeout)
+        pieces = text.split(" ")
+        for index, piece in enumerate(pieces):
+            if self.tokens_per_second and index:
+                time.sleep(1.0 / self.tokens_per_second)
+            yield _chunk(piece if index == 0 else " " + piece)
+        yield _chunk(finish_reason="stop", usage=self._usage(request_params, text))
+
+
+class RecordReplayBackend(LLMBackend):
+    """Record real responses to a JSON cassette, or replay them without network.
+
+    In ``record`` mode requests go to ``inner`` and every response is stored
+    under the request hash. In ``replay`` mode responses come only from the
+    cassette and unknown requests fail.
+    """
+    name = "replay"
+
+    def __init__(self, cassette_path: str, inner: Optional[LLMBackend] = None, mode: str = "replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Modo de cassette desconocido: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("El modo 'record' necesita un backend real")
+        self.path = cassette_path
+        self.inner = inner
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(cassette_path):
+            with open(cassette_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get("entries", {})
+        elif mode == "replay":
+            raise FileNotFoundError(f"Cassette no encontrado: {cassette_path}")
+
+    def _lookup(self, request_params: Dict[str, Any]) -> Dict[str, Any]:
+        key = make_cache_key(request_params)
+        entry = self.entries.get(key)
+        if entry is None:
+            raise BackendError(f"Petición no grabada en el cassette {self.path} (clave {key[:12]})")
+        return entry["response"]
+
+    def _store(self, request_params: Dict[str, Any], response: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries[make_cache_key(request_params)] = {"request": request_params, "response": response}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": 1, "entries": self.entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def warm_up(self) -> Optional[Dict[str, Any]]:
+        return self.inner.warm_up() if self.mode == "record" else None
+
+    def complete(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        if self.mode == "replay":
+            return self._lookup(request_params)
+        response = self.inner.complete(request_params, timeout=timeout)
+        self._store(request_params, response)
+        return response
+
+    def stream(self, request_params: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        if self.mode == "replay":
+            response = self._lookup(request_params)
+            yield _chunk(response.get("content"), response.get("reasoning"))
+            yield _chunk(finish_reason=response.get("finish_reason"), usage=response.get("usage"))
+            return
+
+        content, reasoning, finish_reason, usage = [], [], None, None
+        try:
+            for chunk in self.inner.stream(request_params, timeout=timeout):
+                content.append(chunk.get("content") or "")
+                reasoning.append(chunk.get("reasoning") or "")
+                finish_reason = chunk.get("finish_reason") or finish_reason
+                usage = chunk.get("usage") or usage
+                yield chunk
+        except GeneratorExit:
+            # The client closed the stream early (closing tag reached): record what it consumed,
+            # so replay reproduces the same run
+            if any(content):
+                self._store(request_params, _chunk("".join(content), "".join(reasoning) or None, finish_reason, usage))
+            raise
+        self._store(request_params, _chunk("".join(content), "".join(reasoning) or None, finish_reason, usage))
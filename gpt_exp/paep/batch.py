@@ -0,0 +1,170 @@
+"""Batch execution of many PAEP analyses sharing one LLM client and template."""
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from .engine import PAEPEngine
+from .llm_client import LLMClient
+
+
+class BatchError(Exception):
+    pass
+
+
+def load_questions(path: str) -> List[Dict[str, str]]:
+    """Load questions from a JSONL or CSV file.
+
+    JSONL lines may be objects with ``question`` (and optional ``id``) or plain
+    JSON strings. CSV files use the ``question``/``id`` columns when present,
+    otherwise the first column.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = f.read()
+    except OSError as e:
+        raise BatchError(f"No se pudo leer el archivo de preguntas: {e}")
+
+    if path.lower().endswith('.csv'):
+        entries = _parse_csv(raw)
+    else:
+        entries = _parse_jsonl(raw)
+
+    questions = []
+    for index, (question_id, question) in enumerate(entries, start=1):
+        question = (question or '').strip()
+        if not question:
+            continue
+        questions.append({'id': str(question_id or index), 'question': question})
+    return questions
+
+
+def _parse_jsonl(raw: str) -> List[tuple]:
+    entries = []
+    for line_number, line in enumerate(raw.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchError(f"JSON inválido en la línea {line_number}: {e}")
+        if isinstance(item, str):
+            entries.append((None, item))
+        elif isinstance(item, dict) and 'question' in item:
+            entries.append((item.get('id'), item['question']))
+        else:
+            raise BatchError(f"La línea {line_number} no contiene un campo 'question'")
+    return entries
+
+
+def _parse_csv(raw: str) -> List[tuple]:
+    rows = list(csv.reader(io.StringIO(raw)))
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    if 'question' in header:
+        q_col = header.index('question')
+        id_col = header.index('id') if 'id' in header else None
+        return [(row[id_col] if id_col is not None and id_col < len(row) else None,
+                 row[q_col] if q_col < len(row) else '') for row in rows[1:]]
+    return [(None, row[0]) for row in rows if row]
+
+
+def run_batch(llm: LLMClient, template: Dict[str, Any], questions: List[Dict[str, str]],
+              workers: int = 4, phase_workers: int = 1, output_dir: Optional[str] = None,
+              quiet: bool = True, metrics_exporter=None, sinks=None, output_history=None,
+              max_continuations: int = 2, latency_history=None, hedging=None, spill_dir: Optional[str] = None,
+              spill_threshold: int = 4096, fan_out: bool = True, timeouts=None) -> Dict[str, Any]:
+    """Run one auto-approved analysis per question with at most ``workers`` in flight.
+
+    Each question gets its own PAEPEngine (per-session state) while the LLM client,
+    and therefore its HTTP connection pool, is shared by every worker. ``sinks``
+    (result sinks) are shared too, so a SQLite store collects the whole batch.
+    """
+    output_dir = output_dir or os.environ.get('PAEP_OUTPUT_DIR', '.')
+    batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    total_phases = len(template.get('phases', []))
+    results_path = os.path.join(output_dir, f"paep_batch_{batch_id}.jsonl")
+    summary_path = os.path.join(output_dir, f"paep_batch_{batch_id}_resumen.json")
+    out = sys.stdout
+
+    def analyse(index: int, item: Dict[str, str]) -> Dict[str, Any]:
+        session_id = f"{batch_id}_{index:04d}"
+        engine = PAEPEngine(llm, auto_approve=True, max_workers=phase_workers,
+                            session_id=session_id, output_dir=output_dir, metrics_exporter=metrics_exporter,
+                            sinks=sinks, output_history=output_history, max_continuations=max_continuations,
+                            latency_history=latency_history, hedging=hedging, spill_dir=spill_dir,
+                            spill_threshold=spill_threshold, fan_out=fan_out, timeouts=timeouts)
+        started = time.perf_counter()
+        error = None
+        results: Dict[str, Any] = {}
+        try:
+            results = engine.run_analysis(item['question'], template)
+        except Exception as e:
+            error = str(e)
+        completed = len(results.get('phases', {}))
+        return {
+            'id': item['id'],
+            'question': item['question'],
+            'session_id': session_id,
+            'status': 'ok' if error is None and completed == total_phases else 'failed',
+            'phases_completed': completed,
+            'total_phases': total_phases,
+            'elapsed_s': round(time.perf_counter() - started, 3),
+            'output_file': results.get('output_file'),
+            'retries': results.get('rate_limiting', {}).get('retries', 0),
+            'throttle_wait_s': round(results.get('rate_limiting', {}).get('throttle_wait_s', 0.0), 3),
+            'total_tokens': results.get('metrics', {}).get('totals', {}).get('total_tokens', 0),
+            'slowest_phase': results.get('metrics', {}).get('slowest_phase'),
+            'timed_out': list(results.get('timeouts', {})),
+            'error': error,
+        }
+
+    print(f"📦 Lote {batch_id}: {len(questions)} preguntas, {workers} en paralelo", file=out)
+    started = time.perf_counter()
+    records = []
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            # Engines print their full progress; in quiet mode only per-question lines are shown
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        results_file = stack.enter_context(open(results_path, 'w', encoding='utf-8'))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [pool.submit(analyse, index, item) for index, item in enumerate(questions, start=1)]
+            for future in as_completed(futures):
+                record = future.result()
+                records.append(record)
+                results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                results_file.flush()
+                icon = "✅" if record['status'] == 'ok' else "❌"
+                print(f"{icon} [{len(records)}/{len(questions)}] {record['id']} "
+                      f"({record['phases_completed']}/{total_phases} fases, {record['elapsed_s']}s)", file=out)
+
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for r in records if r['status'] != 'ok')
+    latencies = sorted(r['elapsed_s'] for r in records)
+    summary = {
+        'batch_id': batch_id,
+        'template_name': template.get('template_name'),
+        'total_questions': len(records),
+        'succeeded': len(records) - failed,
+        'failed': failed,
+        'workers': workers,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_min': round(len(records) / elapsed * 60, 3) if elapsed > 0 else 0.0,
+        'mean_latency_s': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'max_latency_s': latencies[-1] if latencies else 0.0,
+        'total_retries': sum(r['retries'] for r in records),
+        'total_throttle_wait_s': round(sum(r['throttle_wait_s'] for r in records), 3),
+        'results_file': results_path,
+    }
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    summary['summary_file'] = summary_path
+    return summary
@@ -0,0 +1,105 @@
+"""Persistent, content-addressed cache of LLM responses backed by SQLite."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "paep")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def make_cache_key(request_params: Dict[str, Any]) -> str:
+    """Hash every request field that influences the completion."""
+    relevant = {
+        "model": request_params.get("model"),
+        "temperature": request_params.get("temperature"),
+        "top_p": request_params.get("top_p"),
+        "max_tokens": request_params.get("max_tokens"),
+        "messages": request_params.get("messages"),
+    }
+    payload = json.dumps(relevant, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite store of responses with LRU eviction by total size and optional TTL.
+
+    A single connection is shared between threads and guarded by a lock; WAL mode
+    lets several CLI processes use the same cache file.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: Optional[float] = None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "llm_cache.sqlite3")
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " content TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, content: str) -> None:
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, content, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we are back under the limit
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": entries, "bytes": total}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
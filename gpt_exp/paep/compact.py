@@ -0,0 +1,112 @@
+"""Compact representation of session results: prompts by reference, large fields spilled to disk.
+
+Every phase prompt embeds the outputs of the phases in its context, so keeping
+each prompt verbatim holds O(n²) copies of the same text. A phase instead stores
+``prompt_ref``: a list of literal strings and ``{"output": phase_id}`` references
+to other phases' ``output``, and ``materialize_prompt`` rebuilds the exact prompt
+on demand. ``raw_llm_response`` is only stored when it differs from ``output``.
+
+With spilling enabled, ``output`` and ``raw_llm_response`` values above a size
+threshold are written to a file and replaced by ``{"spilled": path}``; read them
+with ``phase_field``.
+"""
+import copy
+import os
+from typing import Dict, Any, List, Union
+
+PromptRef = List[Union[str, Dict[str, str]]]
+
+SPILLABLE_FIELDS = ('output', 'raw_llm_response')
+
+
+def prompt_reference(prompt: str, outputs: Dict[str, str]) -> PromptRef:
+    """Split ``prompt`` into literals and references to the ``outputs`` it contains.
+
+    Outputs are matched left to right, each at most once; the result always
+    materializes back to ``prompt`` (otherwise the prompt is kept as one literal).
+    """
+    ref: PromptRef = []
+    remaining = {pid: text for pid, text in outputs.items() if text}
+    cursor = 0
+    while remaining:
+        found = [(prompt.find(text, cursor), -len(text), pid) for pid, text in remaining.items()]
+        found = [item for item in found if item[0] >= 0]
+        if not found:
+            break
+        # Earliest match first; on a tie the longest output
+        position, _, pid = min(found)
+        if position > cursor:
+            ref.append(prompt[cursor:position])
+        ref.append({'output': pid})
+        cursor = position + len(remaining.pop(pid))
+    if cursor < len(prompt):
+        ref.append(prompt[cursor:])
+    if _join(ref, outputs) != prompt:
+        return [prompt]
+    return ref
+
+
+def _join(ref: PromptRef, outputs: Dict[str, str]) -> str:
+    return "".join(item if isinstance(item, str) else outputs[item['output']] for item in ref)
+
+
+def phase_field(phase_data: Dict[str, Any], key: str) -> Any:
+    """Value of a phase field, reading it back from disk if it was spilled."""
+    value = phase_data.get(key)
+    if isinstance(value, dict) and 'spilled' in value:
+        with open(value['spilled'], 'r', encoding='utf-8') as f:
+            return f.read()
+    return value
+
+
+def raw_response(phase_data: Dict[str, Any]) -> str:
+    """Raw LLM response of a phase (stored only when it differs from the extracted output)."""
+    raw = phase_field(phase_data, 'raw_llm_response')
+    return raw if raw is not None else phase_field(phase_data, 'output')
+
+
+def materialize_prompt(phases: Dict[str, Dict[str, Any]], phase_id: str) -> str:
+    """Full prompt sent for ``phase_id``, rebuilt from its ``prompt_ref``."""
+    data = phases[phase_id]
+    if 'full_prompt_sent' in data:
+        # Results written before prompts were stored by reference
+        return data['full_prompt_sent'] or ''
+    ref = data.get('prompt_ref') or []
+    outputs = {item['output']: phase_field(phases[item['output']], 'output') for item in ref if isinstance(item, dict)}
+    return _join(ref, outputs)
+
+
+def expanded_phase(phases: Dict[str, Dict[str, Any]], phase_id: str) -> Dict[str, Any]:
+    """Phase entry with the full prompt, raw response and spilled fields inlined."""
+    data = {key: value for key, value in phases[phase_id].items() if key != 'prompt_ref'}
+    data['output'] = phase_field(data, 'output')
+    data['full_prompt_sent'] = materialize_prompt(phases, phase_id)
+    data['raw_llm_response'] = raw_response(data)
+    return data
+
+
+def expanded_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of ``results`` with every phase expanded (the pre-reference structure)."""
+    expanded = copy.copy(results)
+    phases = results.get('phases', {})
+    expanded['phases'] = {phase_id: expanded_phase(phases, phase_id) for phase_id in phases}
+    return expanded
+
+
+def spill_phase(results: Dict[str, Any], phase_id: str, spill_dir: str, threshold: int = 4096) -> int:
+    """Move the large text fields of a phase to ``spill_dir``; returns the characters spilled."""
+    data = results['phases'][phase_id]
+    spilled = 0
+    for key in SPILLABLE_FIELDS:
+        value = data.get(key)
+        if not isinstance(value, str) or len(value) <= threshold:
+            continue
+        # Absolute, so a journal written here still resolves from another working directory
+        session_dir = os.path.abspath(os.path.join(spill_dir, str(results.get('session_id', 'sesion'))))
+        os.makedirs(session_dir, exist_ok=True)
+        path = os.path.join(session_dir, f"{phase_id}.{key}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(value)
+        data[key] = {'spilled': path}
+        spilled += len(value)
+    return spilled
@@ -0,0 +1,178 @@
+"""Side-by-side runs of one question under several templates, executing shared phases once.
+
+Every template gets its own PAEPEngine, and the engines run concurrently. They
+share a ``PhaseMemo`` keyed by the phase input hash (see incremental.py), which
+covers the task, system prompt, model config and upstream outputs. The first
+engine to reach a phase runs it. An engine that reaches a phase with the same
+hash waits for that result and reuses it. So Phase A and any identical prefix
+run once, and the templates fan out where their phases diverge. A waiter that
+gets no result in time (or a failed one) runs the phase itself.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from .engine import PAEPEngine
+from .llm_client import LLMClient
+
+# Longest wait for a phase another template is running, before running it here as well
+DEFAULT_MEMO_WAIT_S = 600.0
+
+
+class _Slot:
+    def __init__(self, owner: str):
+        self.owner = owner
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+
+
+class PhaseMemo:
+    """Phase results shared by the engines of a comparison run.
+
+    ``wait_s`` bounds how long a waiter waits for the owner of a phase.
+    """
+
+    def __init__(self, wait_s: float = DEFAULT_MEMO_WAIT_S):
+        self.wait_s = wait_s
+        self._slots: Dict[str, _Slot] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, owner: str,
+              timeout: Optional[float] = None) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
+        """``(True, None, owner)`` if the caller must run the phase, else ``(False, result, owner)``.
+
+        A waiter gets ``None`` as result if the owner failed or published nothing within
+        ``timeout`` (at most ``wait_s``), and then runs the phase itself.
+        """
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                self._slots[key] = _Slot(owner)
+                return True, None, owner
+        slot.done.wait(self.wait_s if timeout is None else min(timeout, self.wait_s))
+        return False, slot.result, slot.owner
+
+    def publish(self, key: str, result: Optional[Dict[str, Any]]) -> None:
+        slot = self._slots[key]
+        slot.result = result
+        slot.done.set()
+
+
+def run_comparison(llm: LLMClient, templates: Dict[str, Dict[str, Any]], question: str,
+                   phase_workers: int = 4, output_dir: Optional[str] = None, quiet: bool = True,
+                   metrics_exporter=None, sinks=None, output_history=None, max_continuations: int = 2,
+                   latency_history=None, hedging=None, fan_out: bool = True, timeouts=None) -> Dict[str, Any]:
+    """Run ``question`` under every template (auto-approved) and write the comparison report."""
+    output_dir = output_dir or os.environ.get('PAEP_OUTPUT_DIR', '.')
+    comparison_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    memo = PhaseMemo()
+    outcomes: Dict[str, Dict[str, Any]] = {}
+
+    def analyse(name: str, template: Dict[str, Any]) -> Dict[str, Any]:
+        engine = PAEPEngine(llm, auto_approve=True, max_workers=phase_workers,
+                            session_id=f"{comparison_id}_{name}", output_dir=output_dir,
+                            metrics_exporter=metrics_exporter, sinks=sinks, output_history=output_history,
+                            max_continuations=max_continuations, latency_history=latency_history, hedging=hedging,
+                            fan_out=fan_out, phase_memo=memo, memo_owner=name, timeouts=timeouts)
+        started = time.perf_counter()
+        try:
+            results = engine.run_analysis(question, template)
+            error = None
+        except Exception as e:
+            results, error = {}, str(e)
+        return {'results': results, 'elapsed_s': time.perf_counter() - started, 'error': error}
+
+    print(f"⚖️  Comparación {comparison_id}: {len(templates)} templates ({', '.join(templates)})")
+    started = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        with ThreadPoolExecutor(max_workers=len(templates)) as pool:
+            futures = {name: pool.submit(contextvars.copy_context().run, analyse, name, template)
+                       for name, template in templates.items()}
+            for name, future in futures.items():
+                outcomes[name] = future.result()
+    elapsed = time.perf_counter() - started
+
+    summary = comparison_summary(outcomes, templates, elapsed)
+    summary.update(comparison_id=comparison_id, question=question)
+    json_path = os.path.join(output_dir, f"paep_comparacion_{comparison_id}.json")
+    md_path = os.path.join(output_dir, f"paep_comparacion_{comparison_id}.md")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write(comparison_markdown(summary, outcomes, templates))
+    summary['report_files'] = [md_path, json_path]
+    return summary
+
+
+def comparison_summary(outcomes: Dict[str, Dict[str, Any]], templates: Dict[str, Dict[str, Any]],
+                       elapsed: float) -> Dict[str, Any]:
+    """Per template latency and token cost; shared phases count for every template that uses them."""
+    per_template = {}
+    shared_tokens = 0
+    for name, outcome in outcomes.items():
+        phases = outcome['results'].get('phases', {})
+        shared = [pid for pid, data in phases.items() if data['metrics'].get('shared_from')]
+        tokens = sum(data['metrics'].get('total_tokens') or 0 for data in phases.values())
+        own_tokens = sum(data['metrics'].get('total_tokens') or 0 for pid, data in phases.items() if pid not in shared)
+        shared_tokens += tokens - own_tokens
+        per_template[name] = {
+            'session_id': outcome['results'].get('session_id'),
+            'status': 'ok' if not outcome['error'] and len(phases) == len(templates[name].get('phases', [])) else 'failed',
+            'error': outcome['error'],
+            'elapsed_s': round(outcome['elapsed_s'], 3),
+            'phases': len(phases),
+            'shared_phases': shared,
+            'total_tokens': tokens,
+            'own_tokens': own_tokens,
+            'output_file': outcome['results'].get('output_file'),
+        }
+    return {
+        'templates': per_template,
+        'elapsed_s': round(elapsed, 3),
+        # What running the templates one after another would have cost on top of this run
+        'tokens_saved': shared_tokens,
+    }
+
+
+def comparison_markdown(summary: Dict[str, Any], outcomes: Dict[str, Dict[str, Any]],
+                        templates: Dict[str, Dict[str, Any]]) -> str:
+    """Side-by-side report: a cost table, then each phase's output under every template."""
+    names = list(templates)
+    lines = [
+        f"# Comparación PAEP-R {summary['comparison_id']}",
+        "",
+        f"**Pregunta:** {summary['question']}",
+        "",
+        "| Template | Estado | Tiempo (s) | Tokens | Tokens propios | Fases compartidas |",
+        "|---|---|---|---|---|---|",
+    ]
+    for name in names:
+        item = summary['templates'][name]
+        lines.append(f"| {name} | {item['status']} | {item['elapsed_s']:.2f} | {item['total_tokens']} | "
+                     f"{item['own_tokens']} | {', '.join(item['shared_phases']) or '-'} |")
+    lines += ["", f"Tiempo total: {summary['elapsed_s']:.2f}s · tokens ahorrados al compartir fases: "
+                  f"{summary['tokens_saved']}", ""]
+
+    phase_ids: List[str] = []
+    for name in names:
+        for phase in templates[name].get('phases', []):
+            if phase['id'] not in phase_ids:
+                phase_ids.append(phase['id'])
+    for phase_id in phase_ids:
+        lines += [f"## Fase {phase_id}", ""]
+        for name in names:
+            data = outcomes[name]['results'].get('phases', {}).get(phase_id)
+            if data is None:
+                continue
+            shared = data['metrics'].get('shared_from')
+            note = f" (compartida con {shared})" if shared else ""
+            lines += [f"### {name}: {data.get('name', '')}{note}", "", str(data.get('output') or ''), ""]
+    return "\n".join(lines)
@@ -0,0 +1,39 @@
+"""Per-thread console output capture for background work."""
+import contextlib
+import contextvars
+import io
+
+
+class QuietThreadsStdout:
+    """``sys.stdout`` proxy that captures writes from threads inside ``capture()``.
+
+    The capture target lives in a context variable, so work submitted with a copied
+    context (see PhaseScheduler) is captured along with its parent. Other threads (e.g. the main thread showing an interactive prompt) write
+    through unchanged, so background work never garbles the console.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self._buffer: contextvars.ContextVar = contextvars.ContextVar(f"paep_capture_{id(self)}", default=None)
+
+    @contextlib.contextmanager
+    def capture(self, buffer=None):
+        """Redirect this thread's output to ``buffer`` (a new StringIO by default)."""
+        buffer = buffer if buffer is not None else io.StringIO()
+        token = self._buffer.set(buffer)
+        try:
+            yield buffer
+        finally:
+            self._buffer.reset(token)
+
+    def write(self, text: str) -> int:
+        buffer = self._buffer.get()
+        if buffer is not None:
+            return buffer.write(text)
+        return self.target.write(text)
+
+    def flush(self) -> None:
+        self.target.flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self.target, name)
@@ -0,0 +1,51 @@
+"""Deadlines for a session and its phases, checked cooperatively down to the HTTP request.
+
+A phase deadline is a child of the session deadline: it expires at the earlier
+of the two, and cancelling the session cancels every phase derived from it.
+"""
+import threading
+import time
+from typing import Optional
+
+ON_TIMEOUT_POLICIES = ("continue", "fail_fast")
+
+
+class Deadline:
+    """Point in time by which some work must finish (no limit with ``seconds=None``)."""
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None, label: str = ""):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self.parent = parent
+        self.label = label
+        self._cancelled = threading.Event()
+
+    def child(self, seconds: Optional[float], label: str = "") -> "Deadline":
+        return Deadline(seconds, parent=self, label=label)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled())
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a limit."""
+        if self.cancelled():
+            return 0.0
+        own = None if self.expires_at is None else max(0.0, self.expires_at - time.monotonic())
+        inherited = self.parent.remaining() if self.parent is not None else None
+        if own is None:
+            return inherited
+        return own if inherited is None else min(own, inherited)
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def reason(self) -> str:
+        """Label of the outermost deadline that ran out (the session before the phase)."""
+        if self.parent is not None and self.parent.expired():
+            return self.parent.reason()
+        if self._cancelled.is_set():
+            return f"{self.label} cancelado" if self.label else "cancelado"
+        return f"plazo de {self.label} agotado" if self.label else "plazo agotado"
@@ -1,32 +1,260 @@
 """Core PAEP engine orchestration: manages phases, state, and persistence."""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
 from datetime import datetime
-import json
 import os
-from typing import Dict, Any, Optional
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
 
-from .prompting import build_prompt, extract_content_from_tags, build_context_string
-from .llm_client import LLMClient, LLMError
+from .prompting import (build_prompt, extract_content_from_tags, extract_tagged_content, build_context_string,
+                        estimate_tokens, TagStreamParser, CONTEXT_STRATEGIES)
+from .llm_client import LLMClient, LLMError, DeadlineExceeded, ADDITIVE_METRICS
+from .scheduler import PhaseScheduler, SchedulerError, critical_path_length
+from .journal import SessionJournal, JournalError
+from .metrics import MetricsExporter, session_metrics, sum_phase_metrics, usage_totals
+from .sinks import ResultSink, MarkdownSink
+from .templates import load_template
+from .incremental import phase_input_hash, output_hash
+from .deadline import Deadline, ON_TIMEOUT_POLICIES
+from .history import OutputLengthHistory, LatencyHistory
+from .speculation import Speculation
+from .compact import prompt_reference, materialize_prompt, phase_field, raw_response, spill_phase
+from .fanout import (fan_out_source, parse_list_items, item_phase, parts_context, merge_parts, CONCEPTS_PROMPT,
+                     DEFAULT_MAX_ITEMS)
+
+
+DEFAULT_SUMMARY_TASK = (
+    "Resume el siguiente resultado de una fase de análisis en un máximo de 150 palabras. "
+    "Conserva las tesis, autores, conceptos y conexiones clave; omite ejemplos y repeticiones."
+)
 
 
 class PAEPEngine:
-    def __init__(self, llm_client: LLMClient, auto_approve: bool = False, verbose: bool = False):
+    def __init__(self, llm_client: LLMClient, auto_approve: bool = False, verbose: bool = False, max_workers: int = 4,
+                 session_id: Optional[str] = None, output_dir: Optional[str] = None, stream: bool = False,
+                 conversation_mode: bool = False, metrics_exporter: Optional[MetricsExporter] = None,
+                 sinks: Optional[List[ResultSink]] = None, speculative: bool = True,
+                 output_history: Optional[OutputLengthHistory] = None, max_continuations: int = 2,
+                 latency_history: Optional[LatencyHistory] = None, hedging: Optional[Dict[str, Any]] = None,
+                 spill_dir: Optional[str] = None, spill_threshold: int = 4096, fan_out: bool = True,
+                 phase_memo=None, memo_owner: Optional[str] = None, timeouts: Optional[Dict[str, Any]] = None):
         self.llm = llm_client
         self.phase_outputs: Dict[str, str] = {}  # Changed to store raw content strings
-        self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.session_id = session_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Use PAEP_OUTPUT_DIR if set (from global command), otherwise current directory
+        self.output_dir = output_dir or os.environ.get('PAEP_OUTPUT_DIR', '.')
         self.auto_approve = auto_approve
         self.verbose = verbose
         self.original_user_question: str = ""  # Store original question for refinements
+        # Verbose mode pauses between phases and prints full prompts, so keep it sequential
+        self.max_workers = 1 if verbose else max(1, max_workers)
+        # Conversation mode sends phases as a growing multi-turn chat so the provider can
+        # reuse the cached prefix; turns must be appended in order, hence sequential
+        self.conversation_mode = conversation_mode
+        if conversation_mode:
+            self.max_workers = 1
+        self.conversation_turns: List[Dict[str, str]] = []
+        self.metrics_exporter = metrics_exporter
+        # Phases are persisted as they complete, so an interrupted run keeps its finished phases
+        self.sinks = sinks if sinks is not None else [MarkdownSink(self.output_dir)]
+        # Run the phases waiting on Phase A while the user validates its reformulation
+        self.speculative = speculative
+        # Per-phase max_tokens from past output lengths; truncated answers are continued instead
+        self.output_history = output_history
+        self.max_continuations = max_continuations
+        # Hedged requests: settings merged over the template's 'hedging' block, timed by each phase's p95 latency
+        self.latency_history = latency_history
+        self.hedging = hedging
+        # Overrides of the template's 'timeouts' block; the session deadline is set by run_analysis
+        self.timeouts = timeouts
+        self._session_deadline: Optional[Deadline] = None
+        # Large phase texts moved to disk once persisted (batch and service keep many sessions in one process)
+        self.spill_dir = spill_dir
+        self.spill_threshold = spill_threshold
+        # Phases with a 'fan_out' block run as parallel sub-requests (see paep.fanout)
+        self.fan_out = fan_out
+        # Comparison runs: phase results shared with the engines of other templates (see paep.compare)
+        self.phase_memo = phase_memo
+        self.memo_owner = memo_owner or self.session_id
+        self.stream = stream
+        self._stream_lock = threading.Lock()
+        # Multi-line blocks printed from worker threads (adopted speculative logs) go out whole
+        self._console_lock = threading.Lock()
+        self.journal = SessionJournal(self.output_dir, self.session_id)
+        # Short summaries of earlier phases, generated once on demand for context compaction
+        self.phase_summaries: Dict[str, str] = {}
+        self._summary_locks: Dict[str, threading.Lock] = {}
+        self._resumed_results: Optional[Dict[str, Any]] = None
+        # Incremental recomputation: phases of a previous session reused when their input hash matches
+        self.base_session_id: Optional[str] = None
+        self._base_phases: Dict[str, Dict[str, Any]] = {}
+        self._edited_outputs: Dict[str, str] = {}
 
-    def load_template(self, template_path: str) -> Optional[Dict[str, Any]]:
+    load_template = staticmethod(load_template)
+
+    def resume_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Reload a session journal; returns ``{'question', 'template'}`` or None on error.
+
+        The next ``run_analysis`` call only executes the phases missing from the journal.
+        """
         try:
-            with open(template_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"❌ Template file not found: {template_path}")
+            state = SessionJournal.load(self.output_dir, session_id)
+        except JournalError as e:
+            print(f"❌ {e}")
             return None
-        except json.JSONDecodeError as e:
-            print(f"❌ Invalid JSON in template file: {e}")
+
+        results = state['results']
+        self.session_id = session_id
+        self.journal = SessionJournal(self.output_dir, session_id)
+        self.phase_outputs = dict(state.get('phase_outputs', {}))
+        self.phase_summaries = dict(state.get('phase_summaries', {}))
+        self.original_user_question = state.get('original_user_question', results.get('user_question', ''))
+        self._resumed_results = results
+        print(f"♻️  Sesión {session_id} recuperada: {len(results.get('phases', {}))} fases completadas")
+        return {'question': results.get('user_question', ''), 'template': state['template']}
+
+    def load_base_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Use a previous session as the base for incremental recomputation.
+
+        Returns ``{'question', 'template'}`` of that session, or None on error. The
+        next ``run_analysis`` (in a new session) reuses every phase whose input hash
+        is unchanged and only calls the LLM for the rest.
+        """
+        try:
+            state = SessionJournal.load(self.output_dir, session_id)
+        except JournalError as e:
+            print(f"❌ {e}")
             return None
+        results = state['results']
+        self.base_session_id = session_id
+        # Every phase is kept: prompts of reusable phases reference the outputs of the others
+        self._base_phases = dict(results.get('phases', {}))
+        reusable = sum(1 for data in self._base_phases.values() if data.get('input_hash'))
+        print(f"🧬 Sesión base {session_id}: {reusable} fases reutilizables")
+        if reusable < len(self._base_phases):
+            print("⚠️  Algunas fases de la sesión base no tienen hash de entrada y se recalcularán")
+        return {'question': results.get('user_question', ''), 'template': state['template']}
+
+    def edit_phase_output(self, phase_id: str, text: str) -> None:
+        """Replace a phase output; downstream phases are recomputed because their input hash changes."""
+        self._edited_outputs[phase_id] = text
+
+    def phase_model_config(self, phase: Dict[str, Any], template: Dict[str, Any]) -> Dict[str, Any]:
+        """Template model config with the phase's overrides and ``max_tokens`` sized from its output history."""
+        config = dict(template.get('model_config') or {}, **(phase.get('model_config') or {}))
+        if self.output_history:
+            configured = config.get('max_tokens', 4096)
+            adaptive = self.output_history.max_tokens_for(template.get('template_name') or 'unknown', phase['id'], configured)
+            if adaptive:
+                # The response cache keys on the configured limit, which does not drift between runs
+                config.update(max_tokens=adaptive, configured_max_tokens=configured)
+        return config
+
+    def hedge_policy(self, phase: Dict[str, Any], template: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """``{'after_s', 'model'}`` for hedging this phase's request, or None if it does not apply.
+
+        Settings come from the template's ``hedging`` block, the engine overrides and
+        the phase's own ``hedging`` (``false`` disables it for that phase). The delay is
+        the phase's latency percentile, so hedging starts once enough runs are recorded.
+        """
+        phase_policy = phase.get('hedging')
+        if phase_policy is False or not self.latency_history or self.verbose:
+            return None
+        policy = dict(template.get('hedging') or {}, **(self.hedging or {}))
+        if isinstance(phase_policy, dict):
+            policy.update(phase_policy)
+        if not policy.get('enabled'):
+            return None
+        after_s = self.latency_history.latency_percentile(template.get('template_name') or 'unknown', phase['id'],
+                                                          policy.get('percentile', 95), policy.get('min_samples', 10))
+        if after_s is None:
+            return None
+        return {'after_s': max(after_s, policy.get('min_delay_s', 1.0)), 'model': policy.get('model')}
+
+    def timeout_policy(self, template: Dict[str, Any]) -> Dict[str, Any]:
+        """``{'session_s', 'phase_s', 'on_timeout'}`` from the template's ``timeouts`` block and the engine overrides."""
+        policy = dict(template.get('timeouts') or {}, **(self.timeouts or {}))
+        if policy.get('on_timeout', 'continue') not in ON_TIMEOUT_POLICIES:
+            print(f"⚠️  on_timeout desconocido '{policy['on_timeout']}', usando 'continue'")
+            policy['on_timeout'] = 'continue'
+        return policy
+
+    def phase_deadline(self, phase: Dict[str, Any], template: Dict[str, Any],
+                       parent: Optional[Deadline] = None) -> Optional[Deadline]:
+        """Deadline of one phase run: its ``timeout_s`` (or the template's ``phase_s``) within ``parent``.
+
+        ``parent`` defaults to the session deadline.
+        """
+        parent = parent or self._session_deadline
+        seconds = phase.get('timeout_s', self.timeout_policy(template).get('phase_s'))
+        if seconds is None:
+            return parent
+        return (parent or Deadline()).child(seconds, label=f"la Fase {phase['id']}")
+
+    def _record_phase_history(self, phase: Dict[str, Any], template: Dict[str, Any], phase_result: Dict[str, Any]) -> None:
+        metrics = phase_result['metrics']
+        if metrics.get('cache_hit') or metrics.get('reused_from') or metrics.get('edited') or metrics.get('shared_from'):
+            return
+        if metrics.get('fan_out'):
+            # Summed over several requests: not comparable with a single request of the phase
+            return
+        template_name = template.get('template_name') or 'unknown'
+        try:
+            if self.output_history:
+                tokens = metrics.get('completion_tokens') or estimate_tokens(phase_result['raw_response'])
+                self.output_history.record(template_name, phase['id'], tokens)
+            if self.latency_history and metrics.get('request_s') is not None:
+                self.latency_history.record(template_name, phase['id'], metrics['request_s'])
+        except Exception as e:
+            print(f"⚠️  No se pudo registrar el historial de la Fase {phase['id']}: {e}")
+
+    def phase_input_hash(self, phase: Dict[str, Any], user_question: str, template: Dict[str, Any],
+                         depends_on: List[str]) -> str:
+        dependency_hashes = {pid: output_hash(self.phase_outputs[pid]) for pid in depends_on if pid in self.phase_outputs}
+        if not self.fan_out:
+            phase = {key: value for key, value in phase.items() if key != 'fan_out'}
+        return phase_input_hash(phase, template, self.build_phase_input(phase, user_question), dependency_hashes,
+                                'conversacion' if self.conversation_mode else 'contexto')
+
+    def _reused_result(self, phase: Dict[str, Any], input_hash: str) -> Optional[Dict[str, Any]]:
+        """Result of an edited phase, or of a base-session phase with the same input hash."""
+        base = self._base_phases.get(phase['id'])
+        if phase['id'] in self._edited_outputs:
+            text = self._edited_outputs[phase['id']]
+            print(f"✏️  Fase {phase['id']}: usando la salida editada")
+            full_prompt = materialize_prompt(self._base_phases, phase['id']) if base else ''
+            return {"processed_output": text, "full_prompt": full_prompt, "raw_response": text, "metrics": {"edited": True}}
+        # A phase computed without a timed-out dependency is never reused
+        if base and base.get('input_hash') == input_hash and not base.get('degraded'):
+            print(f"♻️  Fase {phase['id']}: sin cambios, reutilizada de la sesión {self.base_session_id}")
+            return {"processed_output": phase_field(base, 'output'),
+                    "full_prompt": materialize_prompt(self._base_phases, phase['id']),
+                    "raw_response": raw_response(base), "metrics": {"reused_from": self.base_session_id}}
+        return None
+
+    def _shared_phase(self, phase: Dict[str, Any], user_question: str, template: Dict[str, Any],
+                      depends_on: List[str], input_hash: str) -> Optional[Dict[str, Any]]:
+        """Run a phase once per comparison run: reuse the result of another template with the same request."""
+        # The adaptive max_tokens is left out: it only bounds the output (continuations cover the rest)
+        deadline = self.phase_deadline(phase, template)
+        owner, shared, owner_name = self.phase_memo.claim(input_hash, self.memo_owner,
+                                                          deadline.remaining() if deadline is not None else None)
+        if not owner:
+            if shared is not None:
+                print(f"🔗 Fase {phase['id']}: idéntica en el template {owner_name}, resultado compartido")
+                return dict(shared, metrics=dict(shared['metrics'], shared_from=owner_name))
+            # The other template failed this phase or did not finish it in time: try it here
+            print(f"⚠️  Fase {phase['id']}: sin resultado del template {owner_name}, se ejecuta en este template")
+            return self.execute_phase(phase, user_question, template, depends_on)
+        phase_result = None
+        try:
+            phase_result = self.execute_phase(phase, user_question, template, depends_on)
+        finally:
+            # A timed-out run is not shared: the other template tries within its own budget
+            self.phase_memo.publish(input_hash, None if phase_result and phase_result.get('timed_out') else phase_result)
+        return phase_result
 
     def build_phase_input(self, phase: Dict[str, Any], user_question: str) -> Dict[str, Any]:
         input_data = {}
@@ -42,8 +270,21 @@ class PAEPEngine:
             'modificaciones_usuario': user_suggestions
         }
 
-    def execute_phase(self, phase: Dict[str, Any], user_question: str, template: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def execute_phase(self, phase: Dict[str, Any], user_question: str, template: Dict[str, Any], depends_on: Optional[List[str]] = None,
+                      phase_outputs: Optional[Dict[str, str]] = None, stream: Optional[bool] = None,
+                      deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
+        """Run a single phase against the LLM. Safe to call from worker threads.
+
+        ``phase_outputs`` overrides the published outputs used as context and ``deadline``
+        the session deadline (speculative runs).
+        """
+        outputs = self.phase_outputs if phase_outputs is None else phase_outputs
+        stream = self.stream if stream is None else stream
         print(f"\n🔄 Ejecutando Fase {phase['id']}: {phase['name']}")
+        phase_started = time.perf_counter()
+        deadline = self.phase_deadline(phase, template, deadline)
+        if deadline is not None and deadline.expired():
+            return self._timed_out(phase, deadline.reason(), phase_started)
         
         # Get phase tags from template
         phase_tags = template.get('phase_tags', {})
@@ -52,17 +293,62 @@ class PAEPEngine:
         input_data = self.build_phase_input(phase, user_question)
         print(f"📥 Input: {list(input_data.keys())}")
 
-        # Build context from previous phases
-        context = build_context_string(self.phase_outputs, phase_tags, phase['id'])
+        history = None
+        if self.conversation_mode:
+            # Earlier phases travel as previous chat turns, byte-identical between calls
+            context_started = time.perf_counter()
+            history = list(self.conversation_turns)
+            context = ""
+            context_tokens = sum(estimate_tokens(turn['content']) for turn in history)
+        else:
+            # Build context from previous phases, compacted to the template token budget
+            max_context_tokens = phase.get('max_context_tokens', template.get('max_context_tokens'))
+            strategy = phase.get('context_strategy', template.get('context_strategy', 'drop_oldest'))
+            if strategy not in CONTEXT_STRATEGIES:
+                print(f"⚠️  Estrategia de contexto desconocida '{strategy}', usando 'drop_oldest'")
+                strategy = 'drop_oldest'
+            if max_context_tokens and strategy == 'summary':
+                self._ensure_summaries(depends_on, max_context_tokens, template)
+            context_started = time.perf_counter()
+            context = build_context_string(outputs, phase_tags, phase['id'], depends_on,
+                                           max_tokens=max_context_tokens, strategy=strategy, summaries=self.phase_summaries)
+            context_tokens = estimate_tokens(context)
+            if max_context_tokens:
+                print(f"🧮 Contexto: ~{context_tokens} tokens (presupuesto {max_context_tokens}, estrategia {strategy})")
         
         # Build prompt with context
-        prompt = build_prompt(phase, input_data, "", context, phase_tags)
+        structured = bool(template.get('structured_output'))
+        prompt = build_prompt(phase, input_data, "", context, phase_tags, structured=structured)
+        context_build_s = time.perf_counter() - context_started
 
         phase_name = f"{phase['id']} - {phase.get('name', 'Unnamed Phase')}"
         print(f"⏳ Enviando a LLM - Fase {phase_name}...")
+        on_chunk = self._stream_writer(phase) if stream else None
+        # Structured output: follow the phase tag as it streams in and stop the generation at its closing tag
+        tag = phase_tags.get(phase['id']) if structured else None
+        stop_when = self._tag_stop(tag)
         try:
             system_prompt = template.get('system_prompt', '')
-            raw_response = self.llm.send(prompt, system_prompt=system_prompt, model_config=template.get('model_config'), phase_name=phase_name)
+            model_config = self.phase_model_config(phase, template)
+            fan_out = phase.get('fan_out') if self.fan_out else None
+            items = (self._fan_out_items(phase, fan_out, user_question, template, model_config, outputs, deadline)
+                     if fan_out else [])
+            if len(items) > 1:
+                llm_result = self._run_fan_out(phase, fan_out, items, input_data, context, template, model_config,
+                                               history, phase_name, structured, deadline)
+                prompt = llm_result['prompt']
+                if not fan_out.get('reduce_task'):
+                    # Parts are extracted one by one; the merged output carries no tag
+                    tag = None
+            else:
+                llm_result = self.llm.complete(prompt, system_prompt=system_prompt, model_config=model_config,
+                                               phase_name=phase_name, stream=stream, on_chunk=on_chunk, history=history,
+                                               max_continuations=self.max_continuations,
+                                               hedge=self.hedge_policy(phase, template), stop_when=stop_when,
+                                               deadline=deadline)
+            raw_response = llm_result['content']
+        except DeadlineExceeded as e:
+            return self._timed_out(phase, str(e), phase_started)
         except LLMError as e:
             print(f"❌ Error comunicando con LLM: {e}")
             return None
@@ -72,7 +358,14 @@ class PAEPEngine:
             return None
 
         # Extract content from tags
-        content = extract_content_from_tags(raw_response, phase_tags, phase['id'])
+        content = extract_content_from_tags(raw_response, phase_tags, phase['id'], structured=structured)
+        tag_found = None
+        if tag:
+            tag_found = extract_tagged_content(raw_response, tag) is not None
+            if not tag_found:
+                print(f"⚠️  Fase {phase['id']}: la respuesta no contiene <{tag}>, se usa completa")
+            elif llm_result['metrics'].get('early_stop'):
+                print(f"🛑 Fase {phase['id']}: </{tag}> recibido, generación detenida")
         
         if not content:
             print(f"❌ No se recibió contenido válido del LLM para Fase {phase['id']}")
@@ -82,21 +375,193 @@ class PAEPEngine:
             print("-" * 40)
             return None
 
-        # Store the raw content
-        self.phase_outputs[phase['id']] = content
+        if on_chunk and self.max_workers == 1 and not self.verbose:
+            print("\n" + "-" * 40)
 
+        metrics = dict(llm_result['metrics'], max_tokens=model_config.get('max_tokens', 4096), tag_found=tag_found,
+                       context_tokens_est=context_tokens, context_build_s=context_build_s,
+                       prompt_chars=len(prompt), prompt_tokens_est=estimate_tokens(prompt))
+        if metrics.get('ttft_s') is not None and not metrics.get('cache_hit'):
+            speed = f", {metrics['tokens_per_s']:.1f} tok/s" if metrics.get('tokens_per_s') else ""
+            print(f"⏱️  Fase {phase['id']}: primer token en {metrics['ttft_s']:.2f}s{speed}")
         print(f"✅ Fase {phase['id']} completada")
         
-        # Verbose: pause between phases for analysis
-        if self.verbose and phase['id'] != '6':  # Don't pause after the last phase
+        return {"processed_output": content, "full_prompt": prompt, "raw_response": raw_response, "metrics": metrics}
+
+    @staticmethod
+    def _timed_out(phase: Dict[str, Any], reason: str, started: float) -> Dict[str, Any]:
+        """Result of a phase abandoned at its deadline (see on_timeout in run_analysis)."""
+        print(f"⏰ Fase {phase['id']}: {reason}")
+        return {"timed_out": True, "error": reason, "metrics": {"timed_out": True, "wall_s": time.perf_counter() - started}}
+
+    @staticmethod
+    def _tag_stop(tag: Optional[str]):
+        """``stop_when`` callback that ends the generation at ``</tag>`` (None without a tag)."""
+        if not tag:
+            return None
+        parser = TagStreamParser(tag)
+
+        def stop_when(piece: str) -> bool:
+            parser.feed(piece)
+            return parser.closed
+
+        return stop_when
+
+    def _fan_out_items(self, phase: Dict[str, Any], spec: Dict[str, Any], user_question: str, template: Dict[str, Any],
+                       model_config: Dict[str, Any], outputs: Dict[str, str],
+                       deadline: Optional[Deadline] = None) -> List[str]:
+        """Items a fan-out phase is split into (an empty list runs the phase as a single request)."""
+        source = fan_out_source(spec)
+        max_items = spec.get('max_items', DEFAULT_MAX_ITEMS)
+        if source == 'items':
+            items = [str(item) for item in spec.get('items') or []][:max_items]
+        elif source == 'from_phase':
+            items = parse_list_items(outputs.get(str(spec.get('from_phase'))), max_items)
+        elif source == 'concepts':
+            question = outputs.get('A') or user_question
+            prompt = CONCEPTS_PROMPT.format(max_items=max_items, question=question)
             try:
-                input(f"🔍 Presiona ENTER para continuar a la siguiente fase...")
-                print()
-            except KeyboardInterrupt:
-                print("\n⏹️ Análisis interrumpido por el usuario")
+                listing = self.llm.send(prompt, system_prompt=template.get('system_prompt', ''),
+                                        model_config=dict(model_config, max_tokens=256, configured_max_tokens=256),
+                                        phase_name=f"Conceptos Fase {phase['id']}", deadline=deadline)
+            except DeadlineExceeded:
                 raise
-        
-        return {"processed_output": content, "full_prompt": prompt, "raw_response": raw_response}
+            except LLMError as e:
+                print(f"⚠️  Fase {phase['id']}: no se pudieron listar los conceptos ({e})")
+                listing = None
+            items = parse_list_items(listing, max_items)
+        else:
+            print(f"⚠️  Fase {phase['id']}: origen de fan-out desconocido '{source}'")
+            items = []
+        if len(items) < 2:
+            print(f"⚠️  Fase {phase['id']}: fan-out sin suficientes elementos, se ejecuta como una sola petición")
+            return []
+        return items
+
+    def _run_fan_out(self, phase: Dict[str, Any], spec: Dict[str, Any], items: List[str], input_data: Dict[str, Any],
+                     context: str, template: Dict[str, Any], model_config: Dict[str, Any],
+                     history: Optional[List[Dict[str, str]]], phase_name: str, structured: bool,
+                     deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Run one sub-request per item concurrently and merge them (with ``reduce_task``, in one more call)."""
+        phase_tags = template.get('phase_tags', {})
+        system_prompt = template.get('system_prompt', '')
+        tag = phase_tags.get(phase['id']) if structured else None
+        started = time.perf_counter()
+        print(f"🧩 Fase {phase['id']}: fan-out en {len(items)} partes")
+
+        def run_part(index: int, item: str) -> Dict[str, Any]:
+            prompt = build_prompt(item_phase(phase, item, spec.get('item_task')), input_data, "", context, phase_tags,
+                                  structured=structured)
+            result = self.llm.complete(prompt, system_prompt=system_prompt, model_config=model_config,
+                                       phase_name=f"{phase_name} [{index}/{len(items)}]", history=history,
+                                       max_continuations=self.max_continuations, stop_when=self._tag_stop(tag),
+                                       deadline=deadline)
+            return dict(result, prompt=prompt)
+
+        workers = max(1, min(len(items), spec.get('max_workers', len(items))))
+        parts: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(contextvars.copy_context().run, run_part, index, item): index - 1
+                       for index, item in enumerate(items, start=1)}
+            for future in as_completed(futures):
+                position = futures[future]
+                try:
+                    parts[position] = future.result()
+                except LLMError as e:
+                    print(f"⚠️  Fase {phase['id']}: parte '{items[position]}' falló: {e}")
+                    continue
+                print(f"🧩 Fase {phase['id']}: parte {position + 1}/{len(items)} completada ({items[position]})")
+
+        done = [(item, part) for item, part in zip(items, parts)
+                if part and extract_content_from_tags(part['content'], phase_tags, phase['id'], structured=structured)]
+        if not done:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(f"{deadline.reason()} antes de completar ninguna parte del fan-out")
+            raise LLMError(f"todas las partes del fan-out de la Fase {phase['id']} fallaron")
+        done_items = [item for item, _ in done]
+        contents = [extract_content_from_tags(part['content'], phase_tags, phase['id'], structured=structured)
+                    for _, part in done]
+        part_metrics = [part['metrics'] for _, part in done]
+
+        reduce_task = spec.get('reduce_task')
+        if reduce_task:
+            print(f"🧩 Fase {phase['id']}: integrando {len(done)} partes...")
+            reduce_context = "\n\n".join(block for block in (context, parts_context(done_items, contents)) if block)
+            prompt = build_prompt(dict(phase, task=reduce_task), input_data, "", reduce_context, phase_tags,
+                                  structured=structured)
+            reduced = self.llm.complete(prompt, system_prompt=system_prompt, model_config=model_config,
+                                        phase_name=f"{phase_name} [integración]", history=history,
+                                        max_continuations=self.max_continuations, stop_when=self._tag_stop(tag),
+                                        deadline=deadline)
+            content = reduced['content']
+            part_metrics.append(reduced['metrics'])
+        else:
+            prompt = "\n\n".join(part['prompt'] for _, part in done)
+            content = merge_parts(done_items, contents)
+
+        metrics: Dict[str, Any] = {key: sum(m.get(key) or 0 for m in part_metrics) for key in ADDITIVE_METRICS}
+        elapsed = time.perf_counter() - started
+        metrics.update(wall_s=elapsed, request_s=elapsed, streamed=False, fan_out=len(done), fan_out_items=done_items,
+                       reduce=bool(reduce_task), model=part_metrics[0].get('model'),
+                       cache_hit=all(m.get('cache_hit') for m in part_metrics),
+                       early_stop=bool(reduce_task) and bool(part_metrics[-1].get('early_stop')),
+                       usage_estimated=any(m.get('usage_estimated') for m in part_metrics))
+        return {"content": content, "finish_reason": "fan_out", "metrics": metrics, "prompt": prompt}
+
+    def _ensure_summaries(self, depends_on: Optional[List[str]], max_tokens: int, template: Dict[str, Any]) -> None:
+        """Summarize the oldest context phases until the estimated context fits the budget."""
+        phase_ids = [pid for pid in (depends_on if depends_on is not None else list(self.phase_outputs)) if pid in self.phase_outputs]
+        sizes = {pid: estimate_tokens(self.phase_outputs[pid]) for pid in phase_ids}
+        total = sum(sizes.values())
+        for phase_id in phase_ids:
+            if total <= max_tokens:
+                return
+            if phase_id == 'A':
+                continue
+            summary = self.summarize_phase(phase_id, template)
+            if summary:
+                total -= sizes[phase_id] - estimate_tokens(summary)
+
+    def summarize_phase(self, phase_id: str, template: Dict[str, Any]) -> Optional[str]:
+        """Return the cached summary of a phase output, generating it once if needed."""
+        lock = self._summary_locks.setdefault(phase_id, threading.Lock())
+        with lock:
+            if phase_id in self.phase_summaries:
+                return self.phase_summaries[phase_id]
+            task = template.get('summary_task', DEFAULT_SUMMARY_TASK)
+            prompt = f"{task}\n\n=== FASE {phase_id} ===\n{self.phase_outputs[phase_id]}"
+            model_config = dict(template.get('model_config') or {}, max_tokens=template.get('summary_max_tokens', 512))
+            print(f"🗜️  Resumiendo Fase {phase_id} para compactar el contexto...")
+            try:
+                summary = self.llm.send(prompt, system_prompt=template.get('system_prompt', ''), model_config=model_config,
+                                        phase_name=f"Resumen Fase {phase_id}")
+            except LLMError as e:
+                print(f"⚠️  No se pudo resumir la Fase {phase_id}: {e}")
+                return None
+            if summary and summary.strip():
+                self.phase_summaries[phase_id] = summary.strip()
+            return self.phase_summaries.get(phase_id)
+
+    def _stream_writer(self, phase: Dict[str, Any]):
+        """Return a chunk callback that appends to the session stream file and echoes live output."""
+        path = os.path.join(self.output_dir, f"paep_resultado_{self.session_id}.stream.md")
+        # Live echo only makes sense when a single phase is generating at a time
+        echo = self.max_workers == 1 and not self.verbose
+        started = [False]
+
+        def on_chunk(piece: str) -> None:
+            with self._stream_lock:
+                with open(path, 'a', encoding='utf-8') as f:
+                    if not started[0]:
+                        f.write(f"\n## Fase {phase['id']}: {phase.get('name', '')}\n\n")
+                    f.write(piece)
+            if echo:
+                if not started[0]:
+                    print("-" * 40)
+                print(piece, end="", flush=True)
+            started[0] = True
+
+        return on_chunk
 
     def validate_reformulation(self, reformulation: str, template: Dict[str, Any]) -> str:
         """Validate and potentially refine the reformulation with user feedback."""
@@ -163,12 +628,13 @@ class PAEPEngine:
             
             # Build prompt using the same logic as Phase A (no context for refinement)
             from .prompting import build_prompt
-            prompt = build_prompt(phase_a, input_data, "", "", phase_tags)
+            structured = bool(template.get('structured_output'))
+            prompt = build_prompt(phase_a, input_data, "", "", phase_tags, structured=structured)
             
             # Send to LLM using same system prompt and config as template
             system_prompt = template.get('system_prompt', '')
             raw_response = self.llm.send(prompt, system_prompt=system_prompt, 
-                                       model_config=template.get('model_config'), 
+                                       model_config=self.phase_model_config(phase_a, template), 
                                        phase_name="Refinamiento de Reformulación")
             
             if not raw_response:
@@ -177,7 +643,7 @@ class PAEPEngine:
             
             # Extract content using the same extraction logic as other phases
             from .prompting import extract_content_from_tags
-            content = extract_content_from_tags(raw_response, phase_tags, "A")
+            content = extract_content_from_tags(raw_response, phase_tags, "A", structured=structured)
             
             if not content:
                 print("❌ No se recibió contenido válido del LLM para el refinamiento")
@@ -204,87 +670,268 @@ class PAEPEngine:
         self.original_user_question = user_question
 
         results = {"session_id": self.session_id, "user_question": user_question, "template_name": template.get('template_name'), "timestamp": datetime.now().isoformat(), "phases": {}}
+        if self._resumed_results is not None:
+            results = self._resumed_results
+            self._resumed_results = None
+            results['resumed_at'] = datetime.now().isoformat()
+            # Phases that timed out before run again, and so do the phases computed without them
+            results.pop('timeouts', None)
+            degraded = [pid for pid, data in results['phases'].items() if data.get('degraded')]
+            for phase_id in degraded:
+                del results['phases'][phase_id]
+                self.phase_outputs.pop(phase_id, None)
+            if degraded:
+                print(f"♻️  Fases calculadas sin una dependencia con plazo agotado, se recalculan: {', '.join(degraded)}")
+        completed = set(results['phases'])
+        results['execution_mode'] = 'conversacion' if self.conversation_mode else 'contexto'
+
+        phases = template.get('phases', [])
+        scheduled_phases = phases
+        if self.conversation_mode:
+            # Strict template order: every phase sees all previous turns
+            scheduled_phases = [dict(phase, depends_on=None) for phase in phases]
+            self.conversation_turns = []
+            for phase in phases:
+                if phase['id'] in completed:
+                    self._append_turn(materialize_prompt(results['phases'], phase['id']),
+                                      phase_field(results['phases'][phase['id']], 'output'))
+        try:
+            scheduler = PhaseScheduler(scheduled_phases, max_workers=self.max_workers)
+        except SchedulerError as e:
+            print(f"❌ Template inválido: {e}")
+            return results
+
+        if self.max_workers > 1:
+            print(f"⚡ Ejecución concurrente: {len(phases)} fases, ruta crítica de {critical_path_length(phases, scheduler.deps)} (máx. {self.max_workers} en paralelo)")
 
-        for phase in template.get('phases', []):
-            phase_result = self.execute_phase(phase, user_question, template)
+        last_phase_id = phases[-1]['id'] if phases else None
+        timeout_policy = self.timeout_policy(template)
+        # Always set, so a fail-fast timeout can cancel the phases still running
+        self._session_deadline = Deadline(timeout_policy.get('session_s'), label="la sesión")
+        if timeout_policy.get('session_s') or timeout_policy.get('phase_s'):
+            print(f"⏰ Plazos: sesión {timeout_policy.get('session_s') or '∞'}s, fase {timeout_policy.get('phase_s') or '∞'}s "
+                  f"(al agotarse: {timeout_policy.get('on_timeout', 'continue')})")
+        self._emit('start_session', results, template)
+        speculation: Optional[Speculation] = None
+
+        def run_phase(phase: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            # Dependencies are published before a phase is scheduled, so the hash is final here
+            input_hash = self.phase_input_hash(phase, user_question, template, scheduler.deps[phase['id']])
+            phase_result = self._reused_result(phase, input_hash)
+            adopted = speculation.take(phase['id']) if speculation and phase_result is None else None
+            if adopted:
+                phase_result, log = adopted
+                block = f"{log}⚡ Fase {phase['id']}: resultado especulativo reutilizado\n"
+                with self._console_lock:
+                    sys.stdout.write(block)
+                    sys.stdout.flush()
+                phase_result['metrics']['speculative'] = True
+            if phase_result is None and self.phase_memo is not None:
+                phase_result = self._shared_phase(phase, user_question, template, scheduler.deps[phase['id']],
+                                                  input_hash)
+            elif phase_result is None:
+                phase_result = self.execute_phase(phase, user_question, template, scheduler.deps[phase['id']])
+            if phase_result is not None:
+                phase_result['input_hash'] = input_hash
+            return phase_result
+
+        def start_speculation(proposal: str) -> Optional[Speculation]:
+            if not self.speculative or self.auto_approve or self.verbose or self.conversation_mode:
+                return None
+            # Phases blocked only on Phase A (and phases already done)
+            done = set(results['phases']) | {'A'}
+            candidates = [p for p in phases if p['id'] not in done and 'A' in scheduler.deps[p['id']]
+                          and set(scheduler.deps[p['id']]) <= done][:self.max_workers]
+            if not candidates:
+                return None
+            spec = Speculation(
+                lambda phase, outputs, deadline: self.execute_phase(phase, user_question, template,
+                                                                    scheduler.deps[phase['id']], phase_outputs=outputs,
+                                                                    stream=False, deadline=deadline),
+                'A', proposal, self.phase_outputs, max_workers=self.max_workers, deadline=self._session_deadline)
+            spec.start(candidates)
+            return spec
+
+        def on_complete(phase: Dict[str, Any], phase_result: Optional[Dict[str, Any]]) -> bool:
+            nonlocal speculation
             if phase_result is None:
                 print(f"❌ Error en Fase {phase['id']}, deteniendo análisis")
-                break
+                return False
+            if phase_result.get('timed_out'):
+                results.setdefault('timeouts', {})[phase['id']] = {'error': phase_result['error'],
+                                                                   'wall_s': phase_result['metrics']['wall_s']}
+                # Without Phase A (the reformulated question) the rest of the analysis has no subject
+                if (self._session_deadline.expired() or timeout_policy.get('on_timeout') == 'fail_fast'
+                        or phase['id'] == 'A'):
+                    print("⏰ Deteniendo análisis: se cancelan las fases en curso")
+                    # Running phases give up at their next check (HTTP timeout, chunk or retry)
+                    self._session_deadline.cancel()
+                    return False
+                # The phase counts as finished without output, so its dependents run without it
+                print(f"⏭️  Fase {phase['id']} sin resultado por plazo agotado, el análisis continúa")
+                return True
 
             input_data = self.build_phase_input(phase, user_question)
             content_output = phase_result['processed_output']
 
-            # Special handling for Phase A - validate reformulation with user
-            if phase['id'] == 'A':
-                validated_reformulation = self.validate_reformulation(content_output, template)
-                # Update the phase output with the validated reformulation
-                content_output = validated_reformulation
-                self.phase_outputs['A'] = validated_reformulation
+            # Special handling for Phase A - validate reformulation with user (a reused or edited one was already validated)
+            reused = phase_result['metrics'].get('reused_from') or phase_result['metrics'].get('edited')
+            if phase['id'] == 'A' and not reused:
+                proposal = content_output
+                speculation = start_speculation(proposal)
+                content_output = self.validate_reformulation(content_output, template)
+                if speculation and not speculation.resolve(content_output):
+                    print(f"🗑️  Reformulación modificada: descartando {speculation.stats['discarded']} fase(s) especulativa(s)")
 
-            results['phases'][phase['id']] = {
+            # Dependencies that timed out, directly or upstream, are missing from this phase's context
+            missing = set()
+            for dep in scheduler.deps[phase['id']]:
+                if dep in results.get('timeouts', {}):
+                    missing.add(dep)
+                missing.update(results['phases'].get(dep, {}).get('degraded', []))
+            degraded = [p['id'] for p in phases if p['id'] in missing]
+            if degraded:
+                print(f"⚠️  Fase {phase['id']} calculada sin la(s) fase(s) {', '.join(degraded)} (plazo agotado); "
+                      f"--resume la recalculará")
+
+            # Outputs are published from this (main) thread so dependents see them once scheduled
+            self.phase_outputs[phase['id']] = content_output
+            if self.conversation_mode:
+                self._append_turn(phase_result['full_prompt'], content_output)
+
+            metrics = dict(phase_result['metrics'], queue_wait_s=scheduler.queue_wait(phase['id']),
+                           phase_wall_s=scheduler.run_time(phase['id']))
+            # The prompt is stored as references to the outputs it embeds (see compact.py)
+            earlier_outputs = {pid: text for pid, text in self.phase_outputs.items() if pid != phase['id']}
+            entry = {
                 'name': phase['name'],
                 'input': input_data,
                 'output': content_output,
-                'full_prompt_sent': phase_result['full_prompt'],
-                'raw_llm_response': phase_result['raw_response']
+                'prompt_ref': prompt_reference(phase_result['full_prompt'], earlier_outputs),
+                'input_hash': phase_result.get('input_hash'),
+                'output_hash': output_hash(content_output),
+                'metrics': metrics
             }
+            if (phase_result['raw_response'] or '').strip() != content_output:
+                entry['raw_llm_response'] = phase_result['raw_response']
+            if degraded:
+                entry['degraded'] = degraded
+            results['phases'][phase['id']] = entry
+            if self.metrics_exporter:
+                self.metrics_exporter.phase_completed(self.session_id, results.get('template_name') or 'unknown',
+                                                      phase['id'], metrics)
+
+            self._record_phase_history(phase, template, phase_result)
+            self._emit('write_phase', results, template, phase['id'])
+            self._checkpoint(results, template)
+            if self.spill_dir:
+                try:
+                    spill_phase(results, phase['id'], self.spill_dir, self.spill_threshold)
+                except OSError as e:
+                    print(f"⚠️  No se pudo volcar a disco la Fase {phase['id']}: {e}")
+
+            # Verbose: pause between phases for analysis
+            if self.verbose and phase['id'] != last_phase_id:  # Don't pause after the last phase
+                try:
+                    input(f"🔍 Presiona ENTER para continuar a la siguiente fase...")
+                    print()
+                except KeyboardInterrupt:
+                    print("\n⏹️ Análisis interrumpido por el usuario")
+                    raise
+            return True
+
+        if completed:
+            print(f"⏭️  Fases ya completadas: {', '.join(p['id'] for p in phases if p['id'] in completed)}")
+        session_started = time.perf_counter()
+        try:
+            scheduler.run(run_phase, on_complete, completed=completed)
+        finally:
+            if speculation:
+                speculation.close()
+                results['speculation'] = dict(speculation.stats)
+
+        # Keep results in template order regardless of completion order
+        results['phases'] = {p['id']: results['phases'][p['id']] for p in phases if p['id'] in results['phases']}
+
+        if self.base_session_id:
+            reused = [pid for pid, data in results['phases'].items() if data['metrics'].get('reused_from')]
+            edited = [pid for pid, data in results['phases'].items() if data['metrics'].get('edited')]
+            recomputed = [pid for pid in results['phases'] if pid not in reused and pid not in edited]
+            results['incremental'] = {'base_session': self.base_session_id, 'reused': reused, 'edited': edited,
+                                      'recomputed': recomputed}
+            print(f"🧬 Recomputación incremental: {len(recomputed)} fase(s) recalculada(s), {len(reused)} reutilizada(s)"
+                  + (f", {len(edited)} editada(s)" if edited else ""))
+
+        results['usage'] = usage_totals(results)
+        results['rate_limiting'] = sum_phase_metrics(results, ('retries', 'throttle_wait_s', 'backoff_wait_s'))
+        results['metrics'] = session_metrics(results, time.perf_counter() - session_started)
+        results['metrics']['totals']['handshake_saved_s'] = self.llm.take_handshake_saved()
+        results['metrics']['transport'] = dict(self.llm.transport_stats)
+        if results['metrics']['totals']['handshake_saved_s']:
+            print(f"🔌 Conexión precalentada: {results['metrics']['totals']['handshake_saved_s'] * 1000:.0f} ms de "
+                  f"handshake ahorrados en la primera petición")
+        usage = results['usage']
+        if usage['prompt_tokens']:
+            estimated = [pid for pid, data in results['phases'].items() if data['metrics'].get('usage_estimated')]
+            print(f"💰 Tokens de prompt: {usage['prompt_tokens']} enviados, {usage['cached_prompt_tokens']} en caché del proveedor "
+                  f"({usage['cached_ratio']:.0%}), {usage['completion_tokens']} generados"
+                  + (f" (estimados en fase(s) {', '.join(estimated)})" if estimated else ""))
+        limits = results['rate_limiting']
+        if limits['retries'] or limits['throttle_wait_s']:
+            print(f"🚦 Reintentos: {limits['retries']}, espera por límite de tasa: {limits['throttle_wait_s']:.1f}s, "
+                  f"espera por backoff: {limits['backoff_wait_s']:.1f}s")
+
+        slowest = results['metrics']['slowest_phase']
+        if slowest:
+            print(f"🐢 Fase más lenta: {slowest} ({results['metrics']['phases'][slowest].get('wall_s', 0):.2f}s de LLM)")
+
+        if results.get('timeouts'):
+            results['metrics']['totals']['timeouts'] = len(results['timeouts'])
+            print(f"⏰ Fases con plazo agotado: {', '.join(results['timeouts'])}")
+            degraded = [pid for pid, data in results['phases'].items() if data.get('degraded')]
+            if degraded:
+                print(f"⚠️  Fases calculadas sin ellas: {', '.join(degraded)}")
+
+        all_done = len(results['phases']) == len(phases)
+        status = "completado" if all_done else "incompleto"
+        self._checkpoint(results, template, status=status)
+        if self.metrics_exporter:
+            try:
+                self.metrics_exporter.session_finished(results, status)
+            except OSError as e:
+                print(f"⚠️  Error exportando métricas: {e}")
+        if not all_done:
+            print(f"💡 Para continuar más tarde: --resume {self.session_id}")
 
         print("\n" + "=" * 80)
         print("🎉 ¡Análisis PAEP-R completado!")
-        self.save_results(results)
+        output_files = self._emit('finish_session', results, template, status)
+        for path in output_files:
+            print(f"💾 Resultados guardados en: {os.path.abspath(path)}")
+        results['output_files'] = output_files
+        results['output_file'] = output_files[0] if output_files else None
         return results
 
-    def save_results(self, results: Dict[str, Any]) -> None:
-        filename = f"paep_resultado_{self.session_id}.md"
-        
-        # Use PAEP_OUTPUT_DIR if set (from global command), otherwise current directory
-        output_dir = os.environ.get('PAEP_OUTPUT_DIR', '.')
-        filepath = os.path.join(output_dir, filename)
-        
+    def _append_turn(self, prompt: str, output: str) -> None:
+        self.conversation_turns.append({"role": "user", "content": prompt})
+        self.conversation_turns.append({"role": "assistant", "content": output})
+
+    def _checkpoint(self, results: Dict[str, Any], template: Dict[str, Any], status: str = "en_progreso") -> None:
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                # Header
-                f.write(f"# Análisis PAEP-R: {results.get('user_question', 'N/A')}\n\n")
-                f.write(f"**Session ID:** {results.get('session_id', 'N/A')}\n")
-                f.write(f"**Timestamp:** {results.get('timestamp', 'N/A')}\n")
-                f.write(f"**Template:** {results.get('template_name', 'N/A')}\n\n")
-                f.write("---\n\n")
-                
-                # Phase results
-                phase_tags = {
-                    'A': 'encuadre_contextual',
-                    '0': 'corrientes_internas', 
-                    '1': 'deconstruccion_radical',
-                    '2': 'inmersion_conceptual',
-                    '3': 'conexiones_disruptivas',
-                    '4': 'tesis_provocativa',
-                    '5': 'auto_critica',
-                    '6': 'legado_ruina'
-                }
-                
-                phase_names = {
-                    'A': 'Re-encuadre Contextual & Identificación de Umbrales Críticos',
-                    '0': 'Inyección de Conocimiento Fundacional (Corrientes Internas)',
-                    '1': 'Destrucción de Supuestos (Deconstrucción Radical)',
-                    '2': 'Inmersión en Abismos Conceptuales (Profundización Disciplinar)',
-                    '3': 'Persecución de Fantasmas Teóricos (Conexiones Forzadas Disruptivas)',
-                    '4': 'Síntesis de un Monstruo Lógico (Tesis Provocativa)',
-                    '5': 'Autopsia de la Propia Tesis (Stress-Test Incisivo)',
-                    '6': 'Legado de la Ruina (Implicaciones y Conclusión)'
-                }
-                
-                phases = results.get('phases', {})
-                for phase_id in ['A', '0', '1', '2', '3', '4', '5', '6']:
-                    if phase_id in phases:
-                        phase_data = phases[phase_id]
-                        phase_name = phase_names.get(phase_id, f'Fase {phase_id}')
-                        tag_name = phase_tags.get(phase_id, f'fase_{phase_id}')
-                        
-                        f.write(f"## Fase {phase_id}: {phase_name}\n\n")
-                        f.write(f"### {tag_name.replace('_', ' ').title()}\n\n")
-                        f.write(f"{phase_data.get('output', 'Sin contenido')}\n\n")
-                        f.write("---\n\n")
-                
-            print(f"💾 Resultados guardados en: {os.path.abspath(filepath)}")
-        except Exception as e:
-            print(f"⚠️  Error guardando resultados: {e}")
+            self.journal.save(results, template, self.phase_outputs, self.original_user_question, status,
+                              summaries=self.phase_summaries)
+        except (OSError, TypeError) as e:
+            print(f"⚠️  Error guardando el journal de la sesión: {e}")
+
+    def _emit(self, method: str, *args) -> List[str]:
+        """Call ``method`` on every result sink; a failing sink never stops the analysis."""
+        paths = []
+        for sink in self.sinks:
+            try:
+                path = getattr(sink, method)(*args)
+            except Exception as e:
+                print(f"⚠️  Error guardando resultados ({sink.name}): {e}")
+                continue
+            if path:
+                paths.append(path)
+        return paths
@@ -0,0 +1,71 @@
+"""Map-reduce fan-out of a phase: one sub-request per item, merged by concatenation or a reduce call.
+
+A phase opts in with a ``fan_out`` block in the template::
+
+    "fan_out": {
+        "source": "concepts",          # or "items" / "from_phase"
+        "items": ["...", "..."],       # source "items": fixed list
+        "from_phase": "0",             # source "from_phase": list items of that phase's output
+        "max_items": 4,
+        "max_workers": 4,
+        "item_task": "{task} ... {item}",
+        "reduce_task": "..."           # optional: merge the parts with one more call
+    }
+
+With ``source: "concepts"`` a short LLM call lists the central concepts of the
+reformulated question.
+"""
+import re
+from typing import Dict, Any, List, Optional
+
+FAN_OUT_SOURCES = ("concepts", "items", "from_phase")
+
+DEFAULT_MAX_ITEMS = 4
+
+DEFAULT_ITEM_TASK = "{task}\n\nEn esta parte desarrolla únicamente: {item}"
+
+CONCEPTS_PROMPT = (
+    "Enumera los conceptos centrales de la siguiente pregunta, uno por línea, sin numeración ni explicaciones "
+    "(máximo {max_items}):\n\n{question}"
+)
+
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+def fan_out_source(spec: Dict[str, Any]) -> str:
+    if spec.get('source'):
+        return spec['source']
+    if spec.get('items'):
+        return "items"
+    if spec.get('from_phase'):
+        return "from_phase"
+    return "concepts"
+
+
+def parse_list_items(text: Optional[str], max_items: int = DEFAULT_MAX_ITEMS) -> List[str]:
+    """Items of a bulleted or numbered list (every non-empty line if there is no list)."""
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    bulleted = [line for line in lines if _BULLET_RE.match(line)]
+    items = []
+    for line in bulleted or lines:
+        item = _BULLET_RE.sub("", line).strip().strip("*").strip()
+        if item and item not in items:
+            items.append(item)
+    return items[:max(1, max_items)]
+
+
+def item_phase(phase: Dict[str, Any], item: str, item_task: Optional[str] = None) -> Dict[str, Any]:
+    """Copy of ``phase`` whose task is restricted to ``item``."""
+    task = (item_task or DEFAULT_ITEM_TASK).format(task=phase.get('task', ''), item=item)
+    return dict(phase, task=task)
+
+
+def parts_context(items: List[str], contents: List[str]) -> str:
+    """Context block with every part, for the reduce call."""
+    return "\n\n".join(f"=== PARTE {index}: {item} ===\n{content}"
+                       for index, (item, content) in enumerate(zip(items, contents), start=1))
+
+
+def merge_parts(items: List[str], contents: List[str]) -> str:
+    """Phase output without a reduce call: the parts under one heading each."""
+    return "\n\n".join(f"### {item}\n\n{content}" for item, content in zip(items, contents))
@@ -0,0 +1,119 @@
+"""Per template phase history of output lengths and latencies.
+
+Output lengths size ``max_tokens`` adaptively; latencies decide when a slow
+request is hedged with a duplicate.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from .cache import DEFAULT_CACHE_DIR
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class _PhaseSamples:
+    """SQLite table of numeric samples per (template, phase), keeping only the most recent ones."""
+
+    filename = ""
+    table = ""
+    column = "value"
+    value_type = "REAL"
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_samples: int = 200):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, self.filename)
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            " template TEXT NOT NULL,"
+            " phase TEXT NOT NULL,"
+            f" {self.column} {self.value_type} NOT NULL,"
+            " recorded_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table} ON {self.table} (template, phase, recorded_at)")
+        self._conn.commit()
+
+    def _record(self, template: str, phase: str, value: float) -> None:
+        with self._lock:
+            self._conn.execute(f"INSERT INTO {self.table} VALUES (?, ?, ?, ?)", (template, phase, value, time.time()))
+            # Keep only the most recent samples so the estimate follows template changes
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE template = ? AND phase = ? AND recorded_at < ("
+                f" SELECT MIN(recorded_at) FROM (SELECT recorded_at FROM {self.table}"
+                " WHERE template = ? AND phase = ? ORDER BY recorded_at DESC LIMIT ?))",
+                (template, phase, template, phase, self.max_samples))
+            self._conn.commit()
+
+    def samples(self, template: str, phase: str) -> List[float]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {self.column} FROM {self.table} WHERE template = ? AND phase = ?",
+                                      (template, phase)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class OutputLengthHistory(_PhaseSamples):
+    """Completion tokens per (template, phase).
+
+    ``max_tokens_for`` returns a high percentile of the recorded lengths plus
+    headroom, never above the configured limit, once enough samples exist.
+    """
+
+    filename = "output_lengths.sqlite3"
+    table = "output_lengths"
+    column = "completion_tokens"
+    value_type = "INTEGER"
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, percentile: float = 95.0, headroom: float = 1.25,
+                 min_samples: int = 5, max_samples: int = 200, floor: int = 256):
+        super().__init__(cache_dir, max_samples)
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.floor = floor
+
+    def record(self, template: str, phase: str, completion_tokens: int) -> None:
+        self._record(template, phase, int(completion_tokens))
+
+    def max_tokens_for(self, template: str, phase: str, configured: int) -> Optional[int]:
+        """Adaptive limit for a phase, or None while there is not enough history."""
+        samples = self.samples(template, phase)
+        if len(samples) < self.min_samples:
+            return None
+        suggested = percentile(samples, self.percentile) * self.headroom
+        # Round up to a multiple of 64 to avoid a different limit (and cache key) on every run
+        suggested = int(math.ceil(suggested / 64.0) * 64)
+        return min(configured, max(self.floor, suggested))
+
+
+class LatencyHistory(_PhaseSamples):
+    """Seconds per LLM request of each (template, phase), excluding throttle and backoff waits."""
+
+    filename = "phase_latencies.sqlite3"
+    table = "phase_latencies"
+    column = "request_s"
+
+    def record(self, template: str, phase: str, request_s: float) -> None:
+        self._record(template, phase, float(request_s))
+
+    def latency_percentile(self, template: str, phase: str, pct: float, min_samples: int) -> Optional[float]:
+        """``pct`` percentile of the phase's request time, or None while there is not enough history."""
+        samples = self.samples(template, phase)
+        if len(samples) < min_samples:
+            return None
+        return percentile(samples, pct)
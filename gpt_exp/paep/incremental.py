@@ -0,0 +1,42 @@
+"""Content hashes of phase inputs, used to reuse unchanged phases from a previous session.
+
+A phase's input hash covers everything that shapes its LLM request: the phase
+definition (task and options), the system prompt, the model config, the context
+settings, its input data and the output hashes of the phases in its context.
+Editing a task or an upstream output therefore changes the hash of that phase
+and of everything downstream, and nothing else.
+"""
+import hashlib
+import json
+from typing import Dict, Any
+
+# Phase fields that never reach the LLM request (dependencies are covered by the output hashes)
+_IGNORED_PHASE_KEYS = ('name', 'depends_on')
+
+
+def _digest(payload: Any) -> str:
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def output_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def phase_input_hash(phase: Dict[str, Any], template: Dict[str, Any], input_data: Dict[str, Any],
+                     dependency_hashes: Dict[str, str], execution_mode: str = "contexto") -> str:
+    payload = {
+        "phase": {key: value for key, value in phase.items() if key not in _IGNORED_PHASE_KEYS},
+        "system_prompt": template.get('system_prompt', ''),
+        "model_config": template.get('model_config') or {},
+        "context": {key: template.get(key) for key in ('max_context_tokens', 'context_strategy', 'summary_task',
+                                                       'summary_max_tokens')},
+        "tag": (template.get('phase_tags') or {}).get(phase['id']),
+        "input": input_data,
+        "dependencies": dependency_hashes,
+        "execution_mode": execution_mode,
+    }
+    # Only present when enabled, so hashes of sessions recorded before the option still match
+    if template.get('structured_output'):
+        payload["structured_output"] = True
+    return _digest(payload)
@@ -0,0 +1,55 @@
+"""Per-session journal so interrupted analyses can be resumed."""
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+
+JOURNAL_VERSION = 1
+
+
+class JournalError(Exception):
+    pass
+
+
+def journal_path(output_dir: str, session_id: str) -> str:
+    return os.path.join(output_dir, f"paep_sesion_{session_id}.json")
+
+
+class SessionJournal:
+    """Checkpoint file rewritten atomically after every completed phase."""
+
+    def __init__(self, output_dir: str, session_id: str):
+        self.path = journal_path(output_dir, session_id)
+
+    def save(self, results: Dict[str, Any], template: Dict[str, Any], phase_outputs: Dict[str, str],
+             original_question: str, status: str = "en_progreso", summaries: Optional[Dict[str, str]] = None) -> None:
+        state = {
+            "version": JOURNAL_VERSION,
+            "status": status,
+            "updated_at": datetime.now().isoformat(),
+            "original_user_question": original_question,
+            "template": template,
+            "phase_outputs": phase_outputs,
+            "phase_summaries": summaries or {},
+            "results": results,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        # Atomic replace: a crash mid-write never corrupts the previous checkpoint
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def load(output_dir: str, session_id: str) -> Dict[str, Any]:
+        path = journal_path(output_dir, session_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise JournalError(f"No existe el journal de la sesión {session_id}: {path}")
+        except json.JSONDecodeError as e:
+            raise JournalError(f"Journal corrupto ({path}): {e}")
+        if state.get("version") != JOURNAL_VERSION:
+            raise JournalError(f"Versión de journal no soportada: {state.get('version')}")
+        return state
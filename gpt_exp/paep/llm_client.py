@@ -1,21 +1,118 @@
-"""Light wrapper around Groq client for sending prompts to the LLM."""
-from typing import Optional, Dict, Any
-from groq import Groq
+"""Light wrapper around a pluggable LLM backend (Groq by default) for sending prompts."""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, Callable, List
+
+from .backends import LLMBackend, GroqBackend
+from .cache import ResponseCache, make_cache_key
+from .deadline import Deadline
+from .prompting import estimate_tokens
+from .ratelimit import RetryPolicy, RateLimiter, is_retryable, status_code_of
 
 
 class LLMError(Exception):
     pass
 
 
+class HedgeCancelled(Exception):
+    """Raised inside the losing request of a hedged pair to stop consuming its stream."""
+
+
+class DeadlineExceeded(LLMError):
+    """The request's deadline (phase timeout or session deadline) ran out or was cancelled."""
+
+
+CONTINUATION_PROMPT = "Continúa exactamente donde lo dejaste, sin repetir nada de lo anterior."
+
+# Metrics of a continuation request added to those of the original one
+ADDITIVE_METRICS = ("prompt_tokens", "completion_tokens", "total_tokens", "cached_prompt_tokens", "retries",
+                     "throttle_wait_s", "backoff_wait_s")
+
+
 class LLMClient:
-    def __init__(self, api_key: str, default_model: str = "openai/gpt-oss-120b", verbose: bool = False):
-        self.client = Groq(api_key=api_key)
+    def __init__(self, api_key: Optional[str] = None, default_model: str = "openai/gpt-oss-120b", verbose: bool = False,
+                 cache: Optional[ResponseCache] = None, retry_policy: Optional[RetryPolicy] = None,
+                 rate_limiter: Optional[RateLimiter] = None, backend: Optional[LLMBackend] = None):
+        self.backend = backend or GroqBackend(api_key)
         self.default_model = default_model
         self.verbose = verbose
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        # Connection warm-up: state, measured handshake and whether it finished before the first request
+        self.transport_stats: Dict[str, Any] = {"warm_up": "off"}
+        self._warm_up_thread: Optional[threading.Thread] = None
+        self._handshake_saved_s: Optional[float] = None
+        self._stats_lock = threading.Lock()
+
+    def start_warm_up(self) -> None:
+        """Open the backend connection in the background, e.g. while the user types the question."""
+        if self._warm_up_thread is not None:
+            return
+        self.transport_stats["warm_up"] = "en_curso"
+        self._warm_up_thread = threading.Thread(target=self._warm_up, name="paep-warmup", daemon=True)
+        self._warm_up_thread.start()
+
+    def _warm_up(self) -> None:
+        try:
+            info = self.backend.warm_up()
+        except Exception as e:
+            # Not fatal: the first request simply opens the connection itself
+            info = {"error": str(e)}
+        with self._stats_lock:
+            self.transport_stats.update(info or {})
+            self.transport_stats["warm_up"] = "fallido" if "error" in (info or {}) else ("ok" if info else "n/a")
+
+    def _note_first_request(self) -> None:
+        with self._stats_lock:
+            if self._handshake_saved_s is not None:
+                return
+            # A warm-up still in flight saves nothing: the first request opens a connection of its own
+            done = self.transport_stats["warm_up"] == "ok"
+            self._handshake_saved_s = self.transport_stats.get("handshake_s", 0.0) if done else 0.0
+            self.transport_stats["warm_before_first_request"] = done
+
+    def take_handshake_saved(self) -> float:
+        """Handshake time the warm-up took off the first request; reported once per client."""
+        with self._stats_lock:
+            saved = self._handshake_saved_s or 0.0
+            if self._handshake_saved_s is not None:
+                self._handshake_saved_s = 0.0
+            return saved
 
-    def send(self, prompt: str, system_prompt: str = "", model_config: Optional[Dict[str, Any]] = None, phase_name: str = "") -> Optional[str]:
+    def send(self, prompt: str, system_prompt: str = "", model_config: Optional[Dict[str, Any]] = None, phase_name: str = "",
+             stream: bool = False, on_chunk: Optional[Callable[[str], None]] = None,
+             history: Optional[List[Dict[str, str]]] = None, max_continuations: int = 0,
+             hedge: Optional[Dict[str, Any]] = None, stop_when: Optional[Callable[[str], bool]] = None,
+             deadline: Optional[Deadline] = None) -> Optional[str]:
         """Send prompt to the LLM and return raw content string (or None on failure)."""
-        
+        return self.complete(prompt, system_prompt, model_config, phase_name, stream=stream, on_chunk=on_chunk,
+                             history=history, max_continuations=max_continuations, hedge=hedge,
+                             stop_when=stop_when, deadline=deadline)['content']
+
+    def complete(self, prompt: str, system_prompt: str = "", model_config: Optional[Dict[str, Any]] = None, phase_name: str = "",
+                 stream: bool = False, on_chunk: Optional[Callable[[str], None]] = None,
+                 history: Optional[List[Dict[str, str]]] = None, max_continuations: int = 0,
+                 hedge: Optional[Dict[str, Any]] = None, stop_when: Optional[Callable[[str], bool]] = None,
+                 deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Send prompt to the LLM and return ``{'content', 'finish_reason', 'metrics'}``.
+
+        With ``stream=True`` content chunks are passed to ``on_chunk`` as they arrive and
+        the metrics include time-to-first-token and generation speed. ``history`` holds
+        earlier user/assistant turns placed between the system prompt and ``prompt``.
+        A response cut at ``max_tokens`` (``finish_reason == 'length'``) is continued
+        up to ``max_continuations`` times and the parts are joined. With ``hedge``
+        (``{'after_s', 'model'}``) a duplicate request is raced against a slow one.
+        ``stop_when`` is called with every content chunk (the request is streamed
+        internally if needed); once it returns True the generation is cut off and
+        ``finish_reason`` is ``'stop_tag'``. The provider's usage never arrives then, so
+        the token counts are estimated locally and ``metrics['usage_estimated']`` is set.
+        Once ``deadline`` runs out the request is abandoned with ``DeadlineExceeded``: its remaining time bounds the HTTP request,
+        retries and backoff waits, and a stream is closed between chunks.
+        """
+
         # Verbose: mostrar prompt completo antes de enviar
         if self.verbose:
             print(f"\n{'='*80}")
@@ -26,11 +123,13 @@ class LLMClient:
                 print("-" * 40)
                 print(system_prompt)
                 print("-" * 40)
+            if history:
+                print(f"💬 HISTORIAL DE CONVERSACIÓN: {len(history)} mensajes previos")
             print("📝 USER PROMPT:")
             print("-" * 40)
             print(prompt)
             print("-" * 40)
-            
+
             # Show model config
             config = model_config or {}
             print("🤖 CONFIGURACIÓN DEL MODELO:")
@@ -39,16 +138,20 @@ class LLMClient:
             print(f"   Max tokens: {config.get('max_tokens', 4096)}")
             print(f"   Top-p: {config.get('top_p', 0.9)}")
             print()
-        
+
+        started = time.perf_counter()
+        metrics: Dict[str, Any] = {"streamed": stream, "cache_hit": False, "retries": 0,
+                                   "throttle_wait_s": 0.0, "backoff_wait_s": 0.0}
         try:
             config = model_config or {}
-            
+
             # Build messages array
             messages = []
             if system_prompt:
                 messages.append({"role": "system", "content": system_prompt})
+            messages.extend(history or [])
             messages.append({"role": "user", "content": prompt})
-            
+
             request_params = {
                 "messages": messages,
                 "model": config.get("model", self.default_model),
@@ -57,16 +160,43 @@ class LLMClient:
                 "top_p": config.get("top_p", 0.9),
             }
 
-            response = self.client.chat.completions.create(**request_params)
-            content = response.choices[0].message.content
+            # An adaptive max_tokens is keyed as the configured one: truncated responses are never cached,
+            # so a cached response does not depend on the limit
+            cache_params = dict(request_params, max_tokens=config.get("configured_max_tokens",
+                                                                      request_params["max_tokens"]))
+            cache_key = make_cache_key(cache_params) if self.cache else None
+            if cache_key:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    if self.verbose:
+                        print("🗄️ RESPUESTA OBTENIDA DE CACHÉ")
+                        print("-" * 40)
+                        print(cached)
+                        print("-" * 40)
+                        print()
+                    if stream and on_chunk:
+                        on_chunk(cached)
+                    metrics.update(cache_hit=True, wall_s=time.perf_counter() - started)
+                    if stream:
+                        metrics["ttft_s"] = 0.0
+                    return {"content": cached, "finish_reason": "cache", "metrics": metrics}
 
-            # Fallback: some Groq responses may have reasoning field
-            if (content is None or len(content) == 0) and hasattr(response.choices[0].message, 'reasoning'):
-                reasoning_content = response.choices[0].message.reasoning
-                content = reasoning_content
+            metrics["model"] = request_params["model"]
+            if hedge:
+                content, finish_reason = self._hedged_request(request_params, hedge, stream, on_chunk, started, metrics,
+                                                              phase_name, stop_when, deadline)
+            else:
+                content, finish_reason = self._request_with_retries(request_params, stream, on_chunk, started, metrics,
+                                                                    phase_name, stop_when=stop_when, deadline=deadline)
+            metrics["request_s"] = (time.perf_counter() - started - metrics["throttle_wait_s"]
+                                    - metrics["backoff_wait_s"])
+            content, finish_reason = self._continue_truncated(request_params, content, finish_reason, max_continuations,
+                                                              stream, on_chunk, metrics, phase_name, stop_when, deadline)
+
+            metrics["wall_s"] = time.perf_counter() - started
 
             # Verbose: mostrar respuesta recibida del LLM
-            if self.verbose:
+            if self.verbose and not stream:
                 print("⏳ Procesando respuesta del LLM...")
                 print("📥 RESPUESTA COMPLETA DEL LLM:")
                 print("-" * 40)
@@ -77,9 +207,278 @@ class LLMClient:
                 print("-" * 40)
                 print()
 
-            return content
+            # A truncated response is not cached: a later call with continuations would be stuck with it
+            if cache_key and content and finish_reason != "length":
+                if metrics.get("hedge_won"):
+                    # The answer came from the hedge model, so it is cached as that model's
+                    cache_key = make_cache_key(dict(cache_params, model=metrics["model"]))
+                self.cache.put(cache_key, content)
+
+            return {"content": content, "finish_reason": finish_reason, "metrics": metrics}
 
         except Exception as e:
             if self.verbose:
                 print(f"\n❌ ERROR EN FASE {phase_name}: {str(e)}")
+            if isinstance(e, LLMError):
+                raise
             raise LLMError(str(e))
+
+    def _continue_truncated(self, request_params: Dict[str, Any], content: Optional[str], finish_reason: Optional[str],
+                            max_continuations: int, stream: bool, on_chunk: Optional[Callable[[str], None]],
+                            metrics: Dict[str, Any], phase_name: str,
+                            stop_when: Optional[Callable[[str], bool]] = None,
+                            deadline: Optional[Deadline] = None) -> tuple:
+        """Ask the model to continue a response cut at ``max_tokens``."""
+        continuations = 0
+        while finish_reason == "length" and content and continuations < max_continuations:
+            if deadline is not None and deadline.expired():
+                # Keep the truncated response rather than losing it to the deadline
+                break
+            continuations += 1
+            print(f"✂️  Respuesta truncada en {phase_name or 'petición'} (max_tokens={request_params['max_tokens']}): "
+                  f"continuando ({continuations}/{max_continuations})")
+            params = dict(request_params, messages=request_params["messages"] + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": CONTINUATION_PROMPT},
+            ])
+            part_metrics: Dict[str, Any] = {"retries": 0, "throttle_wait_s": 0.0, "backoff_wait_s": 0.0}
+            piece, finish_reason = self._request_with_retries(params, stream, on_chunk, time.perf_counter(),
+                                                              part_metrics, phase_name, stop_when=stop_when,
+                                                              deadline=deadline)
+            content += piece or ""
+            for key in ADDITIVE_METRICS:
+                if part_metrics.get(key) is not None:
+                    metrics[key] = (metrics.get(key) or 0) + part_metrics[key]
+            if part_metrics.get("usage_estimated"):
+                metrics["usage_estimated"] = True
+        metrics["continuations"] = continuations
+        metrics["truncated"] = finish_reason == "length"
+        return content, finish_reason
+
+    def _hedged_request(self, request_params: Dict[str, Any], hedge: Dict[str, Any], stream: bool,
+                        on_chunk: Optional[Callable[[str], None]], started: float, metrics: Dict[str, Any],
+                        phase_name: str, stop_when: Optional[Callable[[str], bool]] = None,
+                        deadline: Optional[Deadline] = None) -> tuple:
+        """Send the request and, if it has not finished after ``hedge['after_s']``, race a duplicate.
+
+        The duplicate goes to ``hedge['model']`` (the same model if unset). Both are read
+        as streams so the loser can be cancelled between chunks, which closes its
+        connection. With ``stream=True`` the first content chunk decides the race, since
+        its output is already being shown (or fed to ``stop_when``); otherwise the first
+        complete response wins.
+        """
+        lock = threading.Lock()
+        cancels = [threading.Event(), threading.Event()]
+        racer_metrics = [dict(metrics), dict(metrics)]
+        winner: List[int] = []
+
+        def claim(index: int) -> bool:
+            with lock:
+                if not winner:
+                    winner.append(index)
+                    cancels[1 - index].set()
+                return winner[0] == index
+
+        def run(index: int, params: Dict[str, Any]) -> tuple:
+            def forward(piece: str) -> None:
+                if not claim(index):
+                    raise HedgeCancelled()
+                if on_chunk:
+                    on_chunk(piece)
+
+            first_chunk_wins = stream or stop_when is not None
+            result = self._request_with_retries(params, True, forward if first_chunk_wins else None, started,
+                                                racer_metrics[index], phase_name, cancel=cancels[index],
+                                                stop_when=stop_when, deadline=deadline)
+            if not claim(index):
+                raise HedgeCancelled()
+            return result
+
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="paep-hedge")
+        sent = time.perf_counter()
+        futures = {executor.submit(contextvars.copy_context().run, run, 0, request_params): 0}
+        pending = set(futures)
+        errors: List[Exception] = []
+        hedged = False
+        result = None
+        try:
+            while pending and result is None:
+                timeout = None if hedged or winner else max(0.0, hedge['after_s'] - (time.perf_counter() - sent))
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        result = future.result()
+                    elif not isinstance(error, HedgeCancelled):
+                        errors.append(error)
+                if not done and not hedged and not winner:
+                    hedge_params = dict(request_params, model=hedge.get('model') or request_params['model'])
+                    print(f"🏇 {phase_name or 'Petición'}: sin respuesta tras {hedge['after_s']:.1f}s (p95), "
+                          f"lanzando petición duplicada a {hedge_params['model']}")
+                    hedge_future = executor.submit(contextvars.copy_context().run, run, 1, hedge_params)
+                    futures[hedge_future] = 1
+                    # Added even if already done: a fast duplicate must still be collected by wait()
+                    pending.add(hedge_future)
+                    hedged = True
+        finally:
+            for event in cancels:
+                event.set()
+            # The loser stops at its next chunk; nobody waits for it
+            executor.shutdown(wait=False)
+
+        if result is None:
+            raise errors[0] if errors else LLMError("Petición cancelada")
+        metrics.update(racer_metrics[winner[0]], hedged=hedged, hedge_won=winner[0] == 1)
+        if winner[0] == 1:
+            metrics["model"] = hedge.get('model') or request_params['model']
+            print(f"🏁 {phase_name or 'Petición'}: la petición duplicada terminó primero")
+        return result
+
+    def _request_with_retries(self, request_params: Dict[str, Any], stream: bool, on_chunk: Optional[Callable[[str], None]],
+                              started: float, metrics: Dict[str, Any], phase_name: str,
+                              cancel: Optional[threading.Event] = None,
+                              stop_when: Optional[Callable[[str], bool]] = None,
+                              deadline: Optional[Deadline] = None) -> tuple:
+        """Send the request, throttled by the rate limiter and retried on transient errors."""
+        estimated_tokens = sum(estimate_tokens(m["content"]) for m in request_params["messages"])
+        attempt = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise HedgeCancelled()
+            if self.rate_limiter:
+                metrics["throttle_wait_s"] += self.rate_limiter.acquire(estimated_tokens)
+            self._check_deadline(deadline, phase_name)
+            self._note_first_request()
+            try:
+                if stream or stop_when is not None:
+                    result = self._stream_completion(request_params, on_chunk, started, metrics, cancel, stop_when,
+                                                     deadline)
+                else:
+                    result = self._completion(request_params, metrics, deadline)
+                break
+            except (HedgeCancelled, DeadlineExceeded):
+                raise
+            except Exception as e:
+                # A timeout caused by the deadline itself is not retried
+                self._check_deadline(deadline, phase_name)
+                # A stream that already delivered chunks cannot be replayed without duplicating output
+                if attempt >= self.retry_policy.max_retries or not is_retryable(e) or metrics.get("content_chunks"):
+                    raise
+                delay = self.retry_policy.delay(attempt, e)
+                remaining = deadline.remaining() if deadline is not None else None
+                if remaining is not None and delay >= remaining:
+                    raise DeadlineExceeded(f"{deadline.reason() if deadline.expired() else 'sin tiempo para reintentar'}"
+                                           f" en {phase_name or 'petición'} ({e})")
+                reason = status_code_of(e) or type(e).__name__
+                print(f"⚠️  Error transitorio del LLM ({reason}) en {phase_name or 'petición'}: "
+                      f"reintento {attempt + 1}/{self.retry_policy.max_retries} en {delay:.1f}s")
+                time.sleep(delay)
+                metrics["backoff_wait_s"] += delay
+                attempt += 1
+                metrics["retries"] = attempt
+
+        if self.rate_limiter:
+            self.rate_limiter.record_usage(estimated_tokens, metrics.get("total_tokens"))
+        return result
+
+    @staticmethod
+    def _check_deadline(deadline: Optional[Deadline], phase_name: str) -> None:
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"{deadline.reason()} en {phase_name or 'petición'}")
+
+    @staticmethod
+    def _http_timeout(deadline: Optional[Deadline]) -> Optional[float]:
+        """Timeout of the HTTP request: the deadline's remaining time (at least a fraction of a second)."""
+        remaining = deadline.remaining() if deadline is not None else None
+        return None if remaining is None else max(0.1, remaining)
+
+    def _completion(self, request_params: Dict[str, Any], metrics: Dict[str, Any],
+                    deadline: Optional[Deadline] = None) -> tuple:
+        response = self.backend.complete(request_params, timeout=self._http_timeout(deadline))
+        content = response.get("content")
+
+        # Fallback: some Groq responses may have reasoning field
+        if not content and response.get("reasoning"):
+            content = response["reasoning"]
+
+        metrics.update(response.get("usage") or {})
+        return content, response.get("finish_reason")
+
+    def _stream_completion(self, request_params: Dict[str, Any], on_chunk: Optional[Callable[[str], None]],
+                           started: float, metrics: Dict[str, Any], cancel: Optional[threading.Event] = None,
+                           stop_when: Optional[Callable[[str], bool]] = None,
+                           deadline: Optional[Deadline] = None) -> tuple:
+        """Consume a streamed completion, forwarding content chunks as they arrive."""
+        content_parts: List[str] = []
+        reasoning_parts: List[str] = []
+        finish_reason = None
+        first_token_at = None
+        chunk_count = 0
+        usage = None
+
+        if self.verbose:
+            print("📥 RESPUESTA DEL LLM (streaming):")
+            print("-" * 40)
+
+        chunks = self.backend.stream(request_params, timeout=self._http_timeout(deadline))
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                # Closing the generator closes the backend's HTTP response
+                chunks.close()
+                raise HedgeCancelled()
+            if deadline is not None and deadline.expired():
+                chunks.close()
+                raise DeadlineExceeded(f"{deadline.reason()} tras {metrics.get('content_chunks', 0)} fragmentos")
+            usage = chunk.get("usage") or usage
+            finish_reason = chunk.get("finish_reason") or finish_reason
+            if chunk.get("reasoning"):
+                reasoning_parts.append(chunk["reasoning"])
+            piece = chunk.get("content")
+            if not piece:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            chunk_count += 1
+            metrics["content_chunks"] = chunk_count
+            content_parts.append(piece)
+            if self.verbose:
+                print(piece, end="", flush=True)
+            if on_chunk:
+                on_chunk(piece)
+            if stop_when is not None and stop_when(piece):
+                # Closing the stream aborts the generation: no tokens are spent on trailing text
+                chunks.close()
+                finish_reason = "stop_tag"
+                metrics["early_stop"] = True
+                break
+
+        content = "".join(content_parts)
+        # Fallback: some Groq responses only carry the reasoning field
+        if not content and reasoning_parts:
+            content = "".join(reasoning_parts)
+            if on_chunk:
+                on_chunk(content)
+
+        if self.verbose:
+            print()
+            print("-" * 40)
+            print()
+
+        finished = time.perf_counter()
+        metrics.update(usage or {})
+        if usage is None and finish_reason == "stop_tag":
+            # Usage arrives on the last chunk, after the generation the early stop cut short
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in request_params["messages"])
+            completion_tokens = estimate_tokens(content)
+            metrics.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens, cached_prompt_tokens=0,
+                           usage_estimated=True)
+        completion_tokens = metrics.get("completion_tokens")
+        # A stream opened only to follow ``stop_when`` is an internal detail: no user-facing timings
+        if first_token_at is not None and metrics["streamed"]:
+            metrics["ttft_s"] = first_token_at - started
+            generation_time = finished - first_token_at
+            # Without provider usage, the number of content chunks approximates the token count
+            tokens = completion_tokens or chunk_count
+            metrics["tokens_per_s"] = tokens / generation_time if generation_time > 0 else None
+        return content or None, finish_reason
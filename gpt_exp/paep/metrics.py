@@ -0,0 +1,168 @@
+"""Per-phase metrics aggregation and export (JSONL events, Prometheus text format)."""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+
+# Metrics kept in results['metrics']['phases'] and exported for every phase
+PHASE_METRIC_KEYS = (
+    'wall_s', 'phase_wall_s', 'queue_wait_s', 'throttle_wait_s', 'backoff_wait_s', 'ttft_s', 'tokens_per_s',
+    'context_build_s', 'prompt_tokens', 'completion_tokens', 'total_tokens', 'cached_prompt_tokens',
+    'prompt_tokens_est', 'retries', 'cache_hit', 'max_tokens', 'continuations', 'truncated', 'model', 'request_s',
+    'hedged', 'hedge_won', 'tag_found', 'early_stop', 'usage_estimated', 'fan_out',
+)
+
+# Metrics summed over all phases of a session
+SUMMED_KEYS = (
+    'wall_s', 'queue_wait_s', 'throttle_wait_s', 'backoff_wait_s', 'prompt_tokens', 'completion_tokens',
+    'total_tokens', 'cached_prompt_tokens', 'retries',
+)
+
+
+def sum_phase_metrics(results: Dict[str, Any], keys: Iterable[str]) -> Dict[str, Any]:
+    totals = {key: 0 for key in keys}
+    for phase_data in results.get('phases', {}).values():
+        metrics = phase_data.get('metrics') or {}
+        for key in totals:
+            totals[key] += metrics.get(key) or 0
+    return totals
+
+
+def usage_totals(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Sum billed vs provider-cached prompt tokens over all phases."""
+    totals = sum_phase_metrics(results, ('prompt_tokens', 'cached_prompt_tokens', 'completion_tokens'))
+    totals['cached_ratio'] = totals['cached_prompt_tokens'] / totals['prompt_tokens'] if totals['prompt_tokens'] else 0.0
+    return totals
+
+
+def session_metrics(results: Dict[str, Any], session_wall_s: Optional[float] = None) -> Dict[str, Any]:
+    """Structured metrics block stored as ``results['metrics']``."""
+    phases = {}
+    for phase_id, phase_data in results.get('phases', {}).items():
+        metrics = phase_data.get('metrics') or {}
+        phases[phase_id] = {key: metrics.get(key) for key in PHASE_METRIC_KEYS if metrics.get(key) is not None}
+    totals = sum_phase_metrics(results, SUMMED_KEYS)
+    totals['cache_hits'] = sum(1 for m in phases.values() if m.get('cache_hit'))
+    totals['hedged'] = sum(1 for m in phases.values() if m.get('hedged'))
+    totals['phases'] = len(phases)
+    if session_wall_s is not None:
+        totals['session_wall_s'] = session_wall_s
+    slowest = max(phases.items(), key=lambda item: item[1].get('wall_s') or 0, default=None)
+    return {'phases': phases, 'totals': totals, 'slowest_phase': slowest[0] if slowest else None}
+
+
+class MetricsExporter:
+    """Append JSONL events and/or rewrite a Prometheus textfile as sessions progress.
+
+    One exporter can be shared by many engines (batch mode); Prometheus series are
+    aggregated per template and phase to keep label cardinality bounded.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        # (template, phase) -> {'count': n, sums...}
+        self._phase_series: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._sessions: Dict[Tuple[str, str], int] = {}
+
+    def phase_completed(self, session_id: str, template_name: str, phase_id: str, metrics: Dict[str, Any]) -> None:
+        values = {key: metrics.get(key) for key in PHASE_METRIC_KEYS if metrics.get(key) is not None}
+        with self._lock:
+            series = self._phase_series.setdefault((template_name, phase_id), {'count': 0})
+            series['count'] += 1
+            for key in SUMMED_KEYS:
+                series[key] = series.get(key, 0) + (values.get(key) or 0)
+            series['cache_hits'] = series.get('cache_hits', 0) + (1 if values.get('cache_hit') else 0)
+            series['hedged'] = series.get('hedged', 0) + (1 if values.get('hedged') else 0)
+            series['hedge_won'] = series.get('hedge_won', 0) + (1 if values.get('hedge_won') else 0)
+        self._write_event({'event': 'phase_completed', 'session_id': session_id, 'template': template_name,
+                           'phase': phase_id, **values})
+
+    def session_finished(self, results: Dict[str, Any], status: str) -> None:
+        template_name = results.get('template_name') or 'unknown'
+        with self._lock:
+            key = (template_name, status)
+            self._sessions[key] = self._sessions.get(key, 0) + 1
+        self._write_event({'event': 'session_finished', 'session_id': results.get('session_id'),
+                           'template': template_name, 'status': status,
+                           **(results.get('metrics') or {}).get('totals', {})})
+        self.write_prometheus()
+
+    def _write_event(self, event: Dict[str, Any]) -> None:
+        if not self.jsonl_path:
+            return
+        event = {'ts': datetime.now().isoformat(), **event}
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+    def render_prometheus(self) -> str:
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, samples) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        with self._lock:
+            series = sorted(self._phase_series.items())
+            sessions = sorted(self._sessions.items())
+
+        def per_phase(key: str):
+            return [({'template': t, 'phase': p}, round(s.get(key, 0), 6)) for (t, p), s in series]
+
+        family("paep_sessions_total", "counter", "Sesiones PAEP finalizadas por estado",
+               [({'template': t, 'status': st}, n) for (t, st), n in sessions])
+        family("paep_phase_runs_total", "counter", "Fases ejecutadas", per_phase('count'))
+        family("paep_phase_llm_seconds_total", "counter", "Tiempo total de llamadas al LLM por fase", per_phase('wall_s'))
+        family("paep_phase_queue_wait_seconds_total", "counter", "Espera por un worker libre", per_phase('queue_wait_s'))
+        family("paep_phase_throttle_wait_seconds_total", "counter", "Espera por límite de tasa", per_phase('throttle_wait_s'))
+        family("paep_phase_backoff_wait_seconds_total", "counter", "Espera por backoff entre reintentos", per_phase('backoff_wait_s'))
+        family("paep_phase_prompt_tokens_total", "counter", "Tokens de prompt facturados", per_phase('prompt_tokens'))
+        family("paep_phase_cached_prompt_tokens_total", "counter", "Tokens de prompt servidos de la caché del proveedor",
+               per_phase('cached_prompt_tokens'))
+        family("paep_phase_completion_tokens_total", "counter", "Tokens generados", per_phase('completion_tokens'))
+        family("paep_phase_retries_total", "counter", "Reintentos ante errores transitorios", per_phase('retries'))
+        family("paep_phase_cache_hits_total", "counter", "Respuestas servidas por la caché local", per_phase('cache_hits'))
+        family("paep_phase_hedged_total", "counter", "Peticiones duplicadas por superar el p95 de latencia", per_phase('hedged'))
+        family("paep_phase_hedge_won_total", "counter", "Peticiones duplicadas que terminaron primero", per_phase('hedge_won'))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self) -> None:
+        if not self.prometheus_path:
+            return
+        text = self.render_prometheus()
+        tmp_path = f"{self.prometheus_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        # Atomic replace so a node_exporter textfile collector never reads a partial file
+        os.replace(tmp_path, self.prometheus_path)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_metrics_table(metrics: Dict[str, Any]) -> str:
+    """Markdown table of per-phase metrics for the session output file."""
+    rows = ["| Fase | LLM (s) | Cola (s) | Throttle (s) | Prompt tok | Compl. tok | Cache prov. | Reintentos | Caché local |",
+            "|---|---|---|---|---|---|---|---|---|"]
+    for phase_id, m in metrics.get('phases', {}).items():
+        # Estimated counts (generation stopped before the provider reported usage) are marked with ~
+        mark = "~" if m.get('usage_estimated') else ""
+        prompt_tokens = f"{mark}{m['prompt_tokens']}" if m.get('prompt_tokens') else '-'
+        completion_tokens = f"{mark}{m['completion_tokens']}" if m.get('completion_tokens') else '-'
+        rows.append(f"| {phase_id} | {m.get('wall_s', 0):.2f} | {m.get('queue_wait_s') or 0:.2f} | "
+                    f"{m.get('throttle_wait_s', 0):.2f} | {prompt_tokens} | {completion_tokens} | "
+                    f"{m.get('cached_prompt_tokens') or 0} | {m.get('retries', 0)} | {'sí' if m.get('cache_hit') else 'no'} |")
+    totals = metrics.get('totals', {})
+    rows.append(f"| **Total** | {totals.get('wall_s', 0):.2f} | {totals.get('queue_wait_s', 0):.2f} | "
+                f"{totals.get('throttle_wait_s', 0):.2f} | {totals.get('prompt_tokens', 0)} | {totals.get('completion_tokens', 0)} | "
+                f"{totals.get('cached_prompt_tokens', 0)} | {totals.get('retries', 0)} | {totals.get('cache_hits', 0)} |")
+    return "\n".join(rows)
@@ -1,10 +1,14 @@
 """Prompt building and content extraction utilities for PAEP-R simplified system"""
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 
-def build_prompt(phase: Dict[str, Any], input_data: Dict[str, Any], system_prompt: str, context: str, phase_tags: Dict[str, str]) -> str:
-    """Construct the prompt string for a given phase with accumulated context."""
+def build_prompt(phase: Dict[str, Any], input_data: Dict[str, Any], system_prompt: str, context: str, phase_tags: Dict[str, str],
+                 structured: bool = False) -> str:
+    """Construct the prompt string for a given phase with accumulated context.
+
+    With ``structured`` the model is asked to answer inside the phase's tag from ``phase_tags``.
+    """
     prompt_parts = []
     
     # For Fase A, include the user question and modifications (if any)
@@ -28,32 +32,157 @@ def build_prompt(phase: Dict[str, Any], input_data: Dict[str, Any], system_promp
     prompt_parts.append("<task>")
     prompt_parts.append(phase.get('task', ''))
     prompt_parts.append("</task>")
+
+    tag = phase_tags.get(phase.get('id')) if structured else None
+    if tag:
+        prompt_parts.append("")
+        prompt_parts.append(f"Responde únicamente dentro de <{tag}></{tag}>.")
     
     return "\n".join(prompt_parts)
 
 
-def extract_content_from_tags(response: str, phase_tags: Dict[str, str], phase_id: str) -> Optional[str]:
-    """Extract content from LLM response. Now simply returns the full response since we removed XML tags."""
+class TagStreamParser:
+    """Incremental extraction of ``<tag>...</tag>`` from a response arriving in chunks.
+
+    ``feed`` returns the newly available tag content (holding back a possible
+    partial closing tag) and ``closed`` turns true once ``</tag>`` has been seen,
+    so the caller can stop the generation and ignore any trailing text.
+    """
+
+    def __init__(self, tag: str):
+        self.tag = tag
+        self._open_re = re.compile(rf"<{re.escape(tag)}(?:\s[^>]*)?>")
+        self._close = f"</{tag}>"
+        self._text = ""
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._emitted = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._end is not None
+
+    def feed(self, chunk: str) -> str:
+        if self.closed or not chunk:
+            return ""
+        scan_from = len(self._text)
+        self._text += chunk
+        if self._start is None:
+            # The opening tag may straddle chunks; only the recent tail needs a new scan
+            match = self._open_re.search(self._text, max(0, scan_from - 256))
+            if not match:
+                return ""
+            self._start = self._emitted = match.end()
+        end = self._text.find(self._close, max(self._start, scan_from - len(self._close)))
+        if end >= 0:
+            self._end = end
+            new, self._emitted = self._text[self._emitted:end], end
+            return new
+        safe = len(self._text) - (len(self._close) - 1)
+        if safe <= self._emitted:
+            return ""
+        new, self._emitted = self._text[self._emitted:safe], safe
+        return new
+
+    @property
+    def content(self) -> Optional[str]:
+        """Tag content (partial if the closing tag never arrived), or None if the tag never opened."""
+        if self._start is None:
+            return None
+        return self._text[self._start:self._end].strip()
+
+
+def extract_tagged_content(response: str, tag: str) -> Optional[str]:
+    """Content of ``<tag>...</tag>`` in ``response``, or None if the tag is missing."""
+    parser = TagStreamParser(tag)
+    parser.feed(response or "")
+    return parser.content
+
+
+def extract_content_from_tags(response: str, phase_tags: Dict[str, str], phase_id: str,
+                              structured: bool = False) -> Optional[str]:
+    """Extract content from LLM response.
+
+    With ``structured`` the content of the phase's tag is returned; otherwise (or
+    if the tag is missing) the whole stripped response.
+    """
+    tag = phase_tags.get(phase_id) if structured else None
+    if tag and response:
+        tagged = extract_tagged_content(response, tag)
+        if tagged:
+            return tagged
     if response and response.strip():
         return response.strip()
     return None
 
 
-def build_context_string(phase_outputs: Dict[str, str], phase_tags: Dict[str, str], up_to_phase: str) -> str:
-    """Build the accumulated context string up to a specific phase."""
-    context_parts = []
-    
+# Words, numbers and individual punctuation marks; subword tokenizers split
+# Spanish text into roughly 1.3 tokens per such unit.
+_TOKEN_UNIT_RE = re.compile(r"\w+|[^\w\s]")
+TOKENS_PER_UNIT = 1.3
+
+CONTEXT_STRATEGIES = ("full", "drop_oldest", "summary")
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local approximation of the token count of ``text``."""
+    if not text:
+        return 0
+    return int(len(_TOKEN_UNIT_RE.findall(text)) * TOKENS_PER_UNIT) + 1
+
+
+def build_context_string(phase_outputs: Dict[str, str], phase_tags: Dict[str, str], up_to_phase: str, depends_on: Optional[List[str]] = None,
+                         max_tokens: Optional[int] = None, strategy: str = "drop_oldest", summaries: Optional[Dict[str, str]] = None) -> str:
+    """Build the accumulated context string up to a specific phase.
+
+    When ``depends_on`` is given only those phase outputs are included, in the
+    given order; otherwise every earlier PAEP-R phase is used. With ``max_tokens``
+    the context is compacted to fit: ``summary`` first swaps the oldest outputs for
+    their ``summaries``, then (like ``drop_oldest``) the oldest sections are
+    dropped. Phase A, the reformulated question, is always kept verbatim.
+    """
     # Phase order for PAEP-R
     phase_order = ['A', '0', '1', '2', '3', '4', '5', '6']
-    
+    if depends_on is not None:
+        phase_order = list(depends_on) + [up_to_phase]
+
+    sections = []
     for phase_id in phase_order:
-        if phase_id in phase_outputs and phase_id != up_to_phase:
-            content = phase_outputs[phase_id]
-            # Simply add content with a clear separator, no XML tags needed
-            context_parts.append(f"=== FASE {phase_id} ===\n{content}")
-        
         # Stop when we reach the target phase
         if phase_id == up_to_phase:
             break
-    
+        if phase_id in phase_outputs:
+            sections.append([phase_id, phase_outputs[phase_id], False])
+
+    if max_tokens is not None and strategy != "full":
+        _compact_sections(sections, max_tokens, strategy, summaries or {})
+
+    # Simply add content with a clear separator, no XML tags needed
+    context_parts = []
+    for phase_id, content, summarized in sections:
+        header = f"=== FASE {phase_id} (resumen) ===" if summarized else f"=== FASE {phase_id} ==="
+        context_parts.append(f"{header}\n{content}")
     return "\n\n".join(context_parts)
+
+
+def _compact_sections(sections: List[list], max_tokens: int, strategy: str, summaries: Dict[str, str]) -> None:
+    def total() -> int:
+        return sum(estimate_tokens(content) for _, content, _ in sections)
+
+    if total() <= max_tokens:
+        return
+
+    if strategy == "summary":
+        for section in sections:
+            if total() <= max_tokens:
+                return
+            if section[0] != 'A' and section[0] in summaries:
+                section[1] = summaries[section[0]]
+                section[2] = True
+
+    index = 0
+    while total() > max_tokens and index < len(sections):
+        if sections[index][0] == 'A':
+            index += 1
+            continue
+        del sections[index]
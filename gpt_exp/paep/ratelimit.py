@@ -0,0 +1,134 @@
+"""Retry policy and client-side rate limiting shared by concurrent LLM calls."""
+import random
+import threading
+import time
+from typing import Optional
+
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def status_code_of(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, transient server errors, timeouts and dropped connections."""
+    status = status_code_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # SDK transport errors (e.g. APIConnectionError, APITimeoutError) carry no status code
+    name = type(error).__name__
+    return 'Connection' in name or 'Timeout' in name
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Parse a ``Retry-After`` header (seconds or HTTP date) from the error response."""
+    explicit = getattr(error, 'retry_after', None)
+    if explicit is not None:
+        return float(explicit)
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime  # rarely needed; keeps import time down
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, honoring the server's Retry-After when present."""
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 60.0, jitter: float = 0.5):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Seconds to wait before retry number ``attempt`` (starting at 0)."""
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            return min(self.max_delay, retry_after) + random.uniform(0, self.jitter)
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        # Jitter spreads out concurrent workers that failed at the same moment
+        return max(0.0, backoff * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until enough capacity is available."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take ``amount`` tokens, sleeping as needed; returns the seconds waited."""
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                shortfall = (amount - self._tokens) / self.refill_per_second
+            time.sleep(shortfall)
+            waited += shortfall
+
+    def debit(self, amount: float) -> None:
+        """Charge tokens after the fact (may leave the bucket in debt)."""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by every caller of one LLMClient."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0) if tokens_per_minute else None
+
+    def acquire(self, estimated_tokens: int) -> float:
+        """Block until a request of ``estimated_tokens`` may be sent; returns seconds waited."""
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire(1)
+        if self.tokens:
+            waited += self.tokens.acquire(estimated_tokens)
+        return waited
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token budget once the real usage of a request is known."""
+        if self.tokens and actual_tokens is not None and actual_tokens > estimated_tokens:
+            self.tokens.debit(actual_tokens - estimated_tokens)
@@ -0,0 +1,156 @@
+"""Dependency graph and concurrent scheduler for PAEP phases."""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, Future
+from typing import Dict, Any, List, Callable, Optional, Set
+
+
+class SchedulerError(Exception):
+    pass
+
+
+def resolve_dependencies(phases: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Return the direct dependencies of every phase.
+
+    Phases may declare ``depends_on`` (list of phase ids). Phases without it keep
+    the classic PAEP behaviour and depend on every phase that precedes them.
+    """
+    ids = [phase['id'] for phase in phases]
+    deps: Dict[str, List[str]] = {}
+
+    for index, phase in enumerate(phases):
+        phase_id = phase['id']
+        if phase_id in deps:
+            raise SchedulerError(f"Fase duplicada en el template: {phase_id}")
+
+        declared = phase.get('depends_on')
+        if declared is None:
+            deps[phase_id] = ids[:index]
+        else:
+            for dep in declared:
+                if dep not in ids:
+                    raise SchedulerError(f"La Fase {phase_id} depende de una fase inexistente: {dep}")
+                if dep == phase_id:
+                    raise SchedulerError(f"La Fase {phase_id} no puede depender de sí misma")
+            # Keep template order so the context reads chronologically
+            deps[phase_id] = [pid for pid in ids if pid in declared]
+
+    _check_acyclic(ids, deps)
+    return deps
+
+
+def _check_acyclic(ids: List[str], deps: Dict[str, List[str]]) -> None:
+    visiting: Set[str] = set()
+    done: Set[str] = set()
+
+    def visit(node: str) -> None:
+        if node in done:
+            return
+        if node in visiting:
+            raise SchedulerError(f"Dependencia circular detectada en la Fase {node}")
+        visiting.add(node)
+        for dep in deps[node]:
+            visit(dep)
+        visiting.discard(node)
+        done.add(node)
+
+    for node in ids:
+        visit(node)
+
+
+def terminal_phases(phases: List[Dict[str, Any]]) -> List[str]:
+    """Phases no other phase depends on: a session that has them all ran to the end."""
+    deps = resolve_dependencies(phases)
+    required = {dep for phase_deps in deps.values() for dep in phase_deps}
+    return [phase['id'] for phase in phases if phase['id'] not in required]
+
+
+def critical_path_length(phases: List[Dict[str, Any]], deps: Dict[str, List[str]]) -> int:
+    """Number of phases on the longest dependency chain (sequential round-trips)."""
+    depth: Dict[str, int] = {}
+
+    def measure(phase_id: str) -> int:
+        if phase_id not in depth:
+            depth[phase_id] = 1 + max((measure(d) for d in deps[phase_id]), default=0)
+        return depth[phase_id]
+
+    return max((measure(phase['id']) for phase in phases), default=0)
+
+
+class PhaseScheduler:
+    """Run phases as soon as their dependencies are satisfied.
+
+    ``run_phase`` executes in worker threads and must not mutate shared state.
+    ``on_complete`` runs in the calling thread, in completion order, and decides
+    whether the run continues (returning False stops scheduling new phases).
+    """
+
+    def __init__(self, phases: List[Dict[str, Any]], max_workers: int = 4):
+        self.phases = phases
+        self.deps = resolve_dependencies(phases)
+        self.max_workers = max(1, max_workers)
+        # perf_counter timestamps per phase: ready_at (dependencies met), started_at, finished_at
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def queue_wait(self, phase_id: str) -> Optional[float]:
+        """Seconds a phase waited for a free worker after its dependencies completed."""
+        timing = self.timings.get(phase_id, {})
+        if 'ready_at' not in timing or 'started_at' not in timing:
+            return None
+        return timing['started_at'] - timing['ready_at']
+
+    def run_time(self, phase_id: str) -> Optional[float]:
+        timing = self.timings.get(phase_id, {})
+        if 'started_at' not in timing or 'finished_at' not in timing:
+            return None
+        return timing['finished_at'] - timing['started_at']
+
+    def _timed(self, run_phase: Callable[[Dict[str, Any]], Any], phase: Dict[str, Any]) -> Any:
+        timing = self.timings[phase['id']]
+        timing['started_at'] = time.perf_counter()
+        try:
+            return run_phase(phase)
+        finally:
+            timing['finished_at'] = time.perf_counter()
+
+    def run(self, run_phase: Callable[[Dict[str, Any]], Any],
+            on_complete: Callable[[Dict[str, Any], Any], bool],
+            completed: Optional[Set[str]] = None) -> Set[str]:
+        """Execute pending phases; returns the set of phase ids that completed."""
+        done: Set[str] = set(completed or ())
+        pending = [phase for phase in self.phases if phase['id'] not in done]
+        running: Dict[Future, Dict[str, Any]] = {}
+        stopped = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                if not stopped:
+                    # Submit in template order so max_workers=1 behaves sequentially
+                    for phase in list(pending):
+                        if not all(dep in done for dep in self.deps[phase['id']]):
+                            continue
+                        self.timings.setdefault(phase['id'], {'ready_at': time.perf_counter()})
+                        if len(running) >= self.max_workers:
+                            continue
+                        pending.remove(phase)
+                        # Copy the caller's context so per-session output capture follows the phase
+                        context = contextvars.copy_context()
+                        running[pool.submit(context.run, self._timed, run_phase, phase)] = phase
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    phase = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"❌ Error inesperado en Fase {phase['id']}: {e}")
+                        result = None
+                    if on_complete(phase, result):
+                        done.add(phase['id'])
+                    else:
+                        stopped = True
+
+        return done
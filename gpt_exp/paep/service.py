@@ -0,0 +1,400 @@
+"""Long-running local PAEP service: a bounded job queue served over HTTP on localhost.
+
+The service keeps templates, the LLM client and its connection pool warm between
+analyses. Endpoints (JSON):
+
+- ``GET  /health``            - queue and worker status
+- ``POST /jobs``              - ``{"question", "template_name" | "template", "output_dir"?}`` -> 202 with the job id
+  (``output_dir`` must lie within the service's own output directory)
+- ``GET  /jobs/<id>``         - job status
+- ``GET  /jobs/<id>/result``  - full results once the job has finished
+- ``GET  /jobs/<id>/events``  - progress as newline-delimited JSON, streamed until the job ends
+
+The URL of a running service is written to a discovery file so ``paep_engine.py``
+can submit to it (see ``service_client``) instead of starting a cold pipeline.
+"""
+import itertools
+import json
+import os
+import queue
+import re
+import signal
+import sys
+import threading
+import urllib.parse
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+from .compact import expanded_results
+from .console import QuietThreadsStdout
+from .engine import PAEPEngine
+from .llm_client import LLMClient
+from .sinks import ResultSink, SQLiteSink, build_sinks
+from .session_index import SessionIndex, SessionIndexSink
+from .service_client import ServiceError, DEFAULT_SERVICE_FILE
+
+
+DEFAULT_PORT = 8765
+_PHASE_ID_RE = re.compile(r"[\w-]+")
+FINISHED_STATUSES = ("completado", "incompleto", "fallido")
+
+
+class Job:
+    """One queued analysis and its progress log (engine output, line by line)."""
+
+    def __init__(self, job_id: str, question: str, template: Dict[str, Any], output_dir: str):
+        self.id = job_id
+        self.question = question
+        self.template = template
+        self.output_dir = output_dir
+        self.status = "en_cola"
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.results: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._partial = ""
+        self._write_lock = threading.Lock()
+        self._changed = threading.Condition()
+
+    def _add_event(self, event: Dict[str, Any]) -> None:
+        with self._changed:
+            event['seq'] = len(self.events)
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def write(self, text: str) -> int:
+        # File-like target for QuietThreadsStdout: one event per complete line
+        with self._write_lock:
+            self._partial += text
+            *lines, self._partial = self._partial.split("\n")
+        for line in lines:
+            if line.strip():
+                self._add_event({'type': 'log', 'text': line})
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        self._add_event({'type': 'status', 'status': status})
+
+    def events_since(self, seq: int, timeout: float) -> List[Dict[str, Any]]:
+        """Events with ``seq >= seq``, waiting up to ``timeout`` seconds for new ones."""
+        with self._changed:
+            if len(self.events) <= seq and self.status not in FINISHED_STATUSES:
+                self._changed.wait(timeout)
+            return self.events[seq:]
+
+    def summary(self) -> Dict[str, Any]:
+        phases = (self.results or {}).get('phases', {})
+        return {
+            'id': self.id,
+            'status': self.status,
+            'question': self.question,
+            'template_name': self.template.get('template_name'),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'phases_completed': len(phases),
+            'total_phases': len(self.template.get('phases', [])),
+            'output_file': (self.results or {}).get('output_file'),
+            'error': self.error,
+        }
+
+
+class PAEPService:
+    """Bounded queue of analysis jobs run by a fixed pool of workers sharing one LLM client."""
+
+    def __init__(self, llm: LLMClient, templates: Dict[str, Dict[str, Any]], workers: int = 2, queue_size: int = 16,
+                 phase_workers: int = 4, output_dir: Optional[str] = None, output_formats: Optional[List[str]] = None,
+                 sqlite_path: Optional[str] = None, metrics_exporter=None, max_finished_jobs: int = 256,
+                 output_history=None, max_continuations: int = 2, latency_history=None, hedging=None,
+                 spill_dir: Optional[str] = None, spill_threshold: int = 4096, fan_out: bool = True,
+                 timeouts: Optional[Dict[str, Any]] = None, index_path: Optional[str] = None):
+        if not templates:
+            raise ServiceError("El servicio necesita al menos un template")
+        self.llm = llm
+        self.templates = templates
+        self.default_template = next(iter(templates))
+        self.workers = max(1, workers)
+        self.phase_workers = phase_workers
+        self.output_dir = output_dir or os.environ.get('PAEP_OUTPUT_DIR', '.')
+        self.output_formats = [name for name in (output_formats or ["markdown"]) if name != "sqlite"]
+        # The SQLite store is shared by every job; file sinks are created per job output_dir
+        self.shared_sinks: List[ResultSink] = []
+        if output_formats and "sqlite" in output_formats:
+            self.shared_sinks = build_sinks(["sqlite"], self.output_dir, sqlite_path)
+        self.index: Optional[SessionIndex] = None
+        if index_path:
+            self.index = SessionIndex(index_path)
+            self.shared_sinks.append(SessionIndexSink(self.index))
+        self.metrics_exporter = metrics_exporter
+        self.output_history = output_history
+        self.max_continuations = max_continuations
+        self.latency_history = latency_history
+        self.hedging = hedging
+        # Finished jobs stay in memory, so large phase texts are kept on disk
+        self.spill_dir = spill_dir
+        self.spill_threshold = spill_threshold
+        self.fan_out = fan_out
+        self.timeouts = timeouts
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._prefix = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._threads: List[threading.Thread] = []
+        self._stdout: Optional[QuietThreadsStdout] = None
+        self._previous_stdout = None
+        self.running = 0
+
+    def start(self) -> None:
+        # Engines print their progress; each worker's output goes to its job's event log
+        self._previous_stdout = sys.stdout
+        self._stdout = QuietThreadsStdout(sys.stdout)
+        sys.stdout = self._stdout
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"paep-job-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if sys.stdout is self._stdout:
+            sys.stdout = self._previous_stdout
+        for sink in self.shared_sinks:
+            if isinstance(sink, SQLiteSink):
+                sink.close()
+        if self.index:
+            self.index.close()
+
+    def submit(self, payload: Dict[str, Any]) -> Job:
+        question = (payload.get('question') or '').strip()
+        if not question:
+            raise ServiceError("Falta la pregunta ('question')")
+        template = payload.get('template')
+        if template is None:
+            name = payload.get('template_name') or self.default_template
+            template = self.templates.get(name)
+            if template is None:
+                raise ServiceError(f"Template desconocido: {name} (disponibles: {', '.join(self.templates)})", 404)
+        elif not isinstance(template, dict) or not template.get('phases'):
+            raise ServiceError("Template inválido: falta la lista 'phases'")
+        else:
+            # Phase ids end up in file names (spilled texts), so they must not carry a path
+            bad_ids = [str(phase.get('id')) for phase in template['phases']
+                       if not isinstance(phase, dict) or not _PHASE_ID_RE.fullmatch(str(phase.get('id', '')))]
+            if bad_ids:
+                raise ServiceError(f"Template inválido: ids de fase no permitidos: {', '.join(bad_ids)}")
+
+        job = Job(f"{self._prefix}_{next(self._counter):04d}", question, template,
+                  self._job_output_dir(payload.get('output_dir')))
+        job.set_status("en_cola")
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise ServiceError("Cola llena, inténtelo más tarde", 503)
+            self.jobs[job.id] = job
+            self._evict_finished()
+        return job
+
+    def _job_output_dir(self, requested: Optional[str]) -> str:
+        """The requested directory if it lies within the service's output directory."""
+        if not requested:
+            return self.output_dir
+        root = os.path.realpath(self.output_dir)
+        path = os.path.realpath(requested)
+        # Any local process can POST a job, so it must not make the service write elsewhere
+        if os.path.commonpath([root, path]) != root:
+            raise ServiceError(f"output_dir fuera del directorio de resultados del servicio ({root})", 403)
+        return path
+
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise ServiceError(f"Trabajo no encontrado: {job_id}", 404)
+        return job
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            'status': 'ok',
+            'pid': os.getpid(),
+            'workers': self.workers,
+            'running': self.running,
+            'queued': self._queue.qsize(),
+            'queue_size': self._queue.maxsize,
+            'templates': list(self.templates),
+            'output_root': os.path.realpath(self.output_dir),
+        }
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self.running += 1
+            try:
+                self._run_job(job)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    def _run_job(self, job: Job) -> None:
+        job.started_at = datetime.now().isoformat()
+        job.set_status("en_progreso")
+        sinks = build_sinks(self.output_formats, job.output_dir) + self.shared_sinks
+        engine = PAEPEngine(self.llm, auto_approve=True, max_workers=self.phase_workers, session_id=job.id,
+                            output_dir=job.output_dir, metrics_exporter=self.metrics_exporter, sinks=sinks,
+                            output_history=self.output_history, max_continuations=self.max_continuations,
+                            latency_history=self.latency_history, hedging=self.hedging,
+                            spill_dir=self.spill_dir, spill_threshold=self.spill_threshold, fan_out=self.fan_out,
+                            timeouts=self.timeouts)
+        with self._stdout.capture(job):
+            try:
+                job.results = engine.run_analysis(job.question, job.template)
+                complete = len(job.results.get('phases', {})) == len(job.template.get('phases', []))
+                status = "completado" if complete else "incompleto"
+            except Exception as e:
+                job.error = str(e)
+                print(f"❌ Error inesperado: {e}")
+                status = "fallido"
+        job.finished_at = datetime.now().isoformat()
+        job.set_status(status)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: PAEPService = None  # set on the subclass created by make_server
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method: str) -> None:
+        url = urllib.parse.urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if method == "GET" and parts == ["health"]:
+                return self._send_json(200, self.service.health())
+            if method == "POST" and parts == ["jobs"]:
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    raise ServiceError("Content-Length inválido")
+                try:
+                    payload = json.loads(self.rfile.read(length).decode('utf-8') or "{}")
+                except (ValueError, UnicodeDecodeError):
+                    raise ServiceError("Cuerpo JSON inválido")
+                job = self.service.submit(payload)
+                return self._send_json(202, job.summary())
+            if method == "GET" and len(parts) >= 2 and parts[0] == "jobs":
+                job = self.service.get(parts[1])
+                if len(parts) == 2:
+                    return self._send_json(200, job.summary())
+                if parts[2:] == ["result"]:
+                    if job.status not in FINISHED_STATUSES:
+                        raise ServiceError(f"El trabajo sigue {job.status}", 409)
+                    return self._send_json(200, {**job.summary(), 'results': expanded_results(job.results) if job.results else None})
+                if parts[2:] == ["events"]:
+                    try:
+                        since = int(urllib.parse.parse_qs(url.query).get('since', ['0'])[0])
+                    except ValueError:
+                        since = -1
+                    if since < 0:
+                        raise ServiceError("since inválido: debe ser un entero no negativo", 400)
+                    return self._stream_events(job, since)
+            raise ServiceError(f"Ruta no encontrada: {method} {url.path}", 404)
+        except ServiceError as e:
+            self._send_json(e.status_code, {'error': str(e)})
+
+    def _stream_events(self, job: Job, since: int) -> None:
+        # HTTP/1.0 without Content-Length: the body ends when the job finishes and the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        seq = since
+        try:
+            while True:
+                for event in job.events_since(seq, timeout=15.0):
+                    self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8'))
+                    seq = event['seq'] + 1
+                self.wfile.flush()
+                if job.status in FINISHED_STATUSES and seq >= len(job.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def do_GET(self) -> None:
+        self._route("GET")
+
+    def do_POST(self) -> None:
+        self._route("POST")
+
+
+def make_server(service: PAEPService, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("PAEPServiceHandler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def write_service_file(url: str, path: str = DEFAULT_SERVICE_FILE) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'url': url, 'pid': os.getpid(), 'started_at': datetime.now().isoformat()}, f)
+
+
+def remove_service_file(path: str = DEFAULT_SERVICE_FILE) -> None:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('pid') != os.getpid():
+                return
+        os.remove(path)
+    except (OSError, ValueError):
+        pass
+
+
+def serve(service: PAEPService, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+          service_file: str = DEFAULT_SERVICE_FILE) -> None:
+    """Run the service until interrupted, advertising its URL in ``service_file``."""
+    server = make_server(service, host, port)
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    service.start()
+    write_service_file(url, service_file)
+    # SIGTERM (systemd, kill) stops the server like Ctrl+C; shutdown() must run outside serve_forever's thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"🛰️  Servicio PAEP escuchando en {url} ({service.workers} workers, cola de {service.health()['queue_size']})")
+    print(f"📋 Templates: {', '.join(service.templates)}")
+    try:
+        server.serve_forever(poll_interval=0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n⏹️  Deteniendo servicio PAEP...")
+        server.server_close()
+        remove_service_file(service_file)
+        service.stop()
@@ -0,0 +1,89 @@
+"""Client side of the local PAEP service: discovery file and a small urllib client.
+
+Kept separate from ``service`` so submitting a job does not import the engine.
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+from typing import Dict, Any, Iterator, Optional
+
+from .cache import DEFAULT_CACHE_DIR
+
+
+DEFAULT_SERVICE_FILE = os.environ.get('PAEP_SERVICE_FILE', os.path.join(DEFAULT_CACHE_DIR, "service.json"))
+
+
+class ServiceError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ServiceClient:
+    """Minimal urllib client for a running PAEP service."""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8')).get('error', str(e))
+            except ValueError:
+                message = str(e)
+            raise ServiceError(message, e.code)
+        except (urllib.error.URLError, OSError) as e:
+            raise ServiceError(f"No se pudo conectar con el servicio PAEP en {self.url}: {e}", 503)
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def submit(self, question: str, template: Optional[Dict[str, Any]] = None, template_name: Optional[str] = None,
+               output_dir: Optional[str] = None) -> Dict[str, Any]:
+        payload = {'question': question, 'output_dir': output_dir}
+        if template is not None:
+            payload['template'] = template
+        if template_name:
+            payload['template_name'] = template_name
+        return self._request("POST", "/jobs", payload)
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def result(self, job_id: str) -> Dict[str, Any]:
+        return self._request("GET", f"/jobs/{job_id}/result")
+
+    def events(self, job_id: str, since: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yield progress events until the job finishes."""
+        request = urllib.request.Request(f"{self.url}/jobs/{job_id}/events?since={since}")
+        try:
+            with urllib.request.urlopen(request, timeout=max(self.timeout, 60.0)) as response:
+                for line in response:
+                    if line.strip():
+                        yield json.loads(line.decode('utf-8'))
+        except (urllib.error.URLError, OSError) as e:
+            raise ServiceError(f"Conexión con el servicio PAEP interrumpida: {e}", 503)
+
+
+def discover_service(path: str = DEFAULT_SERVICE_FILE, timeout: float = 0.5) -> Optional[ServiceClient]:
+    """Client for the service listed in the discovery file, if it answers its health check."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            url = json.load(f)['url']
+    except (OSError, ValueError, KeyError):
+        return None
+    client = ServiceClient(url, timeout=timeout)
+    try:
+        client.health()
+    except ServiceError:
+        return None
+    client.timeout = 10.0
+    return client
@@ -0,0 +1,280 @@
+"""Local full-text index of past PAEP sessions (SQLite FTS5).
+
+Every finished session is added by ``SessionIndexSink``; earlier results can be
+bulk-imported from their ``paep_resultado_<session>.md`` files. The FTS5 table
+covers the question, the Phase A reformulation and every phase output, ranked
+with bm25. ``exact_match`` finds a completed analysis of the same question (up
+to case, accents, spacing and surrounding punctuation) before any token is spent.
+"""
+import glob
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Any, List, Optional
+
+from .cache import DEFAULT_CACHE_DIR
+from .compact import phase_field
+from .scheduler import SchedulerError, terminal_phases
+from .sinks import ResultSink
+
+DEFAULT_INDEX_PATH = os.path.join(DEFAULT_CACHE_DIR, "sesiones.sqlite3")
+
+# bm25 weights of the question, reformulation and outputs columns
+_BM25 = "bm25(sessions_fts, 10.0, 5.0, 1.0)"
+
+_WORD_RE = re.compile(r"\w+")
+_PHASE_HEADING_RE = re.compile(r"^## Fase (\S+): (.*)$", re.MULTILINE)
+_HEADER_FIELD_RE = re.compile(r"^\*\*(Session ID|Timestamp|Template):\*\* (.*)$", re.MULTILINE)
+
+
+def normalize_question(question: str) -> str:
+    """Question key for exact hits: case, accents, spacing and surrounding punctuation do not matter."""
+    text = unicodedata.normalize("NFKD", question or "").casefold()
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.split()).strip("¿?¡!.,;: ")
+
+
+def fts_query(text: str) -> str:
+    """FTS5 query matching every word of ``text`` (quoted, so punctuation never breaks the syntax)."""
+    return " ".join(f'"{word}"' for word in _WORD_RE.findall(text))
+
+
+class SessionIndex:
+    """SQLite database of sessions and phase outputs with an FTS5 index (safe to share across threads)."""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                question TEXT,
+                question_key TEXT,
+                reformulation TEXT,
+                template_name TEXT,
+                timestamp TEXT,
+                status TEXT,
+                source TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_question ON sessions (question_key, template_name);
+            CREATE TABLE IF NOT EXISTS phases (
+                session_id TEXT NOT NULL,
+                phase_id TEXT NOT NULL,
+                position INTEGER,
+                name TEXT,
+                output TEXT,
+                PRIMARY KEY (session_id, phase_id)
+            );
+        """)
+        try:
+            self._conn.execute(
+                # Rows share the rowid of their session, so updates and joins never scan the index
+                "CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5("
+                " question, reformulation, outputs, tokenize = 'unicode61 remove_diacritics 2')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE over the same text
+            self.fts = False
+        self._conn.commit()
+
+    def add(self, session: Dict[str, Any], phases: List[Dict[str, str]], source: Optional[str] = None) -> None:
+        """Insert or replace a session: ``session`` fields and ``phases`` as ``{'id', 'name', 'output'}`` in order."""
+        reformulation = next((phase['output'] for phase in phases if phase['id'] == 'A'), None)
+        session_id = session['session_id']
+        with self._lock:
+            previous = self._conn.execute("SELECT rowid FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if previous and self.fts:
+                self._conn.execute("DELETE FROM sessions_fts WHERE rowid = ?", previous)
+            rowid = self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, session.get('question'), normalize_question(session.get('question')), reformulation,
+                 session.get('template_name'), session.get('timestamp'), session.get('status'), source)).lastrowid
+            self._conn.execute("DELETE FROM phases WHERE session_id = ?", (session_id,))
+            self._conn.executemany(
+                "INSERT INTO phases VALUES (?, ?, ?, ?, ?)",
+                [(session_id, phase['id'], position, phase.get('name'), phase.get('output'))
+                 for position, phase in enumerate(phases)])
+            if self.fts:
+                outputs = "\n\n".join(phase.get('output') or '' for phase in phases if phase['id'] != 'A')
+                self._conn.execute("INSERT INTO sessions_fts (rowid, question, reformulation, outputs) VALUES (?, ?, ?, ?)",
+                                   (rowid, session.get('question'), reformulation, outputs))
+            self._conn.commit()
+
+    def add_results(self, results: Dict[str, Any], template: Dict[str, Any], status: str,
+                    source: Optional[str] = None) -> None:
+        """Index a session from the engine's ``results``."""
+        names = {phase['id']: phase.get('name') for phase in template.get('phases', [])}
+        stored = results.get('phases', {})
+        phases = [{'id': phase_id, 'name': names.get(phase_id) or data.get('name'),
+                   'output': phase_field(data, 'output')} for phase_id, data in stored.items()]
+        self.add({'session_id': results['session_id'], 'question': results.get('user_question'),
+                  'template_name': results.get('template_name'), 'timestamp': results.get('timestamp'),
+                  'status': status}, phases, source)
+
+    def search(self, text: str, limit: int = 10, template_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Sessions matching every word of ``text``, best first, with a snippet of the match."""
+        query = fts_query(text)
+        if not query:
+            return []
+        filters, params = "", []
+        if template_name:
+            filters = " AND s.template_name = ?"
+            params.append(template_name)
+        with self._lock:
+            if self.fts:
+                rows = self._fts_search(query, limit, filters, params)
+            else:
+                words = _WORD_RE.findall(text)
+                like = " AND ".join("(s.question || ' ' || IFNULL(s.reformulation, '') LIKE ?)" for _ in words)
+                rows = self._conn.execute(
+                    "SELECT s.session_id, s.question, s.template_name, s.timestamp, s.status, s.reformulation"
+                    f" FROM sessions s WHERE {like}{filters} ORDER BY s.timestamp DESC LIMIT ?",
+                    [f"%{word}%" for word in words] + params + [limit]).fetchall()
+        keys = ('session_id', 'question', 'template_name', 'timestamp', 'status', 'snippet')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def _fts_search(self, query: str, limit: int, filters: str, params: List[Any]) -> List[tuple]:
+        rowids = [row[0] for row in self._conn.execute(
+            "SELECT sessions_fts.rowid FROM sessions_fts JOIN sessions s ON s.rowid = sessions_fts.rowid"
+            f" WHERE sessions_fts MATCH ?{filters} ORDER BY {_BM25} LIMIT ?", [query] + params + [limit])]
+        # Snippets scan whole outputs, so they are built for the returned rows only
+        return [self._conn.execute(
+            "SELECT s.session_id, s.question, s.template_name, s.timestamp, s.status,"
+            " snippet(sessions_fts, -1, '[', ']', '…', 12)"
+            " FROM sessions_fts JOIN sessions s ON s.rowid = sessions_fts.rowid"
+            " WHERE sessions_fts MATCH ? AND sessions_fts.rowid = ?", (query, rowid)).fetchone() for rowid in rowids]
+
+    def exact_match(self, question: str, template_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recent completed session of the same question (and template, if given)."""
+        sql = ("SELECT session_id, question, template_name, timestamp, source FROM sessions"
+               " WHERE question_key = ? AND status = 'completado'")
+        params = [normalize_question(question)]
+        if template_name:
+            sql += " AND template_name = ?"
+            params.append(template_name)
+        with self._lock:
+            row = self._conn.execute(sql + " ORDER BY timestamp DESC LIMIT 1", params).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('session_id', 'question', 'template_name', 'timestamp', 'source'), row))
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """A session with its phases in order, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, question, reformulation, template_name, timestamp, status, source"
+                " FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            phases = self._conn.execute(
+                "SELECT phase_id, name, output FROM phases WHERE session_id = ? ORDER BY position",
+                (session_id,)).fetchall()
+        session = dict(zip(('session_id', 'question', 'reformulation', 'template_name', 'timestamp', 'status',
+                            'source'), row))
+        session['phases'] = [{'id': pid, 'name': name, 'output': output} for pid, name, output in phases]
+        return session
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def session_status(phase_ids: List[str], template: Optional[Dict[str, Any]]) -> str:
+    """'completado' if the phases include every terminal phase of ``template``, else 'importado'."""
+    if not template or not template.get('phases'):
+        # Without the template there is no telling whether the run finished
+        return 'importado'
+    try:
+        terminal = terminal_phases(template['phases'])
+    except SchedulerError:
+        return 'importado'
+    return 'completado' if all(phase_id in phase_ids for phase_id in terminal) else 'importado'
+
+
+def parse_result_markdown(text: str, templates: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+    """Session fields and phases of a ``paep_resultado_<session>.md`` file (None if it is not one).
+
+    ``templates`` maps template names to templates; the one named in the file
+    decides whether the session counts as completed.
+    """
+    if not text.startswith("# Análisis PAEP-R:"):
+        return None
+    header, _, _ = text.partition("\n---\n")
+    session = {'question': header.splitlines()[0][len("# Análisis PAEP-R:"):].strip()}
+    fields = dict(_HEADER_FIELD_RE.findall(header))
+    session.update(session_id=fields.get('Session ID'), timestamp=fields.get('Timestamp'),
+                   template_name=fields.get('Template'))
+    body = text.split("\n## Métricas\n", 1)[0]
+    headings = list(_PHASE_HEADING_RE.finditer(body))
+    phases = []
+    for index, heading in enumerate(headings):
+        end = headings[index + 1].start() if index + 1 < len(headings) else len(body)
+        block = body[heading.end():end].strip()
+        # Drop the tag subheading and the closing rule
+        lines = block.splitlines()
+        if lines and lines[0].startswith("### "):
+            lines = lines[1:]
+        output = "\n".join(lines).strip()
+        if output.endswith("---"):
+            output = output[:-3].rstrip()
+        phases.append({'id': heading.group(1), 'name': heading.group(2).strip(), 'output': output})
+    # The Markdown file does not record whether the run finished; its template's terminal phases do
+    session['status'] = session_status([phase['id'] for phase in phases],
+                                       (templates or {}).get(session['template_name']))
+    return {'session': session, 'phases': phases}
+
+
+def import_markdown(index: SessionIndex, paths: List[str],
+                    templates: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Index every ``paep_resultado_*.md`` in ``paths`` (files or directories, searched recursively)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "paep_resultado_*.md"), recursive=True)))
+        else:
+            files.append(path)
+    started = time.perf_counter()
+    imported, skipped = 0, []
+    for path in files:
+        if path.endswith(".stream.md"):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                parsed = parse_result_markdown(f.read(), templates)
+        except (OSError, UnicodeDecodeError) as e:
+            skipped.append(f"{path}: {e}")
+            continue
+        if not parsed or not parsed['session'].get('session_id'):
+            skipped.append(f"{path}: no es un resultado PAEP-R")
+            continue
+        index.add(parsed['session'], parsed['phases'], source=os.path.abspath(path))
+        imported += 1
+    return {'imported': imported, 'skipped': skipped, 'elapsed_s': time.perf_counter() - started}
+
+
+class SessionIndexSink(ResultSink):
+    """Adds every finished session to the ``SessionIndex``."""
+    name = "index"
+
+    def __init__(self, index: SessionIndex):
+        self.index = index
+
+    def write_phase(self, results: Dict[str, Any], template: Dict[str, Any], phase_id: str) -> None:
+        pass
+
+    def finish_session(self, results: Dict[str, Any], template: Dict[str, Any], status: str) -> Optional[str]:
+        self.index.add_results(results, template, status)
+        # Not a result file of its own: the engine lists only returned paths as outputs
+        return None
@@ -0,0 +1,226 @@
+"""Result sinks: persist each phase as soon as it completes (Markdown, JSONL, SQLite).
+
+Every sink receives the same calls from PAEPEngine, keyed by the session id in
+``results`` so a single sink can be shared by many engines (batch mode):
+
+- ``start_session(results, template)`` - header, plus any phases restored by --resume
+- ``write_phase(results, template, phase_id)`` - one finished phase
+- ``finish_session(results, template, status)`` - final touches; returns the output path
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+from .compact import expanded_phase, phase_field
+from .metrics import format_metrics_table
+
+
+SINK_FORMATS = ("markdown", "jsonl", "sqlite")
+DEFAULT_SQLITE_NAME = "paep_resultados.sqlite3"
+
+
+def phase_title(template: Dict[str, Any], phase_id: str) -> str:
+    """Phase name as declared in the template."""
+    for phase in template.get('phases', []):
+        if phase['id'] == phase_id:
+            return phase.get('name', f'Fase {phase_id}')
+    return f'Fase {phase_id}'
+
+
+def phase_tag(template: Dict[str, Any], phase_id: str) -> str:
+    """Output tag from the template's ``phase_tags`` (``fase_<id>`` if missing)."""
+    return (template.get('phase_tags') or {}).get(phase_id, f'fase_{phase_id}')
+
+
+class ResultSink:
+    name = "base"
+
+    def start_session(self, results: Dict[str, Any], template: Dict[str, Any]) -> None:
+        pass
+
+    def write_phase(self, results: Dict[str, Any], template: Dict[str, Any], phase_id: str) -> None:
+        raise NotImplementedError
+
+    def finish_session(self, results: Dict[str, Any], template: Dict[str, Any], status: str) -> Optional[str]:
+        return None
+
+
+class MarkdownSink(ResultSink):
+    """Human-readable ``paep_resultado_<session>.md``.
+
+    Phases are appended in completion order while the session runs; on finish the
+    file is rewritten atomically in template order with the metrics table.
+    """
+    name = "markdown"
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+
+    def path_for(self, session_id: str) -> str:
+        return os.path.join(self.output_dir, f"paep_resultado_{session_id}.md")
+
+    @staticmethod
+    def _header(results: Dict[str, Any]) -> str:
+        return (f"# Análisis PAEP-R: {results.get('user_question', 'N/A')}\n\n"
+                f"**Session ID:** {results.get('session_id', 'N/A')}\n"
+                f"**Timestamp:** {results.get('timestamp', 'N/A')}\n"
+                f"**Template:** {results.get('template_name', 'N/A')}\n\n"
+                "---\n\n")
+
+    @staticmethod
+    def _phase(results: Dict[str, Any], template: Dict[str, Any], phase_id: str) -> str:
+        phase_data = results['phases'][phase_id]
+        tag_name = phase_tag(template, phase_id)
+        return (f"## Fase {phase_id}: {phase_title(template, phase_id)}\n\n"
+                f"### {tag_name.replace('_', ' ').title()}\n\n"
+                f"{phase_field(phase_data, 'output') or 'Sin contenido'}\n\n"
+                "---\n\n")
+
+    def start_session(self, results: Dict[str, Any], template: Dict[str, Any]) -> None:
+        with open(self.path_for(results['session_id']), 'w', encoding='utf-8') as f:
+            f.write(self._header(results))
+            for phase_id in results.get('phases', {}):
+                f.write(self._phase(results, template, phase_id))
+
+    def write_phase(self, results: Dict[str, Any], template: Dict[str, Any], phase_id: str) -> None:
+        with open(self.path_for(results['session_id']), 'a', encoding='utf-8') as f:
+            f.write(self._phase(results, template, phase_id))
+
+    def finish_session(self, results: Dict[str, Any], template: Dict[str, Any], status: str) -> Optional[str]:
+        path = self.path_for(results['session_id'])
+        parts = [self._header(results)]
+        for phase in template.get('phases', []):
+            if phase['id'] in results.get('phases', {}):
+                parts.append(self._phase(results, template, phase['id']))
+        if results.get('metrics'):
+            parts.append("## Métricas\n\n" + format_metrics_table(results['metrics']) + "\n")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("".join(parts))
+        os.replace(tmp_path, path)
+        return path
+
+
+class JsonlSink(ResultSink):
+    """``paep_resultado_<session>.jsonl``: one record per event, with prompts and raw responses."""
+    name = "jsonl"
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+
+    def path_for(self, session_id: str) -> str:
+        return os.path.join(self.output_dir, f"paep_resultado_{session_id}.jsonl")
+
+    def _append(self, session_id: str, records: List[Dict[str, Any]], mode: str = 'a') -> None:
+        with open(self.path_for(session_id), mode, encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _phase_record(results: Dict[str, Any], template: Dict[str, Any], phase_id: str) -> Dict[str, Any]:
+        return {'type': 'phase', 'session_id': results['session_id'], 'phase_id': phase_id,
+                'tag': phase_tag(template, phase_id), **expanded_phase(results['phases'], phase_id)}
+
+    def start_session(self, results: Dict[str, Any], template: Dict[str, Any]) -> None:
+        records = [{'type': 'session', 'session_id': results['session_id'], 'user_question': results.get('user_question'),
+                    'template_name': results.get('template_name'), 'timestamp': results.get('timestamp')}]
+        records.extend(self._phase_record(results, template, phase_id) for phase_id in results.get('phases', {}))
+        self._append(results['session_id'], records, mode='w')
+
+    def write_phase(self, results: Dict[str, Any], template: Dict[str, Any], phase_id: str) -> None:
+        self._append(results['session_id'], [self._phase_record(results, template, phase_id)])
+
+    def finish_session(self, results: Dict[str, Any], template: Dict[str, Any], status: str) -> Optional[str]:
+        self._append(results['session_id'], [{'type': 'end', 'session_id': results['session_id'], 'status': status,
+                                              'usage': results.get('usage'), 'metrics': results.get('metrics')}])
+        return self.path_for(results['session_id'])
+
+
+class SQLiteSink(ResultSink):
+    """One SQLite database for many sessions, with a row per phase (safe to share across threads)."""
+    name = "sqlite"
+
+    def __init__(self, db_path: str):
+        self.path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                user_question TEXT,
+                template_name TEXT,
+                timestamp TEXT,
+                status TEXT,
+                usage TEXT,
+                metrics TEXT
+            );
+            CREATE TABLE IF NOT EXISTS phases (
+                session_id TEXT NOT NULL,
+                phase_id TEXT NOT NULL,
+                name TEXT,
+                tag TEXT,
+                input TEXT,
+                output TEXT,
+                full_prompt_sent TEXT,
+                raw_llm_response TEXT,
+                metrics TEXT,
+                PRIMARY KEY (session_id, phase_id)
+            );
+        """)
+        self._conn.commit()
+
+    def _upsert_phase(self, results: Dict[str, Any], template: Dict[str, Any], phase_id: str) -> None:
+        data = expanded_phase(results['phases'], phase_id)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO phases VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (results['session_id'], phase_id, data.get('name'), phase_tag(template, phase_id),
+             json.dumps(data.get('input'), ensure_ascii=False), data.get('output'), data.get('full_prompt_sent'),
+             data.get('raw_llm_response'), json.dumps(data.get('metrics'), ensure_ascii=False)))
+
+    def start_session(self, results: Dict[str, Any], template: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, user_question, template_name, timestamp, status) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (results['session_id'], results.get('user_question'), results.get('template_name'),
+                 results.get('timestamp'), 'en_progreso'))
+            for phase_id in results.get('phases', {}):
+                self._upsert_phase(results, template, phase_id)
+            self._conn.commit()
+
+    def write_phase(self, results: Dict[str, Any], template: Dict[str, Any], phase_id: str) -> None:
+        with self._lock:
+            self._upsert_phase(results, template, phase_id)
+            self._conn.commit()
+
+    def finish_session(self, results: Dict[str, Any], template: Dict[str, Any], status: str) -> Optional[str]:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET status = ?, usage = ?, metrics = ? WHERE session_id = ?",
+                (status, json.dumps(results.get('usage'), ensure_ascii=False),
+                 json.dumps(results.get('metrics'), ensure_ascii=False), results['session_id']))
+            self._conn.commit()
+        return self.path
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def build_sinks(formats: List[str], output_dir: str, sqlite_path: Optional[str] = None) -> List[ResultSink]:
+    """Create sinks for the given format names (see ``SINK_FORMATS``)."""
+    sinks: List[ResultSink] = []
+    for name in formats:
+        if name == "markdown":
+            sinks.append(MarkdownSink(output_dir))
+        elif name == "jsonl":
+            sinks.append(JsonlSink(output_dir))
+        elif name == "sqlite":
+            sinks.append(SQLiteSink(sqlite_path or os.path.join(output_dir, DEFAULT_SQLITE_NAME)))
+        else:
+            raise ValueError(f"Formato de salida desconocido: {name} (opciones: {', '.join(SINK_FORMATS)})")
+    return sinks
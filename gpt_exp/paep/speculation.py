@@ -0,0 +1,98 @@
+"""Speculative execution of the phases that wait on a user-validated output.
+
+While the user reads and validates the Phase A reformulation, the phases that
+only depend on it are started in the background with the proposed text. If the
+user approves it unchanged their results are adopted; otherwise they are discarded.
+Discarded runs are cancelled through their deadline and never waited for.
+"""
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from .console import QuietThreadsStdout
+from .deadline import Deadline
+
+
+class Speculation:
+    """Background runs of ``phases`` computed from a proposed ``basis_output`` of ``basis_id``.
+
+    ``execute(phase, phase_outputs, deadline)`` must return the same result dict as
+    ``PAEPEngine.execute_phase`` (or None on failure) and give up once ``deadline``
+    is cancelled. The speculation deadline is a child of ``deadline`` (the session's).
+    """
+
+    def __init__(self, execute: Callable[[Dict[str, Any], Dict[str, str], Deadline], Optional[Dict[str, Any]]],
+                 basis_id: str, basis_output: str, phase_outputs: Dict[str, str], max_workers: int = 1,
+                 deadline: Optional[Deadline] = None):
+        self.execute = execute
+        self.basis_id = basis_id
+        self.basis_output = basis_output
+        self.phase_outputs = dict(phase_outputs, **{basis_id: basis_output})
+        self.valid: Optional[bool] = None
+        self.futures: Dict[str, Future] = {}
+        self.deadline = (deadline or Deadline()).child(None, label="la ejecución especulativa")
+        self._launched: List[Future] = []
+        self.stats = {'launched': 0, 'used': 0, 'discarded': 0}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="paep-spec")
+        self._previous_stdout = sys.stdout
+        self._stdout = QuietThreadsStdout(sys.stdout)
+        sys.stdout = self._stdout
+
+    def start(self, phases: List[Dict[str, Any]]) -> None:
+        for phase in phases:
+            self.futures[phase['id']] = self._executor.submit(self._run, phase)
+        self._launched = list(self.futures.values())
+        self.stats['launched'] = len(self.futures)
+
+    def _run(self, phase: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], str]:
+        with self._stdout.capture() as log:
+            try:
+                result = self.execute(phase, self.phase_outputs, self.deadline)
+            except Exception as e:
+                print(f"❌ Error en ejecución especulativa: {e}")
+                result = None
+        return result, log.getvalue()
+
+    def resolve(self, final_output: str) -> bool:
+        """Keep the speculative runs only if the validated output equals the proposal."""
+        self.valid = final_output == self.basis_output
+        if not self.valid:
+            # Runs in flight stop at their next deadline check; their results are ignored
+            self.deadline.cancel()
+            for future in self.futures.values():
+                future.cancel()
+            self.stats['discarded'] = len(self.futures)
+            self.futures.clear()
+        return self.valid
+
+    def take(self, phase_id: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Wait for and return ``(result, captured_log)`` of a valid speculative run, if any."""
+        if not self.valid:
+            return None
+        future = self.futures.pop(phase_id, None)
+        if future is None:
+            return None
+        result, log = future.result()
+        with self._lock:
+            self.stats['used' if result is not None else 'discarded'] += 1
+        return (result, log) if result is not None else None
+
+    def close(self) -> None:
+        """Discard the runs not taken without waiting for the ones still in flight."""
+        self.deadline.cancel()
+        for future in self.futures.values():
+            future.cancel()
+        self.stats['discarded'] += len(self.futures)
+        self.futures.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        # Runs still in flight keep writing to their capture until they finish
+        for future in self._launched:
+            future.add_done_callback(self._restore_stdout)
+        self._restore_stdout()
+
+    def _restore_stdout(self, _future: Optional[Future] = None) -> None:
+        with self._lock:
+            if all(future.done() for future in self._launched) and sys.stdout is self._stdout:
+                sys.stdout = self._previous_stdout
@@ -0,0 +1,15 @@
+"""Template loading, kept free of heavy imports so the CLI can read a template cheaply."""
+import json
+from typing import Dict, Any, Optional
+
+
+def load_template(template_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(template_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"❌ Template file not found: {template_path}")
+        return None
+    except json.JSONDecodeError as e:
+        print(f"❌ Invalid JSON in template file: {e}")
+        return None
@@ -0,0 +1,80 @@
+"""Shared, pooled HTTP transport for the LLM backends, with an optional connection warm-up."""
+import importlib.util
+import threading
+import time
+from typing import Dict, Any, Tuple
+
+
+class TransportConfig:
+    """Connection pool, keep-alive, timeout and HTTP/2 settings of the shared HTTP client."""
+
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10, keepalive_expiry: float = 60.0,
+                 connect_timeout: float = 10.0, read_timeout: float = 600.0, http2: bool = True):
+        self.max_connections = max(1, max_connections)
+        self.max_keepalive_connections = max(0, min(max_keepalive_connections, self.max_connections))
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2
+
+    def key(self) -> Tuple:
+        return (self.max_connections, self.max_keepalive_connections, self.keepalive_expiry, self.connect_timeout,
+                self.read_timeout, self.use_http2())
+
+    def use_http2(self) -> bool:
+        # httpx only speaks HTTP/2 with the optional 'h2' package installed
+        return self.http2 and importlib.util.find_spec("h2") is not None
+
+    def httpx_timeout(self):
+        import httpx
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+
+_clients: Dict[Tuple, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def shared_http_client(config: TransportConfig):
+    """One ``httpx.Client`` per configuration, reused by every backend and engine of the process."""
+    with _clients_lock:
+        client = _clients.get(config.key())
+        if client is None:
+            import httpx
+            client = httpx.Client(
+                limits=httpx.Limits(max_connections=config.max_connections,
+                                    max_keepalive_connections=config.max_keepalive_connections,
+                                    keepalive_expiry=config.keepalive_expiry),
+                timeout=config.httpx_timeout(),
+                http2=config.use_http2(),
+            )
+            _clients[config.key()] = client
+        return client
+
+
+def warm_up(client, url: str) -> Dict[str, Any]:
+    """Open a pooled connection (TCP + TLS) to ``url`` ahead of the first request.
+
+    The handshake time is measured with httpx's ``trace`` extension, so a
+    connection that is already in the pool reports zero.
+    """
+    started: Dict[str, float] = {}
+    spent = {"connect_tcp": 0.0, "start_tls": 0.0}
+
+    def trace(event: str, info: Dict[str, Any]) -> None:
+        name, _, stage = event.rpartition(".")
+        step = name.rpartition(".")[2]
+        if step not in spent:
+            return
+        if stage == "started":
+            started[step] = time.perf_counter()
+        elif stage == "complete" and step in started:
+            spent[step] += time.perf_counter() - started.pop(step)
+
+    begin = time.perf_counter()
+    # Any status will do (the endpoint root usually answers 404): only the open connection matters
+    response = client.head(url, extensions={"trace": trace})
+    return {
+        "warm_up_s": time.perf_counter() - begin,
+        "handshake_s": spent["connect_tcp"] + spent["start_tls"],
+        "http_version": response.http_version,
+    }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Benchmark harness for the PAEP pipeline against the offline fake LLM backend.
+
+Runs full auto-approved analyses for each template at several concurrency
+levels and emits JSON with per-phase prompt size and context build time,
+end-to-end latency and sessions/sec, so results can be diffed between versions.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+from paep.backends import FakeBackend
+from paep.engine import PAEPEngine
+from paep.llm_client import LLMClient
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def git_revision(path: Path) -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=path,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_level(template: Dict[str, Any], sessions: int, concurrency: int, args: argparse.Namespace,
+              output_dir: str) -> Dict[str, Any]:
+    """Run ``sessions`` analyses with ``concurrency`` in flight and aggregate their metrics."""
+    backend = FakeBackend(latency=args.latency, output_tokens=args.output_tokens,
+                          tokens_per_second=args.tokens_per_second)
+    llm = LLMClient(backend=backend)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+    def one_session(index: int) -> Dict[str, Any]:
+        engine = PAEPEngine(llm, auto_approve=True, max_workers=args.phase_workers,
+                            session_id=f"bench_{stamp}_{index:04d}", output_dir=output_dir)
+        started = time.perf_counter()
+        # Distinct questions so the fake backend does not return identical outputs
+        results = engine.run_analysis(f"{args.question} (#{index})", template)
+        return {"elapsed_s": time.perf_counter() - started, "results": results}
+
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            runs = list(pool.map(one_session, range(sessions)))
+    wall = time.perf_counter() - started
+
+    latencies = [run["elapsed_s"] for run in runs]
+    phases: Dict[str, Dict[str, List[float]]] = {}
+    completed = 0
+    for run in runs:
+        run_phases = run["results"].get("phases", {})
+        if len(run_phases) == len(template.get("phases", [])):
+            completed += 1
+        for phase_id, data in run_phases.items():
+            metrics = data.get("metrics") or {}
+            stats = phases.setdefault(phase_id, {"prompt_chars": [], "prompt_tokens_est": [],
+                                                 "context_build_ms": [], "llm_wall_ms": []})
+            stats["prompt_chars"].append(metrics.get("prompt_chars", 0))
+            stats["prompt_tokens_est"].append(metrics.get("prompt_tokens_est", 0))
+            stats["context_build_ms"].append(metrics.get("context_build_s", 0.0) * 1000)
+            stats["llm_wall_ms"].append(metrics.get("wall_s", 0.0) * 1000)
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "completed_sessions": completed,
+        "wall_s": round(wall, 4),
+        "sessions_per_s": round(sessions / wall, 4) if wall > 0 else 0.0,
+        "latency_s": {
+            "mean": round(statistics.mean(latencies), 4),
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "max": round(max(latencies), 4),
+        },
+        "phases": {
+            phase_id: {
+                "prompt_chars": round(statistics.mean(stats["prompt_chars"]), 1),
+                "prompt_tokens_est": round(statistics.mean(stats["prompt_tokens_est"]), 1),
+                "context_build_ms": round(statistics.mean(stats["context_build_ms"]), 4),
+                "llm_wall_ms": round(statistics.mean(stats["llm_wall_ms"]), 3),
+            }
+            for phase_id, stats in phases.items()
+        },
+    }
+
+
+def main():
+    script_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline PAEP-R con un LLM simulado")
+    parser.add_argument(
+        "--templates",
+        default=",".join(str(script_dir / name) for name in ("paep_template.json", "paep_template_test.json")),
+        help="Templates a medir, separados por comas"
+    )
+    parser.add_argument("--concurrency", default="1,4,16", help="Niveles de concurrencia de sesiones, separados por comas")
+    parser.add_argument("--sessions", type=int, default=16, help="Sesiones por nivel de concurrencia")
+    parser.add_argument("--phase-workers", type=int, default=4, help="Fases en paralelo dentro de cada sesión")
+    parser.add_argument("--latency", type=float, default=0.05, help="Segundos hasta el primer token del LLM simulado")
+    parser.add_argument("--output-tokens", type=int, default=200, help="Tokens por respuesta del LLM simulado")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="Velocidad de generación simulada")
+    parser.add_argument("--question", default="¿Cómo se relacionan la ignorancia, la incertidumbre y la sorpresa?",
+                        help="Pregunta base usada en las sesiones")
+    parser.add_argument("--output", "-o", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "git_revision": git_revision(script_dir),
+        "python": platform.python_version(),
+        "config": {
+            "sessions": args.sessions,
+            "phase_workers": args.phase_workers,
+            "latency_s": args.latency,
+            "output_tokens": args.output_tokens,
+            "tokens_per_second": args.tokens_per_second,
+        },
+        "templates": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="paep_bench_") as output_dir:
+        for template_path in [path.strip() for path in args.templates.split(",") if path.strip()]:
+            with open(template_path, 'r', encoding='utf-8') as f:
+                template = json.load(f)
+            name = template.get("template_name", Path(template_path).stem)
+            print(f"⏱️  {name}: {len(template.get('phases', []))} fases", file=sys.stderr)
+            levels_report = []
+            for concurrency in levels:
+                level = run_level(template, args.sessions, concurrency, args, output_dir)
+                print(f"   • concurrencia {concurrency}: {level['sessions_per_s']} sesiones/s, "
+                      f"p50 {level['latency_s']['p50']}s", file=sys.stderr)
+                levels_report.append(level)
+            report["templates"][name] = {"path": template_path, "levels": levels_report}
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        print(f"💾 Benchmark guardado en: {os.path.abspath(args.output)}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
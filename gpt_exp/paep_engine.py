@@ -6,11 +6,515 @@ import os
 import sys
 from pathlib import Path
 
-from paep.engine import PAEPEngine
-from paep.llm_client import LLMClient
+# Heavy modules (engine, LLM SDKs) are imported where they are used so that --help,
+# argument errors and submissions to a running service start fast (see paep_startup_bench.py)
+
+
+def build_backend(args: argparse.Namespace):
+    """Create the LLM backend selected on the command line."""
+    from paep import backends
+
+    if args.replay:
+        try:
+            return backends.RecordReplayBackend(args.replay, mode="replay")
+        except (OSError, ValueError) as e:
+            print(f"❌ No se pudo abrir el cassette: {e}")
+            sys.exit(1)
+
+    if args.backend == "fake":
+        backend = backends.FakeBackend(latency=args.fake_latency, output_tokens=args.fake_output_tokens)
+    elif args.backend == "openai":
+        backend = backends.OpenAICompatibleBackend(args.base_url, api_key=os.getenv("OPENAI_API_KEY"))
+    else:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            print("❌ GROQ_API_KEY environment variable not set!")
+            print("💡 Set it with: export GROQ_API_KEY='your-api-key-here'")
+            sys.exit(1)
+        from paep.transport import TransportConfig
+        transport = TransportConfig(max_connections=args.pool_size, max_keepalive_connections=args.pool_size,
+                                    connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                                    http2=not args.no_http2)
+        backend = backends.GroqBackend(api_key, transport=transport)
+
+    if args.record:
+        backend = backends.RecordReplayBackend(args.record, inner=backend, mode="record")
+    return backend
+
+
+def build_metrics_exporter(args: argparse.Namespace):
+    """Metrics exporter for --metrics-jsonl / --metrics-prom, or None."""
+    if not (args.metrics_jsonl or args.metrics_prom):
+        return None
+    from paep.metrics import MetricsExporter
+    return MetricsExporter(jsonl_path=args.metrics_jsonl, prometheus_path=args.metrics_prom)
+
+
+def build_result_sinks(args: argparse.Namespace, index=None):
+    """Result sinks for --output-format (comma-separated), plus ``index`` (see open_session_index) if given."""
+    from paep.sinks import build_sinks
+
+    formats = [name.strip().lower() for name in args.output_format.split(",") if name.strip()]
+    try:
+        sinks = build_sinks(formats, os.environ.get('PAEP_OUTPUT_DIR', '.'), sqlite_path=args.sqlite_db)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if index:
+        from paep.session_index import SessionIndexSink
+        sinks.append(SessionIndexSink(index))
+    return sinks
+
+
+def open_session_index(args: argparse.Namespace):
+    """Local index of past sessions (--index-db), or None with --no-index or if it cannot be opened."""
+    if getattr(args, 'no_index', False):
+        return None
+    import sqlite3
+    from paep.session_index import SessionIndex, DEFAULT_INDEX_PATH
+    try:
+        return SessionIndex(args.index_db or DEFAULT_INDEX_PATH)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️  No se pudo abrir el índice de sesiones: {e}")
+        return None
+
+
+def print_indexed_session(session: dict, phase_id=None) -> None:
+    print(f"# Análisis PAEP-R: {session['question']}")
+    print(f"🆔 {session['session_id']} · {session.get('timestamp') or 'N/A'} · {session.get('template_name') or 'N/A'}"
+          f" · {session.get('status') or 'N/A'}")
+    if session.get('source'):
+        print(f"📄 {session['source']}")
+    for phase in session['phases']:
+        if phase_id and phase['id'] != phase_id:
+            continue
+        print(f"\n## Fase {phase['id']}: {phase.get('name') or ''}\n")
+        print(phase.get('output') or 'Sin contenido')
+
+
+def offer_indexed_session(args: argparse.Namespace, index, question: str, template: dict) -> bool:
+    """Offer a completed analysis of the same question before spending tokens; True if it was used."""
+    if not index:
+        return False
+    hit = index.exact_match(question, template.get('template_name'))
+    if not hit:
+        return False
+    print(f"📚 Ya existe un análisis de esta pregunta: sesión {hit['session_id']} ({hit.get('timestamp') or 'N/A'})")
+    if args.auto_approve:
+        print(f"💡 Para verlo: paep-cli show {hit['session_id']}")
+        return False
+    try:
+        answer = input("❓ ¿Mostrarlo en lugar de ejecutar un análisis nuevo? (s/n): ").strip().lower()
+    except KeyboardInterrupt:
+        print("\n⏹️  Operación cancelada por el usuario")
+        sys.exit(0)
+    if answer not in ['s', 'si', 'yes', 'y']:
+        return False
+    print_indexed_session(index.get(hit['session_id']))
+    return True
+
+
+INDEX_COMMANDS = ("search", "show", "import")
+
+
+def templates_by_name(paths) -> dict:
+    """Templates keyed by template_name; files that are not PAEP templates are skipped."""
+    import json
+    templates = {}
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                template = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(template, dict) and template.get('phases'):
+            templates.setdefault(template.get('template_name') or Path(path).stem, template)
+    return templates
+
+
+def run_index_command(argv) -> None:
+    """paep-cli search | show | import: query or fill the local index of past sessions."""
+    import time
+    from paep.session_index import SessionIndex, DEFAULT_INDEX_PATH, import_markdown
+
+    parser = argparse.ArgumentParser(prog=f"paep-cli {argv[0]}", description="Índice local de sesiones PAEP-R")
+    parser.add_argument("--index-db", metavar="FILE", default=DEFAULT_INDEX_PATH,
+                        help="Base de datos del índice (por defecto ~/.cache/paep/sesiones.sqlite3)")
+    if argv[0] == "search":
+        parser.add_argument("query", nargs="+", help="Palabras a buscar en preguntas, reformulaciones y fases")
+        parser.add_argument("--limit", type=int, default=10, help="Máximo de resultados")
+        parser.add_argument("--template", help="Solo sesiones de este template (template_name)")
+    elif argv[0] == "show":
+        parser.add_argument("session_id", help="ID de la sesión")
+        parser.add_argument("--phase", help="Mostrar solo esta fase")
+    else:
+        parser.add_argument("paths", nargs="*", default=[os.environ.get('PAEP_OUTPUT_DIR', '.')],
+                            help="Archivos paep_resultado_*.md o directorios (por defecto el directorio actual)")
+        parser.add_argument("--templates", metavar="FILES",
+                            help="Templates (separados por comas) que indican cuándo una sesión está completa "
+                                 "(por defecto los *template*.json junto a paep_engine.py)")
+    args = parser.parse_args(argv[1:])
+    index = SessionIndex(args.index_db)
+
+    if argv[0] == "search":
+        started = time.perf_counter()
+        hits = index.search(" ".join(args.query), limit=args.limit, template_name=args.template)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for hit in hits:
+            print(f"🆔 {hit['session_id']} · {hit.get('timestamp') or 'N/A'} · {hit.get('template_name') or 'N/A'}")
+            print(f"   ❓ {hit['question']}")
+            snippet = " ".join((hit.get('snippet') or '').split())
+            if snippet:
+                print(f"   🔎 {snippet[:200]}")
+        print(f"📚 {len(hits)} resultado(s) en {elapsed_ms:.1f} ms ({index.count()} sesiones indexadas)")
+    elif argv[0] == "show":
+        session = index.get(args.session_id)
+        if not session:
+            print(f"❌ Sesión no encontrada en el índice: {args.session_id}")
+            sys.exit(1)
+        print_indexed_session(session, args.phase)
+    else:
+        paths = ([p.strip() for p in args.templates.split(",") if p.strip()] if args.templates
+                 else sorted(str(path) for path in Path(__file__).parent.glob("*template*.json")))
+        summary = import_markdown(index, args.paths, templates_by_name(paths))
+        for reason in summary['skipped']:
+            print(f"⚠️  Omitido {reason}")
+        print(f"📥 {summary['imported']} sesión(es) importada(s) en {summary['elapsed_s']:.2f}s "
+              f"({index.count()} sesiones indexadas)")
+    index.close()
+
+
+def build_output_history(args: argparse.Namespace):
+    """Output-length history for adaptive max_tokens, unless disabled (or recording/replaying a cassette)."""
+    # Cassettes are keyed on the exact request, so max_tokens must not drift between recording and replay
+    if args.no_adaptive_max_tokens or args.record or args.replay:
+        return None
+    from paep.cache import DEFAULT_CACHE_DIR
+    from paep.history import OutputLengthHistory
+    return OutputLengthHistory(args.cache_dir or DEFAULT_CACHE_DIR)
+
+
+def build_latency_history(args: argparse.Namespace):
+    from paep.cache import DEFAULT_CACHE_DIR
+    from paep.history import LatencyHistory
+    return LatencyHistory(args.cache_dir or DEFAULT_CACHE_DIR)
+
+
+def hedging_overrides(args: argparse.Namespace):
+    """Hedging settings given on the command line, merged over the template's 'hedging' block."""
+    overrides = {}
+    if args.hedge:
+        overrides['enabled'] = True
+    if args.hedge_model:
+        overrides['model'] = args.hedge_model
+    return overrides or None
+
+
+def timeout_overrides(args: argparse.Namespace):
+    """Deadline settings given on the command line, merged over the template's 'timeouts' block."""
+    overrides = {}
+    if args.deadline is not None:
+        overrides['session_s'] = args.deadline
+    if args.phase_timeout is not None:
+        overrides['phase_s'] = args.phase_timeout
+    if args.on_timeout:
+        overrides['on_timeout'] = args.on_timeout
+    return overrides or None
+
+
+def spill_dir_for(args: argparse.Namespace, many_sessions: bool):
+    """Directory for spilled phase texts: --spill-dir, or paep_spill/ when many sessions share the process."""
+    if args.no_spill:
+        return None
+    if args.spill_dir or not many_sessions:
+        return args.spill_dir
+    return os.path.join(os.environ.get('PAEP_OUTPUT_DIR', '.'), 'paep_spill')
+
+
+def run_questions_file(llm: "LLMClient", args: argparse.Namespace) -> None:
+    """Batch mode: one template, one LLM client, many auto-approved analyses."""
+    from paep.batch import load_questions, run_batch, BatchError
+    from paep.templates import load_template
+
+    try:
+        questions = load_questions(args.questions_file)
+    except BatchError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if not questions:
+        print("❌ El archivo de preguntas está vacío.")
+        sys.exit(1)
+
+    template = load_template(args.template)
+    if not template:
+        sys.exit(1)
+
+    index = open_session_index(args)
+    try:
+        summary = run_batch(llm, template, questions, workers=args.batch_workers,
+                            phase_workers=args.phase_workers, quiet=not args.verbose_llm,
+                            metrics_exporter=build_metrics_exporter(args), sinks=build_result_sinks(args, index),
+                            output_history=build_output_history(args), max_continuations=args.max_continuations,
+                            latency_history=build_latency_history(args), hedging=hedging_overrides(args),
+                            spill_dir=spill_dir_for(args, many_sessions=True), spill_threshold=args.spill_threshold,
+                            fan_out=not args.no_fan_out, timeouts=timeout_overrides(args))
+    except KeyboardInterrupt:
+        print("\n⏹️  Lote interrumpido por usuario")
+        sys.exit(1)
+    finally:
+        if index:
+            index.close()
+
+    print(f"\n📊 Resumen del Lote:")
+    print(f"   • Preguntas: {summary['total_questions']} ({summary['succeeded']} ok, {summary['failed']} fallidas)")
+    print(f"   • Tiempo total: {summary['elapsed_s']}s ({summary['throughput_per_min']} análisis/min)")
+    print(f"   • Resultados: {summary['results_file']}")
+    print(f"   • Resumen: {summary['summary_file']}")
+    if llm.cache:
+        stats = llm.cache.stats()
+        print(f"   • Caché LLM: {stats['hits']} aciertos, {stats['misses']} fallos")
+    if summary['failed']:
+        sys.exit(2)
+
+
+def run_template_comparison(llm: "LLMClient", args: argparse.Namespace) -> None:
+    """--templates: one question under several templates, identical phases executed once."""
+    from paep.compare import run_comparison
+    from paep.templates import load_template
+
+    templates = {}
+    for path in [p.strip() for p in args.templates.split(",") if p.strip()]:
+        template = load_template(path)
+        if not template:
+            sys.exit(1)
+        name = template.get('template_name') or Path(path).stem
+        if name in templates:
+            name = f"{name}_{Path(path).stem}"
+        templates[name] = template
+    if len(templates) < 2:
+        print("❌ --templates necesita al menos dos templates separados por comas")
+        sys.exit(1)
+
+    question = args.question
+    if not question:
+        try:
+            question = input("🤔 Ingresa tu pregunta para comparar los templates: ").strip()
+        except KeyboardInterrupt:
+            print("\n⏹️  Operación cancelada por el usuario")
+            sys.exit(0)
+        if not question:
+            print("❌ No se proporcionó ninguna pregunta.")
+            sys.exit(1)
+
+    index = open_session_index(args)
+    try:
+        summary = run_comparison(llm, templates, question, phase_workers=args.phase_workers,
+                                 quiet=not args.verbose_llm, metrics_exporter=build_metrics_exporter(args),
+                                 sinks=build_result_sinks(args, index), output_history=build_output_history(args),
+                                 max_continuations=args.max_continuations, latency_history=build_latency_history(args),
+                                 hedging=hedging_overrides(args), fan_out=not args.no_fan_out,
+                                 timeouts=timeout_overrides(args))
+    except KeyboardInterrupt:
+        print("\n⏹️  Comparación interrumpida por usuario")
+        sys.exit(1)
+    finally:
+        if index:
+            index.close()
+
+    print(f"\n📊 Comparación de Templates:")
+    for name, item in summary['templates'].items():
+        shared = f", compartidas: {', '.join(item['shared_phases'])}" if item['shared_phases'] else ""
+        print(f"   • {name}: {item['status']}, {item['phases']} fases en {item['elapsed_s']:.2f}s, "
+              f"{item['total_tokens']} tokens ({item['own_tokens']} propios{shared})")
+    print(f"   • Tiempo total: {summary['elapsed_s']:.2f}s, tokens ahorrados: {summary['tokens_saved']}")
+    for path in summary['report_files']:
+        print(f"   • Informe: {os.path.abspath(path)}")
+    if any(item['status'] != 'ok' for item in summary['templates'].values()):
+        sys.exit(2)
+
+
+def run_service(llm: "LLMClient", args: argparse.Namespace) -> None:
+    """--serve: keep the LLM client and templates warm and accept jobs over HTTP."""
+    from paep.service import PAEPService, ServiceError, serve
+    from paep.session_index import DEFAULT_INDEX_PATH
+    from paep.templates import load_template
+
+    templates = {}
+    for path in [p.strip() for p in args.template.split(",") if p.strip()]:
+        template = load_template(path)
+        if not template:
+            sys.exit(1)
+        templates[template.get('template_name') or Path(path).stem] = template
+
+    formats = [name.strip().lower() for name in args.output_format.split(",") if name.strip()]
+    try:
+        service = PAEPService(llm, templates, workers=args.service_workers, queue_size=args.service_queue,
+                              phase_workers=args.phase_workers, output_formats=formats, sqlite_path=args.sqlite_db,
+                              metrics_exporter=build_metrics_exporter(args), output_history=build_output_history(args),
+                              max_continuations=args.max_continuations, latency_history=build_latency_history(args),
+                              hedging=hedging_overrides(args), spill_dir=spill_dir_for(args, many_sessions=True),
+                              spill_threshold=args.spill_threshold, fan_out=not args.no_fan_out,
+                              timeouts=timeout_overrides(args),
+                              index_path=None if args.no_index else (args.index_db or DEFAULT_INDEX_PATH))
+    except (ServiceError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    try:
+        serve(service, host=args.host, port=args.port)
+    except OSError as e:
+        print(f"❌ No se pudo iniciar el servicio en {args.host}:{args.port}: {e}")
+        sys.exit(1)
+
+
+# Options a job submitted to the service keeps; the service runs every other setting as it was started
+SERVICE_JOB_OPTIONS = ("question", "template", "auto_approve", "save_only")
+
+
+def service_ignored_flags(parser: argparse.ArgumentParser, args: argparse.Namespace) -> list:
+    """Flags set to a non-default value that the service would not apply (the analysis then runs locally)."""
+    return [f"--{dest.replace('_', '-')}" for dest, value in vars(args).items()
+            if dest not in SERVICE_JOB_OPTIONS and value != parser.get_default(dest)]
+
+
+def submit_to_service(client, args: argparse.Namespace) -> bool:
+    """Run the analysis on a running PAEP service, echoing its progress; False if the service refused the job."""
+    from paep.service_client import ServiceError
+    from paep.templates import load_template
+
+    template = load_template(args.template)
+    if not template:
+        sys.exit(1)
+    try:
+        job = client.submit(args.question, template=template,
+                            output_dir=os.path.abspath(os.environ.get('PAEP_OUTPUT_DIR', '.')))
+    except ServiceError as e:
+        if e.status_code != 403:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"ℹ️  El servicio PAEP no escribe en este directorio ({e}); ejecutando en local")
+        return False
+    try:
+        print(f"🛰️  Enviado al servicio PAEP en {client.url} (trabajo {job['id']})")
+        for event in client.events(job['id']):
+            if event['type'] == 'log':
+                print(event['text'])
+        final = client.result(job['id'])
+    except ServiceError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print(f"\n⏹️  Dejando de seguir el trabajo {job['id']} (sigue ejecutándose en el servicio)")
+        sys.exit(1)
+
+    if not args.save_only:
+        print_summary(final['results'] or {}, len(template.get('phases', [])))
+    if final['status'] != 'completado':
+        sys.exit(2)
+    return True
+
+
+def print_summary(results: dict, total_phases: int, cache=None) -> None:
+    print(f"\n📊 Resumen del Análisis:")
+    print(f"   • Pregunta original: {results.get('user_question')}")
+    print(f"   • Fases completadas: {len(results.get('phases', {}))}/{total_phases}")
+    print(f"   • Session ID: {results.get('session_id')}")
+    totals = results.get('metrics', {}).get('totals', {})
+    if totals:
+        print(f"   • Tiempo de sesión: {totals.get('session_wall_s', 0):.2f}s "
+              f"({totals.get('wall_s', 0):.2f}s en llamadas al LLM, {totals.get('queue_wait_s', 0):.2f}s en cola)")
+    if cache:
+        stats = cache.stats()
+        print(f"   • Caché LLM: {stats['hits']} aciertos, {stats['misses']} fallos")
+
+
+def prepare_recompute(engine: "PAEPEngine", args: argparse.Namespace):
+    """--recompute-from: base session, current template, optional edited phase outputs."""
+    base = engine.load_base_session(args.recompute_from)
+    if not base:
+        sys.exit(1)
+    template = engine.load_template(args.template)
+    if not template:
+        sys.exit(1)
+    phase_ids = {phase['id'] for phase in template.get('phases', [])}
+    for spec in args.edit_phase:
+        phase_id, _, path = spec.partition("=")
+        if not path or phase_id not in phase_ids:
+            print(f"❌ --edit-phase inválido: '{spec}' (formato ID=ARCHIVO, fases: {', '.join(sorted(phase_ids))})")
+            sys.exit(1)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                engine.edit_phase_output(phase_id, f.read().strip())
+        except OSError as e:
+            print(f"❌ No se pudo leer {path}: {e}")
+            sys.exit(1)
+    return args.question or base['question'], template
+
+
+def prompt_question_and_template(engine: "PAEPEngine", args: argparse.Namespace):
+    """Return the question (asking interactively if needed) and the loaded template."""
+    # Get question from user if not provided
+    question = args.question
+    if not question:
+        try:
+            question = input("🤔 Ingresa tu pregunta para análisis PAEP-R: ").strip()
+            if not question:
+                print("❌ No se proporcionó ninguna pregunta.")
+                sys.exit(1)
+        except KeyboardInterrupt:
+            print("\n⏹️  Operación cancelada por el usuario")
+            sys.exit(0)
+
+    template = engine.load_template(args.template)
+    if not template:
+        sys.exit(1)
+
+    return question, template
+
+
+def run_single_analysis(llm: "LLMClient", args: argparse.Namespace, cache, index) -> None:
+    """One analysis: new, resumed (--resume) or recomputed (--recompute-from)."""
+    from paep.engine import PAEPEngine
+
+    engine = PAEPEngine(llm, auto_approve=args.auto_approve, verbose=args.verbose_llm, max_workers=args.phase_workers,
+                        stream=args.stream, conversation_mode=args.conversation_mode,
+                        metrics_exporter=build_metrics_exporter(args), sinks=build_result_sinks(args, index),
+                        speculative=not args.no_speculation, output_history=build_output_history(args),
+                        max_continuations=args.max_continuations, latency_history=build_latency_history(args),
+                        hedging=hedging_overrides(args), spill_dir=spill_dir_for(args, many_sessions=False),
+                        spill_threshold=args.spill_threshold, fan_out=not args.no_fan_out,
+                        timeouts=timeout_overrides(args))
+
+    if args.resume:
+        session = engine.resume_session(args.resume)
+        if not session:
+            sys.exit(1)
+        question = session['question']
+        template = session['template']
+    elif args.recompute_from:
+        question, template = prepare_recompute(engine, args)
+    else:
+        question, template = prompt_question_and_template(engine, args)
+        if offer_indexed_session(args, index, question, template):
+            return
+
+    try:
+        results = engine.run_analysis(question, template)
+
+        if not args.save_only:
+            print_summary(results, len(template.get('phases', [])), cache)
+    except KeyboardInterrupt:
+        print("\n⏹️  Análisis interrumpido por usuario")
+    except Exception as e:
+        print(f"❌ Error inesperado: {e}")
+        sys.exit(1)
 
 
 def main():
+    # Index subcommands never load the engine or an LLM client
+    if len(sys.argv) > 1 and sys.argv[1] in INDEX_COMMANDS:
+        run_index_command(sys.argv[1:])
+        return
+
     parser = argparse.ArgumentParser(description="PAEP-R Engine - Análisis Epistemológico Profundo")
     
     # Get script directory to resolve template path
@@ -39,6 +543,272 @@ def main():
         action="store_true",
         help="Aprobar automáticamente la reformulación de la pregunta sin validación del usuario"
     )
+    parser.add_argument(
+        "--phase-workers",
+        type=int,
+        default=4,
+        help="Máximo de fases independientes ejecutadas en paralelo (según depends_on del template)"
+    )
+    parser.add_argument(
+        "--templates",
+        help="Templates a comparar separados por comas (implica --auto-approve); las fases idénticas se ejecutan una sola vez"
+    )
+    parser.add_argument(
+        "--questions-file",
+        help="Archivo JSONL/CSV con preguntas para análisis por lotes (implica --auto-approve)"
+    )
+    parser.add_argument(
+        "--batch-workers",
+        type=int,
+        default=4,
+        help="Número máximo de análisis simultáneos en modo lote"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.getenv("PAEP_CACHE_DIR"),
+        help="Directorio de la caché persistente de respuestas del LLM (por defecto ~/.cache/paep)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="No leer ni escribir la caché de respuestas del LLM"
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=None,
+        help="Segundos tras los cuales una respuesta en caché se considera caducada"
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=4,
+        help="Reintentos ante errores transitorios del LLM (429, 5xx, timeouts) con backoff exponencial"
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=None,
+        help="Límite de peticiones por minuto compartido por todos los análisis del proceso"
+    )
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        default=None,
+        help="Límite de tokens por minuto compartido por todos los análisis del proceso"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Recibir la respuesta del LLM en streaming y mostrarla a medida que llega"
+    )
+    parser.add_argument(
+        "--conversation-mode",
+        action="store_true",
+        help="Enviar las fases como una conversación multi-turno estable para aprovechar la caché de prefijos del proveedor"
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="SESSION_ID",
+        help="Reanudar una sesión interrumpida desde su journal, ejecutando solo las fases pendientes"
+    )
+    parser.add_argument(
+        "--recompute-from",
+        metavar="SESSION_ID",
+        help="Nueva sesión que reutiliza las fases sin cambios de una sesión previa y recalcula solo las afectadas"
+    )
+    parser.add_argument(
+        "--edit-phase",
+        action="append",
+        default=[],
+        metavar="ID=ARCHIVO",
+        help="Con --recompute-from: reemplazar la salida de una fase por el contenido de un archivo (repetible)"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["groq", "openai", "fake"],
+        default="groq",
+        help="Backend del LLM: Groq, endpoint HTTP compatible con OpenAI, o fake determinista sin red"
+    )
+    parser.add_argument(
+        "--base-url",
+        default=os.getenv("PAEP_BASE_URL", "http://localhost:8000/v1"),
+        help="URL base del endpoint compatible con OpenAI (--backend openai)"
+    )
+    parser.add_argument(
+        "--fake-latency",
+        type=float,
+        default=0.5,
+        help="Segundos hasta el primer token del backend fake"
+    )
+    parser.add_argument(
+        "--fake-output-tokens",
+        type=int,
+        default=300,
+        help="Tokens generados por respuesta del backend fake"
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record",
+        metavar="CASSETTE",
+        help="Grabar las respuestas reales del backend en un cassette JSON"
+    )
+    cassette.add_argument(
+        "--replay",
+        metavar="CASSETTE",
+        help="Reproducir respuestas desde un cassette JSON, sin red"
+    )
+    parser.add_argument(
+        "--no-speculation",
+        action="store_true",
+        help="No adelantar las fases siguientes mientras se valida la reformulación de la Fase A"
+    )
+    parser.add_argument(
+        "--output-format",
+        default="markdown",
+        help="Formatos de salida separados por comas: markdown, jsonl, sqlite (cada fase se guarda al completarse)"
+    )
+    parser.add_argument(
+        "--index-db",
+        metavar="FILE",
+        help="Índice local de sesiones para search/show/import (por defecto ~/.cache/paep/sesiones.sqlite3)"
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="No añadir las sesiones al índice local ni buscar análisis previos de la misma pregunta"
+    )
+    parser.add_argument(
+        "--sqlite-db",
+        metavar="FILE",
+        help="Base de datos SQLite para --output-format sqlite (por defecto paep_resultados.sqlite3)"
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        metavar="FILE",
+        help="Añadir métricas por fase y por sesión como eventos JSONL a este archivo"
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        metavar="FILE",
+        help="Escribir métricas en formato de texto Prometheus (textfile collector) en este archivo"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Iniciar el servicio PAEP local (cola de trabajos por HTTP); --template admite varios separados por comas"
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Dirección del servicio (--serve)"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Puerto del servicio (--serve, 0 = cualquiera libre)"
+    )
+    parser.add_argument(
+        "--service-workers",
+        type=int,
+        default=2,
+        help="Análisis simultáneos en el servicio (--serve)"
+    )
+    parser.add_argument(
+        "--service-queue",
+        type=int,
+        default=16,
+        help="Trabajos en cola antes de rechazar nuevos (--serve)"
+    )
+    parser.add_argument(
+        "--no-service",
+        action="store_true",
+        help="No enviar el análisis a un servicio PAEP en ejecución aunque exista"
+    )
+    parser.add_argument(
+        "--no-adaptive-max-tokens",
+        action="store_true",
+        help="Usar siempre el max_tokens del template en lugar del calculado con el historial de cada fase"
+    )
+    parser.add_argument(
+        "--max-continuations",
+        type=int,
+        default=2,
+        help="Continuaciones automáticas de una respuesta truncada por max_tokens (0 = ninguna)"
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Duplicar la petición de una fase que supere su latencia p95 y quedarse con la primera respuesta"
+    )
+    parser.add_argument(
+        "--hedge-model",
+        help="Modelo de la petición duplicada (por defecto, el mismo de la fase)"
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=20,
+        help="Conexiones HTTP simultáneas (y en keep-alive) del cliente compartido"
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=10.0,
+        help="Segundos máximos para abrir una conexión con el proveedor"
+    )
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=600.0,
+        help="Segundos máximos de espera por datos de una respuesta"
+    )
+    parser.add_argument(
+        "--no-http2",
+        action="store_true",
+        help="Usar HTTP/1.1 aunque el paquete h2 esté instalado"
+    )
+    parser.add_argument(
+        "--no-warm-up",
+        action="store_true",
+        help="No abrir la conexión con el proveedor antes de la primera petición"
+    )
+    parser.add_argument(
+        "--spill-dir",
+        help="Directorio donde volcar los textos grandes de cada fase (por defecto paep_spill/ en lote y servicio)"
+    )
+    parser.add_argument(
+        "--spill-threshold",
+        type=int,
+        default=4096,
+        help="Caracteres a partir de los cuales la salida de una fase se vuelca a disco"
+    )
+    parser.add_argument(
+        "--no-spill",
+        action="store_true",
+        help="Mantener en memoria todos los textos de las fases, también en lote y servicio"
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        help="Segundos máximos por análisis; al agotarse se cancelan las fases en curso"
+    )
+    parser.add_argument(
+        "--phase-timeout",
+        type=float,
+        help="Segundos máximos por fase (sustituye 'phase_s' del template)"
+    )
+    parser.add_argument(
+        "--on-timeout",
+        choices=["continue", "fail_fast"],
+        help="Al agotarse el plazo de una fase: continuar sin ella o detener el análisis"
+    )
+    parser.add_argument(
+        "--no-fan-out",
+        action="store_true",
+        help="Ejecutar como una sola petición las fases con 'fan_out' en el template"
+    )
     parser.add_argument(
         "--verbose-llm",
         action="store_true",
@@ -46,46 +816,52 @@ def main():
     )
 
     args = parser.parse_args()
+    if args.edit_phase and not args.recompute_from:
+        parser.error("--edit-phase requiere --recompute-from")
 
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        print("❌ GROQ_API_KEY environment variable not set!")
-        print("💡 Set it with: export GROQ_API_KEY='your-api-key-here'")
-        sys.exit(1)
+    # Non-interactive single analyses go to a running service, skipping the cold start
+    if args.auto_approve and args.question and not service_ignored_flags(parser, args):
+        from paep.service_client import discover_service
+        client = discover_service()
+        if client and submit_to_service(client, args):
+            return
 
-    llm = LLMClient(api_key=api_key, verbose=args.verbose_llm)
-    engine = PAEPEngine(llm, auto_approve=args.auto_approve, verbose=args.verbose_llm)
+    backend = build_backend(args)
 
-    # Get question from user if not provided
-    question = args.question
-    if not question:
-        try:
-            question = input("🤔 Ingresa tu pregunta para análisis PAEP-R: ").strip()
-            if not question:
-                print("❌ No se proporcionó ninguna pregunta.")
-                sys.exit(1)
-        except KeyboardInterrupt:
-            print("\n⏹️  Operación cancelada por el usuario")
-            sys.exit(0)
+    from paep.llm_client import LLMClient
 
-    template = engine.load_template(args.template)
-    if not template:
-        sys.exit(1)
+    cache = None
+    if not args.no_cache:
+        from paep.cache import ResponseCache, DEFAULT_CACHE_DIR
+        cache = ResponseCache(args.cache_dir or DEFAULT_CACHE_DIR, ttl_seconds=args.cache_ttl)
 
-    try:
-        results = engine.run_analysis(question, template)
+    from paep.ratelimit import RetryPolicy, RateLimiter
+    rate_limiter = RateLimiter(args.rpm, args.tpm) if (args.rpm or args.tpm) else None
+    llm = LLMClient(verbose=args.verbose_llm, cache=cache, backend=backend,
+                    retry_policy=RetryPolicy(max_retries=args.max_retries), rate_limiter=rate_limiter)
 
-        if not args.save_only:
-            total_phases = len(template.get('phases', []))
-            print(f"\n📊 Resumen del Análisis:")
-            print(f"   • Pregunta original: {results.get('user_question')}")
-            print(f"   • Fases completadas: {len(results.get('phases', {}))}/{total_phases}")
-            print(f"   • Session ID: {results.get('session_id')}")
-    except KeyboardInterrupt:
-        print("\n⏹️  Análisis interrumpido por usuario")
-    except Exception as e:
-        print(f"❌ Error inesperado: {e}")
-        sys.exit(1)
+    # Open the provider connection while the user types the question (or the service starts)
+    if not args.no_warm_up:
+        llm.start_warm_up()
+
+    if args.serve:
+        run_service(llm, args)
+        return
+
+    if args.questions_file:
+        run_questions_file(llm, args)
+        return
+
+    if args.templates:
+        run_template_comparison(llm, args)
+        return
+
+    index = open_session_index(args)
+    try:
+        run_single_analysis(llm, args, cache, index)
+    finally:
+        if index:
+            index.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Startup-time benchmark for paep_engine.py based on ``python -X importtime``.
+
+Runs the CLI paths that must stay fast (``--help``, the missing API key error)
+several times, measures wall time and the import time added on top of a bare
+interpreter, and fails if a budget is exceeded or a heavy module (the LLM SDK
+and its dependencies) is imported on those paths.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+
+# Import time (ms) paep_engine.py may add over a bare interpreter on the fast paths
+STARTUP_BUDGET_MS = 60.0
+FORBIDDEN_MODULES = ("groq", "httpx", "pydantic")
+
+SCRIPT_DIR = Path(__file__).parent
+SCENARIOS = {
+    "help": {"args": [str(SCRIPT_DIR / "paep_engine.py"), "--help"], "env": {}},
+    "sin_api_key": {"args": [str(SCRIPT_DIR / "paep_engine.py"), "--question", "x", "--no-service"],
+                    "env": {"GROQ_API_KEY": None}},
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """``(module, self_us, cumulative_us)`` for every line of ``-X importtime`` output."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nesting depth is encoded as extra leading spaces in the module name
+        entries.append((name, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def top_level(entries: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Cumulative import time of modules imported directly by the script (not as dependencies)."""
+    return {name.strip(): cumulative for name, _, cumulative in entries if not name[1:].startswith(" ")}
+
+
+def run_once(args: List[str], env_overrides: Dict[str, Any]) -> Dict[str, Any]:
+    env = dict(os.environ)
+    for key, value in env_overrides.items():
+        if value is None:
+            env.pop(key, None)
+        else:
+            env[key] = value
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], env=env, cwd=SCRIPT_DIR,
+                          capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    entries = parse_importtime(proc.stderr)
+    return {"wall_ms": wall_ms, "modules": {name.strip() for name, _, _ in entries}, "top_level": top_level(entries),
+            "returncode": proc.returncode}
+
+
+def measure(args: List[str], env: Dict[str, Any], runs: int, baseline: Dict[str, int]) -> Dict[str, Any]:
+    samples = [run_once(args, env) for _ in range(runs)]
+    import_ms = [sum(us for name, us in sample["top_level"].items() if name not in baseline) / 1000.0
+                 for sample in samples]
+    heaviest = sorted(((name, us) for name, us in samples[-1]["top_level"].items() if name not in baseline),
+                      key=lambda item: item[1], reverse=True)[:8]
+    imported = set().union(*(sample["modules"] for sample in samples))
+    return {
+        "wall_ms": round(statistics.median(s["wall_ms"] for s in samples), 1),
+        "import_ms": round(statistics.median(import_ms), 1),
+        "heaviest_imports_ms": {name: round(us / 1000.0, 1) for name, us in heaviest},
+        "forbidden_imported": sorted(m for m in FORBIDDEN_MODULES if m in imported),
+        "returncode": samples[-1]["returncode"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de arranque de paep_engine.py")
+    parser.add_argument("--runs", type=int, default=5, help="Ejecuciones por escenario (se reporta la mediana)")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Tiempo de importación máximo sobre el intérprete vacío, en ms")
+    parser.add_argument("--output", "-o", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    # Modules a bare interpreter already imports (site, encodings...) are not charged to the CLI
+    baseline_run = run_once(["-c", "pass"], {})
+    baseline = baseline_run["top_level"]
+
+    report = {"python": sys.version.split()[0], "budget_ms": args.budget_ms,
+              "interpreter_wall_ms": round(baseline_run["wall_ms"], 1), "scenarios": {}}
+    failed = False
+    for name, scenario in SCENARIOS.items():
+        result = measure(scenario["args"], scenario["env"], max(1, args.runs), baseline)
+        over_budget = result["import_ms"] > args.budget_ms
+        failed = failed or over_budget or bool(result["forbidden_imported"])
+        icon = "❌" if over_budget or result["forbidden_imported"] else "✅"
+        print(f"{icon} {name}: {result['import_ms']} ms de importación, {result['wall_ms']} ms en total", file=sys.stderr)
+        if result["forbidden_imported"]:
+            print(f"   módulos pesados importados: {', '.join(result['forbidden_imported'])}", file=sys.stderr)
+        report["scenarios"][name] = result
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
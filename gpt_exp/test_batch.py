@@ -0,0 +1,94 @@
+"""Batch mode: questions files, and one record per question whether it succeeds or fails."""
+import json
+
+import pytest
+
+from paep.backends import FakeBackend
+from paep.batch import BatchError, load_questions, run_batch
+from paep.engine import PAEPEngine
+from paep.llm_client import LLMClient
+
+TEMPLATE = {
+    'template_name': "t", 'system_prompt': "s", 'model_config': {'model': "m", 'max_tokens': 256},
+    'phases': [
+        {'id': 'A', 'name': "Reformulación", 'task': "Reformula"},
+        {'id': '0', 'name': "Corrientes", 'task': "Corrientes", 'depends_on': ['A']},
+    ],
+}
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_jsonl_objects_and_plain_strings(tmp_path):
+    path = write(tmp_path, "preguntas.jsonl",
+                 '{"id": "q1", "question": " ¿Qué es la libertad? "}\n'
+                 '\n'
+                 '"¿Qué es la memoria?"\n'
+                 '{"question": ""}\n'
+                 '{"question": "¿Qué es el tiempo?"}\n')
+    # Ids default to the position in the file; blank questions are skipped
+    assert load_questions(path) == [{'id': "q1", 'question': "¿Qué es la libertad?"},
+                                    {'id': "2", 'question': "¿Qué es la memoria?"},
+                                    {'id': "4", 'question': "¿Qué es el tiempo?"}]
+
+
+def test_invalid_jsonl_names_the_line(tmp_path):
+    with pytest.raises(BatchError, match="línea 2"):
+        load_questions(write(tmp_path, "a.jsonl", '"¿Qué es la libertad?"\n¿Qué es la memoria?\n'))
+    with pytest.raises(BatchError, match="línea 1 no contiene un campo 'question'"):
+        load_questions(write(tmp_path, "b.jsonl", '{"pregunta": "¿Qué es la libertad?"}\n'))
+    with pytest.raises(BatchError, match="No se pudo leer"):
+        load_questions(str(tmp_path / "nada.jsonl"))
+
+
+def test_csv_with_and_without_header(tmp_path):
+    path = write(tmp_path, "a.csv", 'id,question\nq1,"¿Qué es la libertad, y para quién?"\nq2,\n,¿Qué es el tiempo?\n')
+    assert load_questions(path) == [{'id': "q1", 'question': "¿Qué es la libertad, y para quién?"},
+                                    {'id': "3", 'question': "¿Qué es el tiempo?"}]
+    path = write(tmp_path, "b.CSV", '¿Qué es la libertad?,extra\n¿Qué es la memoria?\n')
+    assert [item['question'] for item in load_questions(path)] == ["¿Qué es la libertad?", "¿Qué es la memoria?"]
+
+
+class FailingBackend(FakeBackend):
+    """Fake backend that fails every request whose prompt contains ``fail``."""
+
+    def __init__(self, fail):
+        super().__init__(latency=0.0, output_tokens=20)
+        self.fail = fail
+
+    def complete(self, request_params, timeout=None):
+        if self.fail in request_params["messages"][-1]["content"]:
+            raise ValueError("fallo")
+        return super().complete(request_params, timeout)
+
+
+def test_a_failed_question_does_not_stop_the_batch(tmp_path):
+    questions = [{'id': "q1", 'question': "¿Qué es la libertad?"}, {'id': "q2", 'question': "¿Qué es el ERROR?"},
+                 {'id': "q3", 'question': "¿Qué es el tiempo?"}]
+    summary = run_batch(LLMClient(backend=FailingBackend("ERROR")), TEMPLATE, questions, workers=2,
+                        output_dir=str(tmp_path), sinks=[])
+    assert (summary['total_questions'], summary['succeeded'], summary['failed']) == (3, 2, 1)
+    with open(summary['results_file'], encoding='utf-8') as f:
+        records = {record['id']: record for record in map(json.loads, f)}
+    assert [records[q]['status'] for q in ("q1", "q2", "q3")] == ['ok', 'failed', 'ok']
+    assert records['q1']['phases_completed'] == records['q3']['phases_completed'] == 2
+    assert records['q2']['phases_completed'] < 2
+    with open(summary['summary_file'], encoding='utf-8') as f:
+        assert json.load(f)['failed'] == 1
+
+
+def test_an_exception_is_recorded_on_its_question(tmp_path, monkeypatch):
+    def run_analysis(engine, question, template):
+        raise RuntimeError("sin conexión")
+
+    monkeypatch.setattr(PAEPEngine, "run_analysis", run_analysis)
+    summary = run_batch(LLMClient(backend=FakeBackend(latency=0.0)), TEMPLATE,
+                        [{'id': "q1", 'question': "¿Qué es la libertad?"}], output_dir=str(tmp_path), sinks=[])
+    with open(summary['results_file'], encoding='utf-8') as f:
+        record = json.loads(f.readline())
+    assert (record['status'], record['error'], record['phases_completed']) == ('failed', "sin conexión", 0)
+    assert summary['failed'] == 1
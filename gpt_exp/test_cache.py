@@ -0,0 +1,73 @@
+"""Response cache keys, LRU eviction by size and TTL."""
+import pytest
+
+from paep import cache as cache_module
+from paep.cache import ResponseCache, make_cache_key
+
+PARAMS = {"messages": [{"role": "user", "content": "¿Qué es la libertad?"}], "model": "m", "temperature": 0.8,
+          "max_tokens": 4096, "top_p": 0.9}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def test_key_covers_every_field_that_shapes_the_completion():
+    key = make_cache_key(PARAMS)
+    assert make_cache_key(dict(PARAMS)) == key
+    for field, value in [("model", "otro"), ("temperature", 0.2), ("top_p", 1.0), ("max_tokens", 512),
+                         ("messages", [{"role": "user", "content": "Otra"}])]:
+        assert make_cache_key(dict(PARAMS, **{field: value})) != key
+
+
+def test_key_ignores_transport_fields():
+    assert make_cache_key(dict(PARAMS, stream=True)) == make_cache_key(PARAMS)
+
+
+def test_get_put_and_stats(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get("k") is None
+    cache.put("k", "respuesta")
+    assert cache.get("k") == "respuesta"
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_eviction_drops_least_recently_used_first(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path), max_bytes=250)
+    for key in ("a", "b", "c"):
+        cache.put(key, "x" * 100)
+    # Two entries fit; "a" was the oldest, so it went when "c" arrived
+    assert cache.get("a") is None
+    cache.get("b")
+    cache.put("d", "x" * 100)
+    assert cache.get("c") is None
+    assert cache.get("b") is not None and cache.get("d") is not None
+    assert cache.stats()['evictions'] == 2
+    assert cache.stats()['bytes'] <= 250
+
+
+def test_ttl_expires_entries(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path), ttl_seconds=10)
+    cache.put("k", "respuesta")
+    assert cache.get("k") == "respuesta"
+    clock.now += 60
+    assert cache.get("k") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_entries_persist_across_instances(tmp_path):
+    ResponseCache(str(tmp_path)).put("k", "respuesta")
+    assert ResponseCache(str(tmp_path)).get("k") == "respuesta"
@@ -0,0 +1,54 @@
+"""Prompts stored by reference, their materialization and spilling of large fields."""
+import os
+
+from paep.compact import expanded_results, materialize_prompt, phase_field, prompt_reference, spill_phase
+
+OUTPUTS = {'A': "¿Qué es la libertad?", '0': "Corrientes internas del concepto.", '1': "Deconstrucción."}
+
+
+def prompt_for(*phase_ids):
+    return "Contexto:\n" + "\n\n".join(f"=== FASE {pid} ===\n{OUTPUTS[pid]}" for pid in phase_ids) + "\n\nTarea final"
+
+
+def test_prompt_reference_round_trip():
+    prompt = prompt_for('A', '0', '1')
+    ref = prompt_reference(prompt, OUTPUTS)
+    assert [item['output'] for item in ref if isinstance(item, dict)] == ['A', '0', '1']
+    phases = dict({pid: {'output': text} for pid, text in OUTPUTS.items()}, **{'2': {'prompt_ref': ref}})
+    assert materialize_prompt(phases, '2') == prompt
+
+
+def test_prompt_without_outputs_is_one_literal():
+    assert prompt_reference("Sin contexto", OUTPUTS) == ["Sin contexto"]
+    assert prompt_reference("", OUTPUTS) == []
+
+
+def test_overlapping_outputs_prefer_the_longest_match():
+    outputs = {'x': "libertad", 'y': "libertad y memoria"}
+    prompt = "Sobre libertad y memoria."
+    ref = prompt_reference(prompt, outputs)
+    assert ref == ["Sobre ", {'output': 'y'}, "."]
+
+
+def test_results_written_before_references_keep_their_prompt():
+    assert materialize_prompt({'1': {'full_prompt_sent': "antiguo"}}, '1') == "antiguo"
+
+
+def test_spill_and_read_back(tmp_path):
+    big = "x" * 5000
+    results = {'session_id': "s1", 'phases': {
+        'A': {'output': OUTPUTS['A']},
+        '1': {'output': big, 'raw_llm_response': "<fase>" + big + "</fase>", 'prompt_ref': [{'output': 'A'}]},
+    }}
+    spilled = spill_phase(results, '1', str(tmp_path), threshold=4096)
+    assert spilled == len(big) * 2 + len("<fase></fase>")
+    entry = results['phases']['1']
+    assert os.path.dirname(entry['output']['spilled']) == str(tmp_path / "s1")
+    assert phase_field(entry, 'output') == big
+    assert spill_phase(results, 'A', str(tmp_path), threshold=4096) == 0
+
+    expanded = expanded_results(results)['phases']['1']
+    assert expanded['output'] == big
+    assert expanded['raw_llm_response'] == "<fase>" + big + "</fase>"
+    assert expanded['full_prompt_sent'] == OUTPUTS['A']
+    assert 'prompt_ref' not in expanded
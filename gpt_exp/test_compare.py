@@ -0,0 +1,71 @@
+"""PhaseMemo and template comparison runs sharing identical phases."""
+import json
+import os
+import threading
+
+from paep.backends import FakeBackend
+from paep.compare import PhaseMemo, _Slot, run_comparison
+from paep.engine import PAEPEngine
+from paep.llm_client import LLMClient
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_first_claim_owns_the_phase_and_waiters_get_its_result():
+    memo = PhaseMemo()
+    assert memo.claim("k", "t1") == (True, None, "t1")
+    claims = []
+    waiter = threading.Thread(target=lambda: claims.append(memo.claim("k", "t2")))
+    waiter.start()
+    waiter.join(0.05)
+    assert waiter.is_alive()
+    memo.publish("k", {'processed_output': "A"})
+    waiter.join(1)
+    assert claims == [(False, {'processed_output': "A"}, "t1")]
+    assert memo.claim("otra", "t2") == (True, None, "t2")
+
+
+def test_a_failed_owner_publishes_none():
+    memo = PhaseMemo()
+    memo.claim("k", "t1")
+    memo.publish("k", None)
+    assert memo.claim("k", "t2") == (False, None, "t1")
+
+
+def load(name):
+    with open(os.path.join(HERE, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_shipped_templates_share_their_leading_phases(tmp_path):
+    templates = {name: load(f"{name}.json") for name in ("paep_template", "paep_template_test")}
+    llm = LLMClient(backend=FakeBackend(latency=0.0, output_tokens=20))
+    summary = run_comparison(llm, templates, "¿Qué es la libertad?", output_dir=str(tmp_path), sinks=[])
+    shared = sorted(pid for item in summary['templates'].values() for pid in item['shared_phases'])
+    assert shared == ['0', 'A']
+    assert summary['tokens_saved'] > 0
+    assert all(os.path.exists(path) for path in summary['report_files'])
+
+
+def test_waiter_gives_up_on_an_owner_that_never_publishes():
+    memo = PhaseMemo(wait_s=0.05)
+    memo.claim("k", "t1")
+    assert memo.claim("k", "t2") == (False, None, "t1")
+    assert memo.claim("k", "t2", timeout=0.0) == (False, None, "t1")
+
+
+class AbandonedMemo(PhaseMemo):
+    """Every phase is already claimed by a template that died before publishing it."""
+
+    def claim(self, key, owner, timeout=None):
+        with self._lock:
+            self._slots.setdefault(key, _Slot("muerto"))
+        return super().claim(key, owner, timeout)
+
+
+def test_engine_runs_a_phase_itself_when_the_owner_never_publishes(tmp_path):
+    engine = PAEPEngine(LLMClient(backend=FakeBackend(latency=0.0, output_tokens=20)), auto_approve=True,
+                        output_dir=str(tmp_path), sinks=[], phase_memo=AbandonedMemo(wait_s=0.05))
+    results = engine.run_analysis("¿Qué es la libertad?", load("paep_template_test.json"))
+    assert list(results['phases']) == ['A', '0']
+    assert not any(phase['metrics'].get('shared_from') for phase in results['phases'].values())
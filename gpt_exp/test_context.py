@@ -0,0 +1,45 @@
+"""Phase context compaction to a token budget."""
+from paep.prompting import build_context_string, estimate_tokens
+
+OUTPUTS = {pid: f"Salida de la fase {pid}. " + "palabra " * 100 for pid in ['A', '0', '1', '2', '3']}
+SUMMARIES = {pid: f"Resumen {pid}." for pid in OUTPUTS}
+
+
+def phases_in(context):
+    return [line.split()[2] for line in context.splitlines() if line.startswith("=== FASE")]
+
+
+def test_without_budget_every_earlier_phase_is_kept():
+    context = build_context_string(OUTPUTS, {}, '4')
+    assert phases_in(context) == ['A', '0', '1', '2', '3']
+    assert build_context_string(OUTPUTS, {}, '4', max_tokens=10, strategy="full") == context
+
+
+def test_depends_on_selects_phases_in_order():
+    assert phases_in(build_context_string(OUTPUTS, {}, '4', depends_on=['A', '2'])) == ['A', '2']
+
+
+def test_drop_oldest_fits_the_budget_and_keeps_phase_a():
+    budget = 3 * estimate_tokens(OUTPUTS['0'])
+    context = build_context_string(OUTPUTS, {}, '4', max_tokens=budget, strategy="drop_oldest")
+    assert phases_in(context) == ['A', '2', '3']
+    assert sum(estimate_tokens(OUTPUTS[pid]) for pid in phases_in(context)) <= budget
+
+
+def test_phase_a_survives_a_budget_smaller_than_itself():
+    assert phases_in(build_context_string(OUTPUTS, {}, '4', max_tokens=1)) == ['A']
+
+
+def test_summary_replaces_the_oldest_outputs_first():
+    budget = 3 * estimate_tokens(OUTPUTS['0'])
+    context = build_context_string(OUTPUTS, {}, '4', max_tokens=budget, strategy="summary", summaries=SUMMARIES)
+    assert phases_in(context) == ['A', '0', '1', '2', '3']
+    assert "=== FASE 0 (resumen) ===\nResumen 0." in context
+    assert "=== FASE 3 ===\n" + OUTPUTS['3'] in context
+    assert "Resumen A." not in context
+
+
+def test_summary_without_summaries_drops_like_drop_oldest():
+    budget = 3 * estimate_tokens(OUTPUTS['0'])
+    assert (build_context_string(OUTPUTS, {}, '4', max_tokens=budget, strategy="summary")
+            == build_context_string(OUTPUTS, {}, '4', max_tokens=budget, strategy="drop_oldest"))
@@ -0,0 +1,101 @@
+"""Deadlines, and the on_timeout policy of an analysis with a phase that runs out of time."""
+import time
+
+from paep.backends import FakeBackend
+from paep.deadline import Deadline
+from paep.engine import PAEPEngine
+from paep.llm_client import LLMClient
+
+
+def test_no_limit():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert not deadline.expired()
+
+
+def test_expires_after_its_seconds():
+    deadline = Deadline(0.02, label="la Fase 1")
+    assert 0 < deadline.remaining() <= 0.02
+    time.sleep(0.03)
+    assert deadline.expired() and deadline.remaining() == 0
+    assert deadline.reason() == "plazo de la Fase 1 agotado"
+
+
+def test_child_expires_at_the_earlier_of_both():
+    session = Deadline(10, label="la sesión")
+    assert session.child(0.5).remaining() <= 0.5
+    assert session.child(100).remaining() <= 10
+    assert session.child(None).remaining() <= 10
+
+
+def test_cancelling_the_parent_cancels_its_children():
+    session = Deadline(label="la sesión")
+    phase = session.child(60, label="la Fase 2")
+    session.cancel()
+    assert phase.cancelled() and phase.expired() and phase.remaining() == 0
+    # The outermost deadline that ran out names the reason
+    assert phase.reason() == "la sesión cancelado"
+    assert Deadline(label="x").child(None).reason() == "plazo agotado"
+
+
+class SlowPhaseBackend(FakeBackend):
+    """Fake backend whose requests for a task containing ``slow`` never answer in time."""
+
+    def __init__(self, slow=None):
+        super().__init__(latency=0.0, output_tokens=20)
+        self.slow = slow
+        self.tasks = []
+
+    def complete(self, request_params, timeout=None):
+        self.tasks.append(request_params["messages"][-1]["content"])
+        if self.slow and self.slow in request_params["messages"][-1]["content"]:
+            time.sleep(timeout or 0)
+            raise TimeoutError("Sin respuesta")
+        return super().complete(request_params, timeout)
+
+
+TEMPLATE = {
+    'template_name': "t", 'system_prompt': "s", 'model_config': {'model': "m", 'max_tokens': 256},
+    'phases': [
+        {'id': 'A', 'name': "Reformulación", 'task': "Reformula"},
+        {'id': '0', 'name': "Corrientes", 'task': "Tarea LENTA", 'timeout_s': 0.05},
+        {'id': '1', 'name': "Deconstrucción", 'task': "Deconstruye", 'depends_on': ['A']},
+        {'id': '2', 'name': "Inmersión", 'task': "Profundiza", 'depends_on': ['0']},
+        {'id': '3', 'name': "Tesis", 'task': "Sintetiza", 'depends_on': ['1', '2']},
+    ],
+}
+
+
+def engine(tmp_path, slow="LENTA", **kwargs):
+    return PAEPEngine(LLMClient(backend=SlowPhaseBackend(slow)), auto_approve=True, output_dir=str(tmp_path),
+                      sinks=[], session_id="s1", **kwargs)
+
+
+def test_continue_marks_the_dependents_of_a_timed_out_phase_as_degraded(tmp_path):
+    results = engine(tmp_path).run_analysis("¿Qué es la libertad?", TEMPLATE)
+    assert list(results['timeouts']) == ['0']
+    assert list(results['phases']) == ['A', '1', '2', '3']
+    assert results['phases']['2']['degraded'] == ['0']
+    # Degradation propagates through dependencies that were themselves degraded
+    assert results['phases']['3']['degraded'] == ['0']
+    assert 'degraded' not in results['phases']['1']
+
+
+def test_resume_recomputes_the_timed_out_phase_and_its_degraded_dependents(tmp_path):
+    engine(tmp_path).run_analysis("¿Qué es la libertad?", TEMPLATE)
+    resumed = engine(tmp_path, slow=None)
+    state = resumed.resume_session("s1")
+    results = resumed.run_analysis(state['question'], state['template'])
+    assert 'timeouts' not in results
+    assert list(results['phases']) == ['A', '0', '1', '2', '3']
+    assert not any(data.get('degraded') for data in results['phases'].values())
+    # A and 1 were kept from the first run
+    tasks = resumed.llm.backend.tasks
+    assert len(tasks) == 3
+    assert not any("Reformula" in task or "Deconstruye" in task for task in tasks)
+
+
+def test_fail_fast_stops_the_analysis(tmp_path):
+    results = engine(tmp_path, timeouts={'on_timeout': "fail_fast"}).run_analysis("¿Qué es la libertad?", TEMPLATE)
+    assert '0' in results['timeouts']
+    assert '2' not in results['phases'] and '3' not in results['phases']
@@ -0,0 +1,96 @@
+"""Fan-out item parsing and the engine's map-reduce path."""
+import pytest
+
+from paep.backends import LLMBackend, _chunk
+from paep.engine import PAEPEngine
+from paep.fanout import parse_list_items
+from paep.llm_client import LLMClient
+
+TEMPLATE = {'template_name': "t", 'system_prompt': "s", 'phase_tags': {'2': "inmersion"},
+            'model_config': {'model': "m", 'max_tokens': 1024}}
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15, "cached_prompt_tokens": 0}
+
+
+@pytest.mark.parametrize("text, items", [
+    ("- libertad\n- memoria\n* poder", ["libertad", "memoria", "poder"]),
+    ("1. libertad\n2) **memoria**\n3. libertad", ["libertad", "memoria"]),
+    ("Conceptos:\n- libertad\n- memoria", ["libertad", "memoria"]),
+    ("libertad\n\nmemoria\n", ["libertad", "memoria"]),
+    ("", []),
+    (None, []),
+])
+def test_parse_list_items(text, items):
+    assert parse_list_items(text) == items
+
+
+def test_parse_list_items_keeps_at_most_max_items():
+    assert parse_list_items("- a\n- b\n- c", max_items=2) == ["a", "b"]
+    assert parse_list_items("- a\n- b", max_items=0) == ["a"]
+
+
+class PartsBackend(LLMBackend):
+    """Lists two concepts and answers each part with its item, the reduce call with 'integrado'
+    and a phase that was not split with 'completa'."""
+    name = "parts"
+
+    def __init__(self, fail_item=None):
+        self.prompts = []
+        self.fail_item = fail_item
+
+    def complete(self, request_params, timeout=None):
+        prompt = request_params["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        if prompt.startswith("Enumera los conceptos"):
+            return _chunk("- libertad\n- memoria", None, "stop", USAGE)
+        if "PARTE 1" in prompt:
+            return _chunk("integrado", None, "stop", USAGE)
+        if "únicamente: " not in prompt:
+            return _chunk("completa", None, "stop", USAGE)
+        item = prompt.split("únicamente: ")[1].split("\n")[0]
+        if item == self.fail_item:
+            raise ValueError("parte rota")
+        return _chunk(f"sobre {item}", None, "stop", USAGE)
+
+    def stream(self, request_params, timeout=None):
+        response = self.complete(request_params, timeout)
+        yield _chunk(response["choices"][0]["message"]["content"])
+        yield _chunk(finish_reason="stop", usage=USAGE)
+
+
+def run_phase(backend, fan_out, tmp_path, enabled=True):
+    engine = PAEPEngine(LLMClient(backend=backend), auto_approve=True, output_dir=str(tmp_path), sinks=[],
+                        fan_out=enabled)
+    engine.phase_outputs['A'] = "¿Qué relación hay entre libertad y memoria?"
+    phase = {'id': '2', 'name': "Inmersión", 'task': "Analiza", 'fan_out': fan_out}
+    return engine.execute_phase(phase, "pregunta", TEMPLATE, ['A'])
+
+
+def test_concepts_fan_out_with_reduce(tmp_path):
+    backend = PartsBackend()
+    result = run_phase(backend, {'source': "concepts", 'reduce_task': "Integra"}, tmp_path)
+    assert result['processed_output'] == "integrado"
+    metrics = result['metrics']
+    assert (metrics['fan_out'], metrics['fan_out_items'], metrics['reduce']) == (2, ["libertad", "memoria"], True)
+    # Parts and the reduce call are summed; the concepts call is not part of the phase output
+    assert metrics['total_tokens'] == 3 * USAGE['total_tokens']
+    assert len(backend.prompts) == 4
+    assert "=== PARTE 1: libertad ===\nsobre libertad" in backend.prompts[-1]
+
+
+def test_parts_are_merged_without_reduce_and_a_failed_part_is_skipped(tmp_path):
+    result = run_phase(PartsBackend(fail_item="memoria"), {'items': ["libertad", "memoria", "poder"]}, tmp_path)
+    assert result['processed_output'] == "### libertad\n\nsobre libertad\n\n### poder\n\nsobre poder"
+    assert result['metrics']['fan_out_items'] == ["libertad", "poder"]
+
+
+def test_every_part_failing_fails_the_phase(tmp_path):
+    assert run_phase(PartsBackend(fail_item="libertad"), {'items': ["libertad", "libertad"]}, tmp_path) is None
+
+
+def test_single_item_or_disabled_fan_out_runs_one_request(tmp_path):
+    backend = PartsBackend()
+    result = run_phase(backend, {'items': ["libertad"]}, tmp_path)
+    assert result['processed_output'] == "completa" and len(backend.prompts) == 1
+    assert 'fan_out' not in result['metrics']
+    result = run_phase(PartsBackend(), {'items': ["libertad", "memoria"]}, tmp_path, enabled=False)
+    assert 'fan_out' not in result['metrics']
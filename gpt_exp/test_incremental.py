@@ -0,0 +1,110 @@
+"""Phase input hashes and the phases --recompute-from reuses or recomputes."""
+import copy
+
+from paep.backends import FakeBackend
+from paep.engine import PAEPEngine
+from paep.incremental import output_hash, phase_input_hash
+from paep.llm_client import LLMClient
+
+TEMPLATE = {
+    'template_name': "t", 'system_prompt': "s", 'model_config': {'model': "m", 'max_tokens': 256},
+    'phases': [
+        {'id': 'A', 'name': "Reformulación", 'task': "Reformula"},
+        {'id': '0', 'name': "Corrientes", 'task': "Corrientes", 'depends_on': ['A']},
+        {'id': '1', 'name': "Deconstrucción", 'task': "Deconstruye", 'depends_on': ['A']},
+        {'id': '2', 'name': "Tesis", 'task': "Tesis", 'depends_on': ['0']},
+    ],
+}
+PHASE = TEMPLATE['phases'][1]
+DEPS = {'A': output_hash("Reformulada")}
+
+
+def input_hash(phase=PHASE, template=TEMPLATE, deps=DEPS, **kwargs):
+    return phase_input_hash(phase, template, {}, deps, **kwargs)
+
+
+def test_hash_ignores_what_never_reaches_the_request():
+    assert input_hash() == input_hash(phase=dict(PHASE, name="Otro nombre", depends_on=['A', '1']))
+    assert input_hash() == input_hash(template=dict(TEMPLATE, template_name="otro", description="x"))
+
+
+def test_hash_changes_with_every_input_of_the_request():
+    changed = [
+        input_hash(phase=dict(PHASE, task="Otra tarea")),
+        input_hash(template=dict(TEMPLATE, system_prompt="otro")),
+        input_hash(template=dict(TEMPLATE, model_config={'model': "otro", 'max_tokens': 256})),
+        input_hash(template=dict(TEMPLATE, max_context_tokens=100)),
+        input_hash(template=dict(TEMPLATE, structured_output=True)),
+        input_hash(deps={'A': output_hash("Otra reformulación")}),
+        input_hash(deps={}),
+        input_hash(execution_mode="conversacion"),
+    ]
+    assert input_hash() not in changed
+    assert len(set(changed)) == len(changed)
+
+
+class CountingBackend(FakeBackend):
+    """Fake backend that records the prompts it was asked."""
+
+    def __init__(self):
+        super().__init__(latency=0.0, output_tokens=20)
+        self.prompts = []
+
+    def complete(self, request_params, timeout=None):
+        self.prompts.append(request_params["messages"][-1]["content"])
+        return super().complete(request_params, timeout)
+
+
+def run(tmp_path, template=TEMPLATE, base=None, edits=None, question="¿Qué es la libertad?", session_id="s2"):
+    backend = CountingBackend()
+    engine = PAEPEngine(LLMClient(backend=backend), auto_approve=True, output_dir=str(tmp_path), sinks=[],
+                        session_id=session_id)
+    if base:
+        assert engine.load_base_session(base)
+    for phase_id, text in (edits or {}).items():
+        engine.edit_phase_output(phase_id, text)
+    results = engine.run_analysis(question, template)
+    return results, backend
+
+
+def test_unchanged_session_is_reused_whole(tmp_path):
+    run(tmp_path, session_id="s1")
+    results, backend = run(tmp_path, base="s1")
+    assert backend.prompts == []
+    assert results['incremental'] == {'base_session': "s1", 'reused': ['A', '0', '1', '2'], 'edited': [],
+                                      'recomputed': []}
+
+
+def test_edited_task_recomputes_the_phase_and_its_dependents(tmp_path):
+    base, _ = run(tmp_path, session_id="s1")
+    template = copy.deepcopy(TEMPLATE)
+    template['phases'][1]['task'] = "Corrientes disruptivas"
+    results, backend = run(tmp_path, template=template, base="s1")
+    assert results['incremental']['reused'] == ['A', '1']
+    assert results['incremental']['recomputed'] == ['0', '2']
+    assert len(backend.prompts) == 2
+    assert results['phases']['1']['output'] == base['phases']['1']['output']
+
+
+def test_unchanged_output_stops_the_invalidation(tmp_path):
+    run(tmp_path, session_id="s1")
+    template = copy.deepcopy(TEMPLATE)
+    template['phases'][2]['name'] = "Nuevo nombre"
+    results, backend = run(tmp_path, template=template, base="s1")
+    assert backend.prompts == [] and results['incremental']['recomputed'] == []
+
+
+def test_edited_output_recomputes_everything_downstream(tmp_path):
+    run(tmp_path, session_id="s1")
+    results, backend = run(tmp_path, base="s1", edits={'0': "Corrientes corregidas"})
+    assert results['incremental'] == {'base_session': "s1", 'reused': ['A', '1'], 'edited': ['0'],
+                                      'recomputed': ['2']}
+    assert results['phases']['0']['output'] == "Corrientes corregidas"
+    assert "Corrientes corregidas" in backend.prompts[0]
+
+
+def test_new_question_recomputes_every_phase(tmp_path):
+    run(tmp_path, session_id="s1")
+    results, backend = run(tmp_path, base="s1", question="¿Qué es la memoria?")
+    assert results['incremental']['reused'] == []
+    assert len(backend.prompts) == 4
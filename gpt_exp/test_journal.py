@@ -0,0 +1,106 @@
+"""Session journal checkpoints and --resume of the phases missing from them."""
+import json
+import os
+
+import pytest
+
+from paep.backends import FakeBackend
+from paep.engine import PAEPEngine
+from paep.journal import JOURNAL_VERSION, JournalError, SessionJournal, journal_path
+from paep.llm_client import LLMClient
+
+TEMPLATE = {
+    'template_name': "t", 'system_prompt': "s", 'model_config': {'model': "m", 'max_tokens': 256},
+    'phases': [
+        {'id': 'A', 'name': "Reformulación", 'task': "Reformula"},
+        {'id': '0', 'name': "Corrientes", 'task': "Corrientes"},
+        {'id': '1', 'name': "Tesis", 'task': "Tesis"},
+    ],
+}
+RESULTS = {'session_id': "s1", 'user_question': "¿Qué es la libertad?", 'phases': {'A': {'output': "Reformulada"}}}
+
+
+def test_save_and_load(tmp_path):
+    SessionJournal(str(tmp_path), "s1").save(RESULTS, TEMPLATE, {'A': "Reformulada"}, "¿Qué es la libertad?",
+                                             summaries={'A': "Resumen"})
+    state = SessionJournal.load(str(tmp_path), "s1")
+    assert state['version'] == JOURNAL_VERSION and state['status'] == "en_progreso"
+    assert state['results'] == RESULTS and state['template'] == TEMPLATE
+    assert state['phase_outputs'] == {'A': "Reformulada"}
+    assert state['phase_summaries'] == {'A': "Resumen"}
+    assert not os.path.exists(journal_path(str(tmp_path), "s1") + ".tmp")
+
+
+def test_a_crash_mid_write_keeps_the_previous_checkpoint(tmp_path):
+    journal = SessionJournal(str(tmp_path), "s1")
+    journal.save(RESULTS, TEMPLATE, {'A': "Reformulada"}, "q")
+    torn = dict(RESULTS, phases=dict(RESULTS['phases'], **{'0': {'output': object()}}))
+    with pytest.raises(TypeError):
+        journal.save(torn, TEMPLATE, {}, "q")
+    # The torn write only reached the temporary file
+    assert os.path.exists(journal.path + ".tmp")
+    assert SessionJournal.load(str(tmp_path), "s1")['results'] == RESULTS
+    journal.save(RESULTS, TEMPLATE, {}, "q", status="completado")
+    assert SessionJournal.load(str(tmp_path), "s1")['status'] == "completado"
+
+
+def test_missing_corrupt_or_foreign_journals_are_rejected(tmp_path):
+    with pytest.raises(JournalError):
+        SessionJournal.load(str(tmp_path), "nada")
+    path = journal_path(str(tmp_path), "s1")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"version": 1, "results": {')
+    with pytest.raises(JournalError, match="corrupto"):
+        SessionJournal.load(str(tmp_path), "s1")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': JOURNAL_VERSION + 1}, f)
+    with pytest.raises(JournalError, match="Versión"):
+        SessionJournal.load(str(tmp_path), "s1")
+
+
+class CountingBackend(FakeBackend):
+    """Fake backend that records the tasks it was asked and fails those containing ``fail``."""
+
+    def __init__(self, fail=None):
+        super().__init__(latency=0.0, output_tokens=20)
+        self.fail = fail
+        self.prompts = []
+
+    def complete(self, request_params, timeout=None):
+        prompt = request_params["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        if self.fail and self.fail in prompt:
+            raise ValueError("fallo")
+        return super().complete(request_params, timeout)
+
+
+def engine(tmp_path, backend):
+    return PAEPEngine(LLMClient(backend=backend), auto_approve=True, output_dir=str(tmp_path), sinks=[],
+                      session_id="s1", max_workers=1)
+
+
+def test_every_completed_phase_is_checkpointed(tmp_path):
+    engine(tmp_path, CountingBackend(fail="Tesis")).run_analysis("¿Qué es la libertad?", TEMPLATE)
+    state = SessionJournal.load(str(tmp_path), "s1")
+    assert state['status'] == "incompleto"
+    assert list(state['results']['phases']) == ['A', '0']
+    assert list(state['phase_outputs']) == ['A', '0']
+
+
+def test_resume_runs_only_the_missing_phases(tmp_path):
+    first = engine(tmp_path, CountingBackend(fail="Tesis")).run_analysis("¿Qué es la libertad?", TEMPLATE)
+    backend = CountingBackend()
+    resumed = engine(tmp_path, backend)
+    session = resumed.resume_session("s1")
+    assert session == {'question': "¿Qué es la libertad?", 'template': TEMPLATE}
+    results = resumed.run_analysis(session['question'], session['template'])
+    assert len(backend.prompts) == 1 and "Tesis" in backend.prompts[0]
+    assert list(results['phases']) == ['A', '0', '1']
+    assert results['phases']['A']['output'] == first['phases']['A']['output']
+    # The resumed phase sees the outputs replayed from the journal
+    assert first['phases']['0']['output'] in backend.prompts[0]
+    assert SessionJournal.load(str(tmp_path), "s1")['status'] == "completado"
+
+
+def test_resume_of_an_unknown_session(tmp_path):
+    assert engine(tmp_path, CountingBackend()).resume_session("nada") is None
@@ -0,0 +1,111 @@
+"""LLMClient over scripted backends: early stop at the closing tag, record/replay, caching."""
+import time
+
+from paep.backends import LLMBackend, RecordReplayBackend, _chunk
+from paep.cache import ResponseCache
+from paep.engine import PAEPEngine
+from paep.llm_client import LLMClient
+
+STRUCTURED_RESPONSE = ["<fase_1>", "Tesis ", "central", "</fase_1>", " Ahora la fase 2..."]
+
+
+class ScriptedBackend(LLMBackend):
+    """Streams fixed chunks, then a usage chunk; counts how many chunks were read."""
+    name = "scripted"
+
+    def __init__(self, pieces, usage=None):
+        self.pieces = pieces
+        self.usage = usage or {"prompt_tokens": 50, "completion_tokens": 9, "total_tokens": 59,
+                               "cached_prompt_tokens": 0}
+        self.read = 0
+
+    def complete(self, request_params, timeout=None):
+        return _chunk("".join(self.pieces), None, "stop", self.usage)
+
+    def stream(self, request_params, timeout=None):
+        for piece in self.pieces:
+            self.read += 1
+            yield _chunk(piece)
+        yield _chunk(finish_reason="stop", usage=self.usage)
+
+
+def test_stop_when_closes_the_stream_at_the_closing_tag():
+    backend = ScriptedBackend(STRUCTURED_RESPONSE)
+    result = LLMClient(backend=backend).complete("p", stop_when=PAEPEngine._tag_stop("fase_1"))
+    assert result['finish_reason'] == "stop_tag"
+    assert result['content'] == "<fase_1>Tesis central</fase_1>"
+    assert backend.read == 4
+
+
+def test_record_then_replay_a_structured_phase(tmp_path):
+    cassette = str(tmp_path / "cassette.json")
+    recorder = RecordReplayBackend(cassette, inner=ScriptedBackend(STRUCTURED_RESPONSE), mode="record")
+    recorded = LLMClient(backend=recorder).complete("p", stop_when=PAEPEngine._tag_stop("fase_1"))
+    assert recorded['finish_reason'] == "stop_tag"
+    assert len(RecordReplayBackend(cassette, mode="replay").entries) == 1
+
+    replayed = LLMClient(backend=RecordReplayBackend(cassette, mode="replay")).complete(
+        "p", stop_when=PAEPEngine._tag_stop("fase_1"))
+    assert replayed['content'] == recorded['content']
+    assert replayed['finish_reason'] == "stop_tag"
+
+
+def test_early_stop_estimates_usage_and_marks_it():
+    metrics = LLMClient(backend=ScriptedBackend(STRUCTURED_RESPONSE)).complete(
+        "p", stop_when=PAEPEngine._tag_stop("fase_1"))['metrics']
+    assert metrics['usage_estimated'] is True
+    assert metrics['prompt_tokens'] > 0 and metrics['completion_tokens'] > 0
+    assert metrics['total_tokens'] == metrics['prompt_tokens'] + metrics['completion_tokens']
+    assert metrics['cached_prompt_tokens'] == 0
+
+
+def test_full_stream_keeps_provider_usage():
+    metrics = LLMClient(backend=ScriptedBackend(STRUCTURED_RESPONSE)).complete("p", stream=True)['metrics']
+    assert metrics['prompt_tokens'] == 50
+    assert 'usage_estimated' not in metrics
+
+
+def test_adaptive_max_tokens_keeps_the_cache_key(tmp_path):
+    client = LLMClient(backend=ScriptedBackend(["respuesta"]), cache=ResponseCache(str(tmp_path)))
+    client.complete("p", model_config={"max_tokens": 4096})
+    adapted = client.complete("p", model_config={"max_tokens": 384, "configured_max_tokens": 4096})
+    assert adapted['metrics']['cache_hit'] is True
+
+
+class SlowModelBackend(ScriptedBackend):
+    """Answers with the model name; ``slow_model`` waits before its first chunk."""
+
+    def __init__(self, slow_model):
+        super().__init__([])
+        self.slow_model = slow_model
+
+    def complete(self, request_params, timeout=None):
+        return _chunk(f"respuesta de {request_params['model']}", None, "stop", self.usage)
+
+    def stream(self, request_params, timeout=None):
+        if request_params["model"] == self.slow_model:
+            time.sleep(0.5)
+        yield _chunk(f"respuesta de {request_params['model']}")
+        yield _chunk(finish_reason="stop", usage=self.usage)
+
+
+def test_hedge_winner_is_cached_under_its_own_model(tmp_path):
+    client = LLMClient(backend=SlowModelBackend("lento"), cache=ResponseCache(str(tmp_path)))
+    result = client.complete("p", model_config={"model": "lento"}, hedge={"after_s": 0.05, "model": "rapido"})
+    assert result['metrics']['hedge_won'] is True
+    assert result['content'] == "respuesta de rapido"
+    assert client.complete("p", model_config={"model": "rapido"})['metrics']['cache_hit'] is True
+    primary = client.complete("p", model_config={"model": "lento"})
+    assert primary['metrics']['cache_hit'] is False
+    assert primary['content'] == "respuesta de lento"
+
+
+def test_internal_stream_records_no_user_facing_timings():
+    metrics = LLMClient(backend=ScriptedBackend(STRUCTURED_RESPONSE)).complete(
+        "p", stop_when=PAEPEngine._tag_stop("fase_1"))['metrics']
+    assert metrics['streamed'] is False
+    assert 'ttft_s' not in metrics and 'tokens_per_s' not in metrics
+
+    metrics = LLMClient(backend=ScriptedBackend(STRUCTURED_RESPONSE)).complete(
+        "p", stream=True, stop_when=PAEPEngine._tag_stop("fase_1"))['metrics']
+    assert metrics['ttft_s'] >= 0 and metrics['tokens_per_s'] is not None
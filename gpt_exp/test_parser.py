@@ -0,0 +1,61 @@
+"""TagStreamParser and tag extraction: tags split across chunks, trailing text, missing tags."""
+import pytest
+
+from paep.prompting import TagStreamParser, extract_content_from_tags, extract_tagged_content
+
+RESPONSE = "Preámbulo <tesis_provocativa>La tesis central.</tesis_provocativa> Texto sobrante"
+
+
+def feed_all(parser, chunks):
+    return "".join(parser.feed(chunk) for chunk in chunks)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 16, len(RESPONSE)])
+def test_tags_split_across_chunks(size):
+    parser = TagStreamParser("tesis_provocativa")
+    chunks = [RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size)]
+    assert feed_all(parser, chunks) == "La tesis central."
+    assert parser.closed
+    assert parser.content == "La tesis central."
+
+
+def test_partial_closing_tag_is_held_back():
+    parser = TagStreamParser("fase")
+    first = parser.feed("<fase>abc</fa")
+    assert "<" not in first and "abc".startswith(first)
+    assert not parser.closed
+    assert first + parser.feed("se> resto") == "abc"
+    assert parser.closed
+    assert parser.content == "abc"
+
+
+def test_text_after_the_closing_tag_is_ignored():
+    parser = TagStreamParser("fase")
+    parser.feed("<fase>uno</fase>")
+    assert parser.feed(" <fase>dos</fase>") == ""
+    assert parser.content == "uno"
+
+
+def test_opening_tag_with_attributes():
+    assert extract_tagged_content('<fase id="1">contenido</fase>', "fase") == "contenido"
+
+
+def test_unclosed_tag_gives_partial_content():
+    parser = TagStreamParser("fase")
+    parser.feed("<fase>sin cierre")
+    assert not parser.closed
+    assert parser.content == "sin cierre"
+
+
+def test_missing_tag():
+    parser = TagStreamParser("fase")
+    assert parser.feed("solo texto") == ""
+    assert parser.content is None
+
+
+def test_extract_content_falls_back_to_the_whole_response():
+    tags = {"4": "tesis_provocativa"}
+    assert extract_content_from_tags(RESPONSE, tags, "4", structured=True) == "La tesis central."
+    assert extract_content_from_tags("  sin etiqueta  ", tags, "4", structured=True) == "sin etiqueta"
+    assert extract_content_from_tags(RESPONSE, tags, "4") == RESPONSE
+    assert extract_content_from_tags("   ", tags, "4") is None
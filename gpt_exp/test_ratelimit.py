@@ -0,0 +1,151 @@
+"""Retry classification, backoff and the RPM/TPM token buckets, on a fake clock."""
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+from paep import ratelimit
+from paep.backends import FakeBackend
+from paep.llm_client import LLMClient, LLMError
+from paep.ratelimit import RateLimiter, RetryPolicy, TokenBucket, is_retryable, retry_after_seconds
+
+
+class FakeClock:
+    """Stands in for the ``time`` module: ``sleep`` advances ``monotonic`` instantly."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+class APIError(Exception):
+    def __init__(self, status_code=None, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def test_retryable_errors():
+    for status in (408, 409, 429, 500, 503):
+        assert is_retryable(APIError(status))
+    for status in (400, 401, 404, 422):
+        assert not is_retryable(APIError(status))
+    assert is_retryable(ConnectionResetError()) and is_retryable(TimeoutError())
+    # SDK transport errors are recognized by name
+    assert is_retryable(APIConnectionError())
+    assert not is_retryable(ValueError("respuesta inválida"))
+
+
+def test_retry_after(clock):
+    assert retry_after_seconds(APIError(429, {'retry-after-ms': "1500"})) == 1.5
+    assert retry_after_seconds(APIError(429, {'retry-after': "3"})) == 3.0
+    assert retry_after_seconds(APIError(429, {'retry-after': "-3"})) == 0.0
+    assert retry_after_seconds(APIError(429, {'retry-after': formatdate(clock.now + 20)})) == 20.0
+    assert retry_after_seconds(APIError(429, {'retry-after': "pronto"})) is None
+    assert retry_after_seconds(APIError(429)) is None
+
+
+def test_backoff_doubles_up_to_the_cap():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=0)
+    assert [policy.delay(attempt) for attempt in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_backoff_honors_retry_after_within_the_cap():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=0)
+    assert policy.delay(0, APIError(429, {'retry-after': "3"})) == 3.0
+    assert policy.delay(0, APIError(429, {'retry-after': "30"})) == 5.0
+
+
+def test_jitter_stays_within_its_band():
+    policy = RetryPolicy(base_delay=2.0, jitter=0.5)
+    assert all(1.0 <= policy.delay(0) <= 3.0 for _ in range(100))
+
+
+def test_bucket_waits_for_the_refill(clock):
+    bucket = TokenBucket(capacity=2, refill_per_second=1.0)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert bucket.acquire() == 1.0
+    assert clock.sleeps == [1.0]
+    clock.now += 10
+    # The bucket never holds more than its capacity
+    assert bucket.acquire(2) == 0 and bucket.acquire() == 1.0
+
+
+def test_request_larger_than_the_bucket_waits_for_a_full_bucket(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=1.0)
+    bucket.acquire(10)
+    assert bucket.acquire(50) == 10.0
+
+
+def test_rate_limiter_budgets(clock):
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=600)
+    assert limiter.acquire(300) == 0 and limiter.acquire(300) == 0
+    # Third request in the same minute: one request slot refills in 30 s, by then 300 tokens too
+    assert limiter.acquire(300) == 30.0
+
+
+def test_rate_limiter_charges_the_real_usage(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+    limiter.acquire(100)
+    limiter.record_usage(100, 400)
+    # 200 tokens left, so a 300-token request waits 10 s at 10 tokens/s
+    assert limiter.acquire(300) == 10.0
+    # Overestimates are not refunded
+    limiter.record_usage(300, 50)
+    assert limiter.tokens._tokens == 0
+
+
+class FlakyBackend(FakeBackend):
+    """Fake backend that raises the given errors before answering."""
+
+    def __init__(self, errors):
+        super().__init__(latency=0.0, output_tokens=20)
+        self.errors = list(errors)
+        self.calls = 0
+
+    def complete(self, request_params, timeout=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().complete(request_params, timeout)
+
+
+def client(backend, max_retries=3):
+    return LLMClient(backend=backend, retry_policy=RetryPolicy(max_retries=max_retries, base_delay=0.0, jitter=0))
+
+
+def test_client_retries_transient_errors():
+    backend = FlakyBackend([APIError(429), APIConnectionError("reset")])
+    result = client(backend).complete("Hola", model_config={'model': "m"})
+    assert backend.calls == 3 and result['metrics']['retries'] == 2
+
+
+def test_client_gives_up_on_permanent_errors_and_after_max_retries():
+    backend = FlakyBackend([APIError(400)])
+    with pytest.raises(LLMError):
+        client(backend).complete("Hola", model_config={'model': "m"})
+    assert backend.calls == 1
+    backend = FlakyBackend([APIError(503)] * 3)
+    with pytest.raises(LLMError):
+        client(backend, max_retries=2).complete("Hola", model_config={'model': "m"})
+    assert backend.calls == 3
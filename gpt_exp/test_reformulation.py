@@ -0,0 +1,118 @@
+"""Speculative runs started while the Phase A reformulation is being validated."""
+import io
+import sys
+import threading
+import time
+
+from paep.backends import FakeBackend
+from paep.deadline import Deadline
+from paep.engine import PAEPEngine
+from paep.llm_client import LLMClient
+from paep.speculation import Speculation
+
+PHASES = [{'id': '0'}, {'id': '1'}]
+
+
+def finish(spec):
+    """Wait for the runs left in flight by ``close`` (and their done callbacks)."""
+    spec._executor.shutdown(wait=True)
+
+
+class Runs:
+    """``execute`` callback that works until released or until its deadline is cancelled."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.finished = []
+
+    def __call__(self, phase, phase_outputs, deadline):
+        print(f"Fase {phase['id']}")
+        while not self.release.wait(0.01):
+            if deadline.expired():
+                self.finished.append((phase['id'], deadline.reason()))
+                return None
+        self.finished.append((phase['id'], None))
+        return {'output': f"{phase['id']} sobre {phase_outputs['A']}"}
+
+
+def test_approved_proposal_adopts_the_runs():
+    runs = Runs()
+    stdout = sys.stdout
+    spec = Speculation(runs, 'A', "propuesta", {}, max_workers=2)
+    spec.start(PHASES)
+    runs.release.set()
+    assert spec.resolve("propuesta")
+    result, log = spec.take('0')
+    assert result['output'] == "0 sobre propuesta"
+    assert log == "Fase 0\n"
+    spec.close()
+    finish(spec)
+    assert spec.stats == {'launched': 2, 'used': 1, 'discarded': 1}
+    assert sys.stdout is stdout
+
+
+def test_changed_proposal_cancels_runs_in_flight():
+    runs = Runs()
+    spec = Speculation(runs, 'A', "propuesta", {}, max_workers=2)
+    spec.start(PHASES)
+    assert not spec.resolve("propuesta refinada")
+    assert spec.take('0') is None
+    spec.close()
+    finish(spec)
+    assert sorted(runs.finished) == [('0', "la ejecución especulativa cancelado"),
+                                     ('1', "la ejecución especulativa cancelado")]
+    assert spec.stats['discarded'] == 2
+
+
+def test_close_does_not_wait_for_runs_in_flight():
+    runs = Runs()
+    stdout = sys.stdout
+    # One worker: phase 1 is still queued and never starts
+    spec = Speculation(runs, 'A', "propuesta", {}, max_workers=1, deadline=Deadline())
+    spec.start(PHASES)
+    time.sleep(0.05)
+    started = time.perf_counter()
+    spec.close()
+    assert time.perf_counter() - started < 0.05
+    finish(spec)
+    assert runs.finished == [('0', "la ejecución especulativa cancelado")]
+    assert spec._launched[1].cancelled()
+    assert sys.stdout is stdout
+
+
+def test_cancelling_the_session_cancels_speculation():
+    session = Deadline(label="la sesión")
+    spec = Speculation(Runs(), 'A', "propuesta", {}, deadline=session)
+    session.cancel()
+    assert spec.deadline.expired()
+    assert spec.deadline.reason() == "la sesión cancelado"
+    spec.close()
+
+
+class SlowConsole(io.StringIO):
+    """Console that yields on every write, as a terminal does, so concurrent writers interleave."""
+
+    def write(self, text):
+        time.sleep(0.001)
+        return super().write(text)
+
+
+def test_adopted_logs_are_printed_whole(tmp_path, monkeypatch):
+    console = SlowConsole()
+    monkeypatch.setattr(sys, "stdout", console)
+    monkeypatch.setattr("builtins.input", lambda prompt="": "s")
+    template = {'template_name': "t", 'system_prompt': "s", 'model_config': {'model': "m", 'max_tokens': 256},
+                'phases': [{'id': 'A', 'name': "A", 'task': "Reformula"}] +
+                          [{'id': str(n), 'name': f"Fase {n}", 'task': f"Tarea {n}", 'depends_on': ['A']}
+                           for n in range(4)]}
+    engine = PAEPEngine(LLMClient(backend=FakeBackend(latency=0.02, output_tokens=20)), output_dir=str(tmp_path),
+                        sinks=[], max_workers=4)
+    results = engine.run_analysis("¿Qué es la libertad?", template)
+    assert results['speculation']['used'] == 4
+    lines = console.getvalue().splitlines()
+    adopted = [line for line in lines if "resultado especulativo reutilizado" in line]
+    assert sorted(adopted) == [f"⚡ Fase {n}: resultado especulativo reutilizado" for n in range(4)]
+    # Each adopted log is followed by its own "adopted" line
+    for n in range(4):
+        done = lines.index(f"✅ Fase {n} completada")
+        assert lines[done + 1] == f"⚡ Fase {n}: resultado especulativo reutilizado"
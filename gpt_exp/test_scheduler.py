@@ -0,0 +1,85 @@
+"""Dependency resolution and DAG ordering of PhaseScheduler."""
+import threading
+import time
+
+import pytest
+
+from paep.scheduler import PhaseScheduler, SchedulerError, critical_path_length, resolve_dependencies
+
+# A -> {0, 1} -> 2, with 1 slower than 0
+PHASES = [
+    {'id': 'A'},
+    {'id': '0', 'depends_on': ['A']},
+    {'id': '1', 'depends_on': ['A']},
+    {'id': '2', 'depends_on': ['1', '0']},
+]
+
+
+def test_phases_without_depends_on_depend_on_every_earlier_phase():
+    deps = resolve_dependencies([{'id': 'A'}, {'id': '0'}, {'id': '1'}])
+    assert deps == {'A': [], '0': ['A'], '1': ['A', '0']}
+
+
+def test_declared_dependencies_keep_template_order():
+    assert resolve_dependencies(PHASES)['2'] == ['0', '1']
+    assert critical_path_length(PHASES, resolve_dependencies(PHASES)) == 3
+
+
+@pytest.mark.parametrize("phases", [
+    [{'id': 'A'}, {'id': 'A'}],
+    [{'id': 'A', 'depends_on': ['X']}],
+    [{'id': 'A', 'depends_on': ['A']}],
+    [{'id': 'A', 'depends_on': ['B']}, {'id': 'B', 'depends_on': ['A']}],
+])
+def test_invalid_graphs_are_rejected(phases):
+    with pytest.raises(SchedulerError):
+        resolve_dependencies(phases)
+
+
+def run(scheduler, delays=None, fail=(), completed=None):
+    events, lock = [], threading.Lock()
+
+    def run_phase(phase):
+        with lock:
+            events.append(('start', phase['id']))
+        time.sleep((delays or {}).get(phase['id'], 0.01))
+        with lock:
+            events.append(('end', phase['id']))
+        return phase['id']
+
+    def on_complete(phase, result):
+        return phase['id'] not in fail
+
+    return scheduler.run(run_phase, on_complete, completed), events
+
+
+def test_phases_start_only_after_their_dependencies():
+    done, events = run(PhaseScheduler(PHASES, max_workers=4), delays={'1': 0.1})
+    assert done == {'A', '0', '1', '2'}
+    for phase in PHASES:
+        start = events.index(('start', phase['id']))
+        for dep in phase.get('depends_on', []):
+            assert events.index(('end', dep)) < start
+
+
+def test_independent_phases_run_concurrently():
+    _, events = run(PhaseScheduler(PHASES, max_workers=4), delays={'0': 0.1, '1': 0.1})
+    # Both started before either finished
+    assert events.index(('start', '1')) < events.index(('end', '0'))
+
+
+def test_one_worker_runs_in_template_order():
+    _, events = run(PhaseScheduler(PHASES, max_workers=1))
+    assert [pid for kind, pid in events if kind == 'start'] == ['A', '0', '1', '2']
+
+
+def test_stopping_skips_dependents_and_keeps_completed_phases():
+    done, events = run(PhaseScheduler(PHASES, max_workers=1), fail={'0'})
+    assert done == {'A'}
+    assert ('start', '2') not in events
+
+
+def test_completed_phases_are_not_run_again():
+    done, events = run(PhaseScheduler(PHASES, max_workers=2), completed={'A', '0'})
+    assert done == {'A', '0', '1', '2'}
+    assert [pid for kind, pid in events if kind == 'start'] == ['1', '2']
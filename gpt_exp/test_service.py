@@ -0,0 +1,82 @@
+"""Local service: job submission, progress events and results over HTTP."""
+import contextlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from paep.backends import FakeBackend
+from paep.llm_client import LLMClient
+from paep.service import PAEPService, make_server
+from paep.service_client import ServiceClient, ServiceError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@contextlib.contextmanager
+def running_service(tmp_path):
+    """Service on a free port; started inside the test, after pytest has set up its stdout capture."""
+    with open(os.path.join(HERE, "paep_template_test.json"), encoding='utf-8') as f:
+        templates = {'paep_test_reformulation': json.load(f)}
+    service = PAEPService(LLMClient(backend=FakeBackend(latency=0.0, output_tokens=20)), templates, workers=1,
+                          output_dir=str(tmp_path))
+    server = make_server(service, port=0)
+    service.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield ServiceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+
+
+def test_submit_events_and_result(tmp_path):
+    with running_service(tmp_path) as client:
+        job = client.submit("¿Qué es la libertad?")
+        assert job['status'] == "en_cola" and job['total_phases'] == 2
+        events = list(client.events(job['id']))
+        assert [event['seq'] for event in events] == list(range(len(events)))
+        statuses = [event['status'] for event in events if event['type'] == 'status']
+        assert statuses == ["en_cola", "en_progreso", "completado"]
+        assert any("Fase A completada" in event['text'] for event in events if event['type'] == 'log')
+        # Reconnecting with ``since`` only replays the events not seen yet
+        assert list(client.events(job['id'], since=len(events) - 1)) == events[-1:]
+
+        result = client.result(job['id'])
+        assert result['phases_completed'] == 2
+        assert list(result['results']['phases']) == ['A', '0']
+        assert os.path.dirname(result['output_file']) == str(tmp_path)
+        assert client.health()['queued'] == 0
+
+
+def get_error(client, path):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(client.url + path, timeout=5)
+    return error.value.code, json.loads(error.value.read().decode('utf-8'))['error']
+
+
+def test_invalid_since_is_a_bad_request(tmp_path):
+    with running_service(tmp_path) as client:
+        job = client.submit("¿Qué es la libertad?")
+        for since in ("abc", "-1"):
+            code, message = get_error(client, f"/jobs/{job['id']}/events?since={since}")
+            assert code == 400 and message.startswith("since inválido")
+
+
+def test_rejected_jobs(tmp_path):
+    with running_service(tmp_path) as client:
+        with pytest.raises(ServiceError) as error:
+            client.submit("¿Qué es la libertad?", template_name="otro")
+        assert error.value.status_code == 404
+        with pytest.raises(ServiceError) as error:
+            client.submit("¿Qué es la libertad?", output_dir=str(tmp_path.parent))
+        assert error.value.status_code == 403
+        with pytest.raises(ServiceError) as error:
+            client.submit("¿Qué es la libertad?", template={'phases': [{'id': "../x", 'name': "x", 'task': "x"}]})
+        assert error.value.status_code == 400
+        assert get_error(client, "/jobs/nada")[0] == 404
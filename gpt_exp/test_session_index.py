@@ -0,0 +1,62 @@
+"""Session index: search ranking, exact-question hits and Markdown import."""
+from paep.session_index import SessionIndex, import_markdown, normalize_question, parse_result_markdown
+
+TEMPLATE = {'template_name': "paep_analysis", 'phases': [
+    {'id': 'A'}, {'id': '0', 'depends_on': ['A']}, {'id': '1', 'depends_on': ['A']},
+]}
+
+
+def add(index, session_id, question, outputs, status="completado"):
+    index.add({'session_id': session_id, 'question': question, 'template_name': "paep_analysis",
+               'timestamp': session_id, 'status': status},
+              [{'id': pid, 'name': pid, 'output': text} for pid, text in outputs.items()])
+
+
+def test_best_match_wins_over_many_newer_ones(tmp_path):
+    index = SessionIndex(str(tmp_path / "i.sqlite3"))
+    add(index, "0000", "¿Qué es la libertad?", {'A': "La libertad como problema", '0': "Texto"})
+    for n in range(1, 700):
+        add(index, f"{n:04d}", f"Pregunta {n}", {'A': "Otra cosa", '0': "menciona libertad de pasada"})
+    hits = index.search("libertad", limit=3)
+    assert len(hits) == 3
+    assert hits[0]['session_id'] == "0000"
+    assert "[libertad]" in hits[0]['snippet']
+    assert index.search("inexistente") == []
+
+
+def test_exact_match_ignores_case_accents_and_punctuation(tmp_path):
+    index = SessionIndex(str(tmp_path / "i.sqlite3"))
+    add(index, "1", "¿Qué es la libertad?", {'A': "x"})
+    add(index, "2", "Otra", {'A': "x"}, status="incompleto")
+    assert normalize_question("  QUE es la  LIBERTAD ") == normalize_question("¿Qué es la libertad?")
+    assert index.exact_match("que es la LIBERTAD", "paep_analysis")['session_id'] == "1"
+    assert index.exact_match("que es la libertad", "otro_template") is None
+    assert index.exact_match("Otra") is None
+
+
+def result_markdown(session_id, phase_ids):
+    phases = "".join(f"## Fase {pid}: Nombre {pid}\n\n### Etiqueta\n\nSalida {pid}\n\n---\n\n" for pid in phase_ids)
+    return (f"# Análisis PAEP-R: ¿Qué es la libertad?\n\n**Session ID:** {session_id}\n"
+            f"**Timestamp:** 2026-01-01T00:00:00\n**Template:** paep_analysis\n\n---\n\n{phases}## Métricas\n")
+
+
+def test_completion_follows_the_template_terminal_phases():
+    templates = {'paep_analysis': TEMPLATE}
+    parsed = parse_result_markdown(result_markdown("s1", ['A', '0', '1']), templates)
+    assert parsed['session']['status'] == "completado"
+    assert [phase['output'] for phase in parsed['phases']] == ["Salida A", "Salida 0", "Salida 1"]
+    assert parse_result_markdown(result_markdown("s2", ['A', '0']), templates)['session']['status'] == "importado"
+    assert parse_result_markdown(result_markdown("s3", ['A', '0', '1']))['session']['status'] == "importado"
+    assert parse_result_markdown("# Otra cosa") is None
+
+
+def test_import_markdown(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "paep_resultado_s1.md").write_text(result_markdown("s1", ['A', '0', '1']), encoding='utf-8')
+    (tmp_path / "paep_resultado_s1.stream.md").write_text("parcial", encoding='utf-8')
+    (tmp_path / "paep_resultado_roto.md").write_text("no es un resultado", encoding='utf-8')
+    index = SessionIndex(str(tmp_path / "i.sqlite3"))
+    summary = import_markdown(index, [str(tmp_path)], {'paep_analysis': TEMPLATE})
+    assert summary['imported'] == 1 and len(summary['skipped']) == 1
+    assert index.get("s1")['status'] == "completado"
+    assert index.exact_match("¿Qué es la libertad?")['session_id'] == "s1"
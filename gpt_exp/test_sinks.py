@@ -0,0 +1,112 @@
+"""Result sinks: what an analysis writes to Markdown, JSONL and SQLite reads back the same."""
+import json
+import sqlite3
+
+import pytest
+
+from paep.backends import FakeBackend
+from paep.compact import expanded_results
+from paep.engine import PAEPEngine
+from paep.llm_client import LLMClient
+from paep.sinks import DEFAULT_SQLITE_NAME, MarkdownSink, build_sinks
+
+TEMPLATE = {
+    'template_name': "t", 'system_prompt': "s", 'model_config': {'model': "m", 'max_tokens': 256},
+    'phase_tags': {'0': "corrientes_de_pensamiento"},
+    'phases': [
+        {'id': 'A', 'name': "Reformulación", 'task': "Reformula"},
+        {'id': '0', 'name': "Corrientes", 'task': "Corrientes", 'depends_on': ['A']},
+        {'id': '1', 'name': "Tesis", 'task': "Tesis", 'depends_on': ['0']},
+    ],
+}
+
+
+def run(tmp_path, formats, session_id="s1", **kwargs):
+    sinks = build_sinks(formats, str(tmp_path))
+    engine = PAEPEngine(LLMClient(backend=FakeBackend(latency=0.0, output_tokens=20)), auto_approve=True,
+                        output_dir=str(tmp_path), sinks=sinks, session_id=session_id, **kwargs)
+    results = engine.run_analysis("¿Qué es la libertad?", TEMPLATE)
+    for sink in sinks:
+        if hasattr(sink, 'close'):
+            sink.close()
+    return expanded_results(results)
+
+
+def test_markdown_round_trip(tmp_path):
+    results = run(tmp_path, ["markdown"])
+    with open(results['output_file'], encoding='utf-8') as f:
+        text = f.read()
+    assert text.startswith("# Análisis PAEP-R: ¿Qué es la libertad?\n")
+    assert "**Session ID:** s1" in text
+    for phase_id in ('A', '0', '1'):
+        assert results['phases'][phase_id]['output'] in text
+    assert "### Corrientes De Pensamiento" in text and "## Métricas" in text
+    assert text.index("## Fase A") < text.index("## Fase 0") < text.index("## Fase 1")
+
+
+def test_markdown_is_rewritten_in_template_order(tmp_path):
+    sink = MarkdownSink(str(tmp_path))
+    results = {'session_id': "s1", 'user_question': "q", 'phases': {}}
+    sink.start_session(results, TEMPLATE)
+    for phase_id in ('1', 'A', '0'):
+        results['phases'][phase_id] = {'output': f"Salida {phase_id}"}
+        sink.write_phase(results, TEMPLATE, phase_id)
+    # Appended in completion order while the session runs
+    with open(sink.path_for("s1"), encoding='utf-8') as f:
+        text = f.read()
+    assert text.index("Salida 1") < text.index("Salida A")
+    path = sink.finish_session(results, TEMPLATE, "completado")
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert text.index("Salida A") < text.index("Salida 0") < text.index("Salida 1")
+    assert text.count("\n## Fase ") == 3
+
+
+def test_jsonl_round_trip(tmp_path):
+    results = run(tmp_path, ["jsonl"])
+    with open(results['output_file'], encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [record['type'] for record in records] == ['session', 'phase', 'phase', 'phase', 'end']
+    assert records[0]['user_question'] == "¿Qué es la libertad?"
+    for record in records[1:-1]:
+        phase = results['phases'][record['phase_id']]
+        assert record['output'] == phase['output']
+        # Prompts are stored by reference in memory and written out whole
+        assert record['full_prompt_sent'] == phase['full_prompt_sent'] and 'prompt_ref' not in record
+    assert records[2]['tag'] == "corrientes_de_pensamiento"
+    assert records[-1]['status'] == "completado"
+    assert records[-1]['usage'] == json.loads(json.dumps(results['usage']))
+
+
+def test_sqlite_round_trip_of_several_sessions(tmp_path):
+    first = run(tmp_path, ["sqlite"], session_id="s1")
+    second = run(tmp_path, ["sqlite"], session_id="s2")
+    assert first['output_file'] == str(tmp_path / DEFAULT_SQLITE_NAME)
+    conn = sqlite3.connect(first['output_file'])
+    sessions = conn.execute("SELECT session_id, user_question, status FROM sessions ORDER BY session_id").fetchall()
+    assert sessions == [("s1", "¿Qué es la libertad?", "completado"), ("s2", "¿Qué es la libertad?", "completado")]
+    for results in (first, second):
+        rows = conn.execute("SELECT phase_id, name, output, full_prompt_sent, metrics FROM phases "
+                            "WHERE session_id = ?", (results['session_id'],)).fetchall()
+        assert {row[0] for row in rows} == {'A', '0', '1'}
+        for phase_id, name, output, prompt, metrics in rows:
+            phase = results['phases'][phase_id]
+            assert (name, output, prompt) == (phase['name'], phase['output'], phase['full_prompt_sent'])
+            assert json.loads(metrics)['total_tokens'] == phase['metrics']['total_tokens']
+    conn.close()
+
+
+def test_spilled_outputs_are_written_inline(tmp_path):
+    results = run(tmp_path, ["jsonl", "sqlite"], spill_dir=str(tmp_path / "spill"), spill_threshold=10)
+    with open(results['output_files'][0], encoding='utf-8') as f:
+        outputs = {record['phase_id']: record['output'] for record in map(json.loads, f) if record['type'] == 'phase'}
+    conn = sqlite3.connect(results['output_files'][1])
+    assert dict(conn.execute("SELECT phase_id, output FROM phases")) == outputs
+    conn.close()
+    assert outputs == {phase_id: data['output'] for phase_id, data in results['phases'].items()}
+    assert all(isinstance(output, str) for output in outputs.values())
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="Formato de salida desconocido"):
+        build_sinks(["csv"], str(tmp_path))